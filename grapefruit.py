@@ -19,7 +19,30 @@
 
 from __future__ import division
 
+import bisect
+import collections
+import contextlib
+import functools
+import heapq
+import math
+import mmap
+import os
+import random
+import struct
 import sys
+import time
+from array import array
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+try:
+  from concurrent.futures import ProcessPoolExecutor
+  from multiprocessing import shared_memory
+except ImportError:
+  ProcessPoolExecutor = shared_memory = None
 
 # $Id$
 __author__ = 'Xavier Basty <xbasty@gmail.com>'
@@ -33,6 +56,16 @@ _oneThird = 1.0 / 3
 _srgbGammaCorrInv = 0.03928 / 12.92
 _sixteenHundredsixteenth = 16.0 / 116
 
+# The a* and b* components of Colour.lab are in [-1...1], they are scaled by
+# this factor to the usual CIE range before computing colour differences.
+_LAB_AB_SCALE = 100.0
+
+# The constant of the chroma terms of CIEDE2000.
+_25_POW_7 = 25.0**7
+
+# Number of intervals of the sRGB gamma encoding table (see XyzToRgb).
+_SRGB_ENCODE_STEPS = 65536
+
 _RybWheel = (
     0,  26,  52,
    83, 120, 130,
@@ -55,7 +88,288 @@ _RgbWheel = (
   282, 298, 329,
   360)
 
-class Colour:
+# The static conversion functions that can be cached, see
+# Colour.EnableConversionCache.
+_CACHEABLE_CONVERSIONS = (
+  'RgbToHsl', 'HslToRgb', 'RgbToHsv', 'HsvToRgb', 'RgbToYiq', 'YiqToRgb',
+  'RgbToYuv', 'YuvToRgb', 'RgbToXyz', 'IntTupleToXyz', 'XyzToRgb', 'XyzToLab',
+  'LabToXyz', 'DeltaE', 'CmykToCmy', 'CmyToCmyk', 'RgbToCmy', 'CmyToRgb',
+  'RgbToIntTuple', 'IntTupleToRgb', 'RgbToHtml', 'HtmlToRgb', 'RgbToPil',
+  'PilToRgb', 'RgbToWebSafe', 'RgbToGreyscale', 'RgbToRyb', 'RybToRgb')
+
+# The statistics of the LRU caches, as returned by their cache_info.
+_CacheInfo = collections.namedtuple('CacheInfo', 'hits misses maxsize currsize')
+
+def _LruCached(fn, maxsize):
+  '''Return functools.lru_cache(maxsize, typed=True)(fn).
+
+  Python 2 has no functools.lru_cache, an equivalent keeping the results in
+  an OrderedDict is returned there.
+
+  '''
+  if hasattr(functools, 'lru_cache'):
+    return functools.lru_cache(maxsize, typed=True)(fn)
+  results = collections.OrderedDict()
+  stats = [0, 0]
+
+  @functools.wraps(fn)
+  def cached(*args, **kwargs):
+    items = tuple(sorted(kwargs.items()))
+    key = (args, items, tuple((type(v) for v in args)), tuple((type(v) for k, v in items)))
+    try:
+      value = results.pop(key)
+    except KeyError:
+      stats[1] += 1
+      value = fn(*args, **kwargs)
+      if maxsize is not None and len(results) >= maxsize:
+        if not maxsize:
+          return value
+        results.popitem(last=False)
+    else:
+      stats[0] += 1
+    results[key] = value
+    return value
+
+  def clear():
+    results.clear()
+    stats[:] = [0, 0]
+
+  cached.cache_info = lambda: _CacheInfo(stats[0], stats[1], maxsize, len(results))
+  cached.cache_clear = clear
+  cached.__wrapped__ = fn
+  return cached
+
+# The cached versions of the conversion functions, by name.
+_conversionCache = {}
+
+def _CachedConversion(fn, maxsize):
+  '''Return a version of fn memoizing its results in a LRU cache.'''
+  # typed, so that 1 and 1.0 don't share results (their types may differ).
+  cached = _LruCached(fn, maxsize)
+
+  @functools.wraps(fn)
+  def convert(*args, **kwargs):
+    try:
+      return cached(*args, **kwargs)
+    except TypeError:
+      try:
+        hash((args, tuple(kwargs.values())))
+      except TypeError:
+        return fn(*args, **kwargs)
+      raise
+  convert.cache_info = cached.cache_info
+  convert.cache_clear = cached.cache_clear
+  convert.__wrapped__ = fn
+  return convert
+
+def _NewColour(values, mode, alpha, wref):
+  '''Create a Colour with the NewFrom... constructor of mode.'''
+  if mode in ('html', 'pil'):
+    values = (values,)
+  return getattr(Colour, 'NewFrom' + mode.capitalize())(*(values + (alpha, wref)))
+
+# The number of instances shared by Colour.NewInterned by default, besides
+# the named Colours (which are always kept).
+_INTERN_MAXSIZE = 1024
+
+# The shared opaque named Colours, by name, and the LRU cache creating the
+# other shared instances.
+_internedNamed = {}
+_internCache = [_LruCached(_NewColour, _INTERN_MAXSIZE)]
+
+# The upper bounds of the latency histograms buckets, in seconds: 100ns
+# doubling up to ~3.3ms, the last bucket holds the slower calls.
+_LATENCY_BOUNDS = tuple((1e-7 * 2 ** i for i in range(16)))
+
+# The functions that are never instrumented (they control the caches and the
+# instrumentation themselves).
+_UNINSTRUMENTED = (
+  'EnableConversionCache', 'DisableConversionCache', 'ClearConversionCache',
+  'ConversionCacheInfo', 'EnableInstrumentation', 'DisableInstrumentation',
+  'Instrumented', 'InstrumentationStats', 'ClearInterned', 'InternedInfo')
+
+# The clock timing the instrumented calls (time.perf_counter is missing from
+# Python 2).
+_CLOCK = getattr(time, 'perf_counter', time.time)
+
+# The [calls, cumulative time, histogram] of the instrumented functions, by
+# qualified name (e.g. 'Colour.RgbToHsl'), and the (class, attribute name,
+# original, wrapper) of the replaced attributes.
+_instrumentation = {}
+_instrumented = []
+
+def _InstrumentedFunction(name, fn):
+  '''Return a version of fn recording its call statistics under name.'''
+  stats = _instrumentation[name] = [0, 0.0, [0] * (len(_LATENCY_BOUNDS) + 1)]
+  histogram = stats[2]
+  clock = _CLOCK
+  bounds = _LATENCY_BOUNDS
+  bucket = bisect.bisect_left
+
+  @functools.wraps(fn)
+  def call(*args, **kwargs):
+    start = clock()
+    try:
+      return fn(*args, **kwargs)
+    finally:
+      elapsed = clock() - start
+      stats[0] += 1
+      stats[1] += elapsed
+      histogram[bucket(bounds, elapsed)] += 1
+  return call
+
+def _InstrumentedAttribute(cls, name, value):
+  '''Return the instrumented version of the attribute name of cls.
+
+  Returns:
+    The replacement of value (a static method, a property or a method), None
+    if value can't be instrumented.
+
+  '''
+  qualified = '%s.%s' % (cls.__name__, name)
+  if isinstance(value, staticmethod):
+    return staticmethod(_InstrumentedFunction(qualified, value.__func__))
+  if isinstance(value, property):
+    return property(fget=_InstrumentedFunction(qualified, value.fget), doc=value.__doc__)
+  if callable(value) and not isinstance(value, (classmethod, type)):
+    return _InstrumentedFunction(qualified, value)
+  return None
+
+def _AttributeFunction(value):
+  '''Return the function behind a static method, a property or a method.'''
+  if isinstance(value, staticmethod):
+    return value.__func__
+  if isinstance(value, property):
+    return value.fget
+  return value
+
+# The conversion functions between the Colour representations, by source
+# and target representation. These are both Colour and ColourArray methods.
+_CONVERSION_GRAPH = {
+  'rgb': {'hsl': 'RgbToHsl', 'hsv': 'RgbToHsv', 'yiq': 'RgbToYiq', 'yuv': 'RgbToYuv',
+          'xyz': 'RgbToXyz', 'cmy': 'RgbToCmy'},
+  'hsl': {'rgb': 'HslToRgb'},
+  'hsv': {'rgb': 'HsvToRgb'},
+  'yiq': {'rgb': 'YiqToRgb'},
+  'yuv': {'rgb': 'YuvToRgb'},
+  'xyz': {'rgb': 'XyzToRgb', 'lab': 'XyzToLab'},
+  'lab': {'xyz': 'LabToXyz'},
+  'cmy': {'rgb': 'CmyToRgb', 'cmyk': 'CmyToCmyk'},
+  'cmyk': {'cmy': 'CmykToCmy'}}
+
+# The number of components of each representation.
+_REPRESENTATION_SIZE = {'cmyk': 4}
+
+# The conversion functions taking a white reference.
+_WREF_CONVERSIONS = ('XyzToLab', 'LabToXyz')
+
+# The converters built by _Converter, by (class, source, target).
+_converters = {}
+
+def _ConversionPath(src, dst):
+  '''Return the shortest list of representations going from src to dst.'''
+  for mode in (src, dst):
+    if mode not in _CONVERSION_GRAPH:
+      raise ValueError('Invalid Colour mode: %s' % mode)
+  previous = {src: None}
+  queue = [src]
+  for mode in queue:
+    if mode==dst:
+      break
+    for target in sorted(_CONVERSION_GRAPH[mode]):
+      if target not in previous:
+        previous[target] = mode
+        queue.append(target)
+  path = [dst]
+  while previous[path[-1]] is not None:
+    path.append(previous[path[-1]])
+  return path[::-1]
+
+def _Converter(cls, src, dst):
+  '''Return the function converting from src to dst with the cls methods.
+
+  The function is built once for each (cls, src, dst): the calls of the
+  conversions along the shortest path are generated as a single expression,
+  so converting doesn't walk the path or build argument lists.
+
+  '''
+  key = (cls, src, dst)
+  converter = _converters.get(key)
+  if converter is None:
+    params = ', '.join(['v%d' % i for i in range(_REPRESENTATION_SIZE.get(src, 3))])
+    env = {'_DEFAULT_WREF': _DEFAULT_WREF}
+    expr = '(%s,)' % params
+    args = params
+    path = _ConversionPath(src, dst)
+    for i, (a, b) in enumerate(zip(path, path[1:])):
+      name = _CONVERSION_GRAPH[a][b]
+      env['f%d' % i] = getattr(cls, name)
+      if name in _WREF_CONVERSIONS:
+        args += ', wref=wref'
+      expr = 'f%d(%s)' % (i, args)
+      args = '*' + expr
+    source = 'def convert(%s, wref=_DEFAULT_WREF):\n  return %s\n' % (params, expr)
+    exec(source, env)
+    converter = _converters[key] = env['convert']
+    converter.__doc__ = 'Convert from %s to %s (%s).' % (src, dst, ' -> '.join(path))
+  return converter
+
+# The cone response matrices of the chromatic adaptation transforms.
+_CONE_RESPONSES = {
+  'bradford': (
+    ( 0.8951,  0.2664, -0.1614),
+    (-0.7502,  1.7135,  0.0367),
+    ( 0.0389, -0.0685,  1.0296)),
+  'vonkries': (
+    ( 0.40024,  0.70760, -0.08081),
+    (-0.22630,  1.16532,  0.04570),
+    ( 0.00000,  0.00000,  0.91822)),
+  'cat02': (
+    ( 0.7328,  0.4296, -0.1624),
+    (-0.7036,  1.6975,  0.0061),
+    ( 0.0030,  0.0136,  0.9834)),
+  'xyzscaling': (
+    (1.0, 0.0, 0.0),
+    (0.0, 1.0, 0.0),
+    (0.0, 0.0, 1.0))}
+
+# The adaptation matrices computed by _AdaptationMatrix, by (src, dst, method).
+_adaptationMatrices = {}
+
+def _MatrixProduct(a, b):
+  '''Return the product of two 3x3 matrices (tuples of rows).'''
+  return tuple((tuple((sum((row[k] * b[k][j] for k in range(3))) for j in range(3))) for row in a))
+
+def _MatrixInverse(m):
+  '''Return the inverse of a 3x3 matrix (tuple of rows).'''
+  (a, b, c), (d, e, f), (g, h, i) = m
+  det = a*(e*i - f*h) - b*(d*i - f*g) + c*(d*h - e*g)
+  return (
+    ((e*i - f*h) / det, (c*h - b*i) / det, (b*f - c*e) / det),
+    ((f*g - d*i) / det, (a*i - c*g) / det, (c*d - a*f) / det),
+    ((d*h - e*g) / det, (b*g - a*h) / det, (a*e - b*d) / det))
+
+def _AdaptationMatrix(src, dst, method):
+  '''Return the matrix adapting XYZ values from the src to the dst white.
+
+  The matrices are computed once for each (src, dst, method).
+
+  '''
+  key = (tuple(src), tuple(dst), method)
+  matrix = _adaptationMatrices.get(key)
+  if matrix is None:
+    try:
+      cone = _CONE_RESPONSES[method]
+    except KeyError:
+      raise ValueError('Invalid chromatic adaptation method: %s' % method)
+    # M = cone^-1 . diag(dst cone response / src cone response) . cone
+    s = [sum((c * w for c, w in zip(row, src))) for row in cone]
+    d = [sum((c * w for c, w in zip(row, dst))) for row in cone]
+    scale = tuple((tuple((j==i and d[i] / s[i] or 0.0 for j in range(3))) for i in range(3)))
+    matrix = _adaptationMatrices[key] = _MatrixProduct(_MatrixInverse(cone), _MatrixProduct(scale, cone))
+  return matrix
+
+class Colour(object):
   '''Hold a Colour value.
 
   Example usage:
@@ -125,6 +439,21 @@ class Colour:
     'sup_F11'     : (1.03820, 1.00000, 0.65555),
     'sup_F12'     : (1.11428, 1.00000, 0.40353)}
 
+  # No per instance dictionary, the instances only hold these values.
+  __slots__ = ('__rgb', '__hsl', '__a', '__wref', '__cache')
+
+  # Set to False to stop the instances from caching their derived values
+  # (lab, xyz, html...), trading speed for memory.
+  CACHE_DERIVED = True
+
+  # Set to True to make the ColourArray XYZ, L*a*b* and sRGB gamma conversions
+  # (and Colour.LabToXyz) use their fast approximate computation when no
+  # precision is given to the call.
+  FAST_MATH = False
+
+  # The cached derived values that depend on the white reference.
+  _WREF_DEPENDENT = ('lab',)
+
   NAMED_Colour = {
     'aliceblue':            '#f0f8ff',
     'antiquewhite':         '#faebd7',
@@ -291,17 +620,31 @@ class Colour:
     if not(isinstance(values, tuple)):
       raise TypeError('values must be a tuple')
 
+    # Only the representation given is stored, the other one is computed
+    # the first time it is needed (see __GetRGB and __GetHSL).
     if mode=='rgb':
       self.__rgb = values
-      self.__hsl = Colour.RgbToHsl(*values)
+      self.__hsl = None
     elif mode=='hsl':
       self.__hsl = values
-      self.__rgb = Colour.HslToRgb(*values)
+      self.__rgb = None
     else:
       raise ValueError('Invalid Colour mode: ' + mode)
 
+    # Share the white reference with the other instances using the same one.
+    if wref is not _DEFAULT_WREF:
+      try:
+        wref = _INTERNED_WREF.get(wref, wref)
+      except TypeError:
+        pass
+
     self.__a = alpha
     self.__wref = wref
+    self.__cache = None
+
+  def __hash__(self):
+    # Consistent with __eq__: equal to the (r, g, b, alpha) tuple.
+    return hash(self.rgb + (self.__a,))
 
   def __ne__(self, other):
     return not self.__eq__(other)
@@ -309,17 +652,17 @@ class Colour:
   def __eq__(self, other):
     try:
       if isinstance(other, Colour):
-        return (self.__rgb==other.__rgb) and (self.__a==other.__a)
+        return (self.rgb==other.rgb) and (self.__a==other.__a)
       if len(other) != 4:
         return False
-      return list(self.__rgb + (self.__a,)) == list(other)
+      return list(self.rgb + (self.__a,)) == list(other)
     except TypeError:
       return False
     except AttributeError:
       return False
 
   def __repr__(self):
-    return str(self.__rgb + (self.__a,))
+    return str(self.rgb + (self.__a,))
 
   def __str__(self):
     '''A string representation of this grapefruit.Colour instance.
@@ -328,7 +671,7 @@ class Colour:
       The RGBA representation of this grapefruit.Colour instance.
 
     '''
-    return '(%g, %g, %g, %g)' % (self.__rgb + (self.__a,))
+    return '(%g, %g, %g, %g)' % (self.rgb + (self.__a,))
 
   if sys.version_info[0] < 3:
     def __unicode__(self):
@@ -338,10 +681,10 @@ class Colour:
         The RGBA representation of this grapefruit.Colour instance.
 
       '''
-      return unicode('%g, %g, %g, %g)') % (self.__rgb + (self.__a,))
+      return unicode('%g, %g, %g, %g)') % (self.rgb + (self.__a,))
 
   def __iter__(self):
-    return iter(self.__rgb + (self.__a,))
+    return iter(self.rgb + (self.__a,))
 
   def __len__(self):
     return 4
@@ -669,7 +1012,50 @@ class Colour:
     '(0.488941, 0.365682, 0.0448137)'
 
     '''
-    r, g, b = [((v <= 0.03928) and [v / 12.92] or [((v+0.055) / 1.055) **2.4])[0] for v in (r, g, b)]
+    r = (r / 12.92) if r <= 0.03928 else ((r+0.055) / 1.055) **2.4
+    g = (g / 12.92) if g <= 0.03928 else ((g+0.055) / 1.055) **2.4
+    b = (b / 12.92) if b <= 0.03928 else ((b+0.055) / 1.055) **2.4
+
+    x = (r * 0.4124) + (g * 0.3576) + (b * 0.1805)
+    y = (r * 0.2126) + (g * 0.7152) + (b * 0.0722)
+    z = (r * 0.0193) + (g * 0.1192) + (b * 0.9505)
+    return (x, y, z)
+
+  @staticmethod
+  def IntTupleToXyz(intTuple, bits=8):
+    '''Convert a tuple of ints from sRGB to CIE XYZ.
+
+    The sRGB gamma correction is removed using a table holding the linear
+    value of every possible component, so the result is exactly the one of
+    Colour.RgbToXyz(*Colour.IntTupleToRgb(intTuple)) (for 8 bits components),
+    without computing any power.
+
+    The table for 16 bits components (65536 values) is built the first time
+    it is used.
+
+    Parameters:
+      :intTuple:
+        The Colour as an (r, g, b) integer tuple in the range:
+        r[0...2**bits-1],
+        g[0...2**bits-1],
+        b[0...2**bits-1]
+      :bits:
+        The number of bits of the components (8 or 16).
+
+    Returns:
+      The Colour as an (x, y, z) tuple in the range:
+      x[0...1],
+      y[0...1],
+      z[0...1]
+
+    >>> '(%g, %g, %g)' % Colour.IntTupleToXyz((255, 128, 0))
+    '(0.489592, 0.366983, 0.0450306)'
+    >>> '(%g, %g, %g)' % Colour.IntTupleToXyz((65535, 32768, 0), 16)
+    '(0.488944, 0.365687, 0.0448145)'
+
+    '''
+    table = _srgbDecodeTables.get(bits) or _SrgbDecodeTable(bits)
+    r, g, b = [table[v] for v in intTuple]
 
     x = (r * 0.4124) + (g * 0.3576) + (b * 0.1805)
     y = (r * 0.2126) + (g * 0.7152) + (b * 0.0722)
@@ -677,13 +1063,18 @@ class Colour:
     return (x, y, z)
 
   @staticmethod
-  def XyzToRgb(x, y, z):
+  def XyzToRgb(x, y, z, lut=False):
     '''Convert the Colour from CIE XYZ coordinates to sRGB.
 
     .. note::
 
        Compensation for sRGB gamma correction is applied before converting.
 
+    When lut is True and the linear components are in the range [0...1],
+    the gamma correction is read from a table of 65537 values (built on
+    first use) instead of being computed. The absolute error is then less
+    than 1e-4 (1/39 of an 8 bits step). Out of gamut Colours are computed.
+
     Parameters:
       :x:
         The X component value [0...1]
@@ -691,6 +1082,8 @@ class Colour:
         The Y component value [0...1]
       :z:
         The Z component value [0...1]
+      :lut:
+        If True, use the lookup table for the gamma correction.
 
     Returns:
       The Colour as an (r, g, b) tuple in the range:
@@ -700,12 +1093,21 @@ class Colour:
 
     >>> '(%g, %g, %g)' % Colour.XyzToRgb(0.488941, 0.365682, 0.0448137)
     '(1, 0.5, 6.81883e-08)'
+    >>> '(%.4f, %.4f, %.4f)' % Colour.XyzToRgb(0.488941, 0.365682, 0.0448137, lut=True)
+    '(1.0000, 0.5000, 0.0000)'
 
     '''
     r =  (x * 3.2406255) - (y * 1.5372080) - (z * 0.4986286)
     g = -(x * 0.9689307) + (y * 1.8757561) + (z * 0.0415175)
     b =  (x * 0.0557101) - (y * 0.2040211) + (z * 1.0569959)
-    return tuple((((v <= _srgbGammaCorrInv) and [v * 12.92] or [(1.055 * (v ** (1/2.4))) - 0.055])[0] for v in (r, g, b)))
+    if lut and 0.0 <= r <= 1.0 and 0.0 <= g <= 1.0 and 0.0 <= b <= 1.0:
+      table = _srgbEncodeTable or _SrgbEncodeTable()
+      n = _SRGB_ENCODE_STEPS
+      return (table[int(r*n + 0.5)], table[int(g*n + 0.5)], table[int(b*n + 0.5)])
+    r = (r * 12.92) if r <= _srgbGammaCorrInv else (1.055 * (r ** (1/2.4))) - 0.055
+    g = (g * 12.92) if g <= _srgbGammaCorrInv else (1.055 * (g ** (1/2.4))) - 0.055
+    b = (b * 12.92) if b <= _srgbGammaCorrInv else (1.055 * (b ** (1/2.4))) - 0.055
+    return (r, g, b)
 
   @staticmethod
   def XyzToLab(x, y, z, wref=_DEFAULT_WREF):
@@ -740,7 +1142,9 @@ class Colour:
     z /= wref[2]
 
     # Nonlinear distortion and linear transformation
-    x, y, z = [((v > 0.008856) and [v**_oneThird] or [(7.787 * v) + _sixteenHundredsixteenth])[0] for v in (x, y, z)]
+    x = (x**_oneThird) if x > 0.008856 else (7.787 * x) + _sixteenHundredsixteenth
+    y = (y**_oneThird) if y > 0.008856 else (7.787 * y) + _sixteenHundredsixteenth
+    z = (z**_oneThird) if z > 0.008856 else (7.787 * z) + _sixteenHundredsixteenth
 
     # Vector scaling
     l = (116 * y) - 16
@@ -750,7 +1154,7 @@ class Colour:
     return (l, a, b)
 
   @staticmethod
-  def LabToXyz(l, a, b, wref=_DEFAULT_WREF):
+  def LabToXyz(l, a, b, wref=_DEFAULT_WREF, fast=None):
     '''Convert the Colour from CIE L*a*b* to CIE 1931 XYZ.
 
     Parameters:
@@ -762,6 +1166,11 @@ class Colour:
         The a component [-1...1]
       :wref:
         The whitepoint reference, default is 2° D65.
+      :fast:
+        Use the fast approximate computation, default is
+        :const:`Colour.FAST_MATH`. The cubes are then computed with
+        multiplications instead of a power, the results only differ by
+        rounding errors.
 
     Returns:
       The Colour as an (x, y, z) tuple in the range:
@@ -779,7 +1188,147 @@ class Colour:
     y = (l + 16) / 116
     x = (a / 5.0) + y
     z = y - (b / 2.0)
-    return tuple((((v > 0.206893) and [v**3] or [(v - _sixteenHundredsixteenth) / 7.787])[0] * w for v, w in zip((x, y, z), wref)))
+    if fast or (fast is None and Colour.FAST_MATH):
+      x = (x*x*x) if x > 0.206893 else (x - _sixteenHundredsixteenth) / 7.787
+      y = (y*y*y) if y > 0.206893 else (y - _sixteenHundredsixteenth) / 7.787
+      z = (z*z*z) if z > 0.206893 else (z - _sixteenHundredsixteenth) / 7.787
+    else:
+      x = (x**3) if x > 0.206893 else (x - _sixteenHundredsixteenth) / 7.787
+      y = (y**3) if y > 0.206893 else (y - _sixteenHundredsixteenth) / 7.787
+      z = (z**3) if z > 0.206893 else (z - _sixteenHundredsixteenth) / 7.787
+    return (x * wref[0], y * wref[1], z * wref[2])
+
+  @staticmethod
+  def AdaptationMatrix(src, dst, method='bradford'):
+    '''Return the chromatic adaptation matrix between two white references.
+
+    The matrices are computed when first used, then kept for each
+    (src, dst, method).
+
+    Parameters:
+      :src:
+        The white reference the XYZ values are relative to (e.g. one of
+        Colour.WHITE_REFERENCE).
+      :dst:
+        The white reference to adapt the values to.
+      :method:
+        The chromatic adaptation transform (bradford/vonkries/cat02/xyzscaling).
+
+    Returns:
+      The 3x3 matrix, as a tuple of rows.
+
+    >>> m = Colour.AdaptationMatrix(Colour.WHITE_REFERENCE['std_D65'], Colour.WHITE_REFERENCE['std_D50'])
+    >>> ['(%.4f, %.4f, %.4f)' % row for row in m]
+    ['(1.0478, 0.0229, -0.0501)', '(0.0296, 0.9905, -0.0171)', '(-0.0092, 0.0150, 0.7521)']
+
+    '''
+    return _AdaptationMatrix(src, dst, method)
+
+  @staticmethod
+  def AdaptXyz(x, y, z, src, dst, method='bradford'):
+    '''Adapt CIE 1931 XYZ values from a white reference to another.
+
+    Parameters:
+      :x:
+        The X component value [0...1]
+      :y:
+        The Y component value [0...1]
+      :z:
+        The Z component value [0...1]
+      :src:
+        The white reference of the values.
+      :dst:
+        The white reference to adapt the values to.
+      :method:
+        The chromatic adaptation transform (bradford/vonkries/cat02/xyzscaling).
+
+    Returns:
+      The adapted (x, y, z) tuple.
+
+    >>> d50, d65 = Colour.WHITE_REFERENCE['std_D50'], Colour.WHITE_REFERENCE['std_D65']
+    >>> '(%g, %g, %g)' % Colour.AdaptXyz(*d65, src=d65, dst=d50)
+    '(0.96421, 1, 0.82519)'
+
+    '''
+    (m00, m01, m02), (m10, m11, m12), (m20, m21, m22) = _AdaptationMatrix(src, dst, method)
+    return (
+      m00*x + m01*y + m02*z,
+      m10*x + m11*y + m12*z,
+      m20*x + m21*y + m22*z)
+
+  @staticmethod
+  def Convert(values, src='rgb', dst='lab', wref=_DEFAULT_WREF):
+    '''Convert a Colour between any two representations.
+
+    The conversion functions are chained along the shortest path between the
+    representations (e.g. hsv -> rgb -> xyz -> lab), see :meth:`Converter`.
+
+    Parameters:
+      :values:
+        The components of the Colour, in the src representation.
+      :src:
+        The representation of values (rgb/hsl/hsv/yiq/yuv/xyz/lab/cmy/cmyk).
+      :dst:
+        The representation to convert to.
+      :wref:
+        The whitepoint reference of the CIE-LAB values, default is 2° D65.
+
+    Returns:
+      The tuple of the components in the dst representation.
+
+    >>> '(%g, %g, %g)' % Colour.Convert((30, 1, 1), 'hsv', 'lab')
+    '(66.9518, 0.43084, 0.739692)'
+    >>> '(%g, %g, %g, %g)' % Colour.Convert((30, 1, 0.5), 'hsl', 'cmyk')
+    '(0, 0.5, 1, 0)'
+
+    '''
+    return _Converter(Colour, src, dst)(*values, wref=wref)
+
+  @staticmethod
+  def Converter(src, dst):
+    '''Return the function converting Colours from src to dst.
+
+    The function is built once for each pair of representations, and takes
+    the components of the Colour as arguments (and an optional wref), like
+    the other conversion functions. Use it to convert many Colours.
+
+    >>> hsvToLab = Colour.Converter('hsv', 'lab')
+    >>> '(%g, %g, %g)' % hsvToLab(30, 1, 1)
+    '(66.9518, 0.43084, 0.739692)'
+    >>> hsvToLab.__doc__
+    'Convert from hsv to lab (hsv -> rgb -> xyz -> lab).'
+
+    '''
+    return _Converter(Colour, src, dst)
+
+  @staticmethod
+  def DeltaE(lab1, lab2, formula='cie76'):
+    '''Compute the difference between two CIE L*a*b* Colours.
+
+    Parameters:
+      :lab1:
+        The (l, a, b) tuple of the reference Colour, in the range of
+        :meth:`Colour.XyzToLab`.
+      :lab2:
+        The (l, a, b) tuple of the compared Colour.
+      :formula:
+        The colour difference formula (cie76/cie94/ciede2000). The CIE94
+        difference uses the graphic arts weights and is not symmetric.
+
+    Returns:
+      The ΔE value, on the usual CIE scale (a difference of about 1 is
+      barely noticeable).
+
+    >>> red = Colour.NewFromHtml('red').lab
+    >>> orange = Colour.NewFromHtml('orange').lab
+    >>> '%.4f' % Colour.DeltaE(red, orange)
+    '61.3514'
+    >>> '%.4f' % Colour.DeltaE(red, orange, 'ciede2000')
+    '33.7548'
+
+    '''
+    fn = _DeltaEFunction(formula)
+    return fn(*(_CieLab(*lab1) + _CieLab(*lab2)))
 
   @staticmethod
   def CmykToCmy(c, m, y, k):
@@ -1477,6 +2026,313 @@ class Colour:
     '''
     return Colour(Colour.PilToRgb(pil), 'rgb', alpha, wref)
 
+  @staticmethod
+  def NewInterned(values, mode='rgb', alpha=1.0, wref=_DEFAULT_WREF):
+    '''Return a shared instance for the specified values.
+
+    The Colours are immutable, so the same instance can be returned for
+    repeated inputs: it is only created (and its properties computed) once.
+    The opaque named Colours (e.g. 'red', see :const:`Colour.NAMED_Colour`)
+    are always kept, the instances created for the other inputs are kept in
+    a LRU cache of bounded size (see :meth:`ClearInterned`). The inputs that
+    can't be hashed return a new instance.
+
+    Parameters:
+      :values:
+        The values of the Colour, as a tuple in the representation given by
+        mode, the HTML definition in the html mode and the integer in the
+        pil mode.
+      :mode:
+        The representation of values (rgb, hsl, hsv, yiq, yuv, xyz, lab,
+        cmy, cmyk, html or pil).
+      :alpha:
+        The Colour transparency [0...1], default is opaque.
+      :wref:
+        The whitepoint reference, default is 2° D65.
+
+    Returns:
+      A grapefruit.Colour instance, shared with the previous calls having the
+      same arguments.
+
+    >>> Colour.NewInterned('red', 'html') is Colour.NewInterned('Red', 'html')
+    True
+    >>> Colour.NewInterned((1.0, 0.5, 0.0)) is Colour.NewInterned((1.0, 0.5, 0.0))
+    True
+    >>> Colour.NewInterned((30.0, 1.0, 0.5), 'hsl')
+    (1.0, 0.5, 0.0, 1.0)
+
+    '''
+    if mode=='html':
+      if alpha==1.0 and wref is _DEFAULT_WREF:
+        name = values.strip().lower()
+        colour = _internedNamed.get(name)
+        if colour is not None:
+          return colour
+        if name in Colour.NAMED_Colour:
+          colour = _internedNamed[name] = Colour(Colour.HtmlToRgb(name), 'rgb')
+          return colour
+    elif mode!='pil':
+      if mode not in _CONVERSION_GRAPH:
+        raise ValueError('Invalid Colour mode: ' + mode)
+      values = tuple(values)
+
+    try:
+      return _internCache[0](values, mode, alpha, wref)
+    except TypeError:
+      try:
+        hash((values, alpha, wref))
+      except TypeError:
+        return _NewColour(values, mode, alpha, wref)
+      raise
+
+  @staticmethod
+  def ClearInterned(maxsize=_INTERN_MAXSIZE):
+    '''Forget the instances shared by NewInterned, and their statistics.
+
+    Parameters:
+      :maxsize:
+        The number of instances shared from now on, besides the named
+        Colours, None for no limit.
+
+    '''
+    _internedNamed.clear()
+    _internCache[0] = _LruCached(_NewColour, maxsize)
+
+  @staticmethod
+  def InternedInfo():
+    '''Return the statistics of the instances shared by NewInterned.
+
+    Returns:
+      The (hits, misses, maxsize, currsize) named tuple of the LRU cache, the
+      named Colours not being counted.
+
+    >>> Colour.ClearInterned(256)
+    >>> c = Colour.NewInterned('#ff8000', 'html')
+    >>> c = Colour.NewInterned('#ff8000', 'html')
+    >>> Colour.InternedInfo()
+    CacheInfo(hits=1, misses=1, maxsize=256, currsize=1)
+    >>> Colour.ClearInterned()
+
+    '''
+    return _internCache[0].cache_info()
+
+  @staticmethod
+  def NearestNamed(colours, k=1):
+    '''Find the named Colours nearest to each of the specified Colours.
+
+    The distance is the euclidian distance in the CIE-LAB Colourspace
+    (Delta E 1976, with a* and b* on the usual CIE scale), computed with the
+    default white reference whatever the one of the Colours. The CIE-LAB
+    values of Colour.NAMED_Colour are computed on first use. With NumPy, the
+    distances to all the names are computed at once (by chunks of Colours),
+    otherwise the names are looked up in a k-d tree.
+
+    Names sharing the same value (e.g. 'aqua' and 'cyan') are only counted
+    once, the first one in alphabetical order being returned.
+
+    Parameters:
+      :colours:
+        A sequence of grapefruit.Colour instances, or a
+        grapefruit.ColourArray instance.
+      :k:
+        The number of names to return for each Colour.
+
+    Returns:
+      For each Colour, the nearest name if k is 1, otherwise a list of the k
+      nearest names, the nearest first.
+
+    >>> Colour.NearestNamed([Colour.NewFromRgb(1, 0.5, 0), Colour.NewFromHtml('#00fffe')])
+    ['darkorange', 'aqua']
+    >>> Colour.NearestNamed([Colour.NewFromRgb(1, 0.5, 0)], k=3)
+    [['darkorange', 'chocolate', 'orange']]
+
+    '''
+    names, labs, tree = _NamedColourIndex()
+
+    if isinstance(colours, ColourArray):
+      queries = ColourArray.XyzToLab(*colours.ToXyz())
+    else:
+      queries = tuple(zip(*[Colour.XyzToLab(*c.xyz) for c in colours])) or ((), (), ())
+
+    if numpy is not None:
+      queries = numpy.column_stack(_CieLab(*[numpy.asarray(q, dtype=float) for q in queries]))
+      nearest = _NearestBrute(queries.reshape((-1, 3)), numpy.array(labs), k)[0].tolist()
+    else:
+      nearest = [[i for d, i in tree.Nearest(_CieLab(*lab), k)] for lab in zip(*queries)]
+
+    if k==1:
+      return [names[n[0]] for n in nearest]
+    return [[names[i] for i in n] for n in nearest]
+
+  @staticmethod
+  def EnableConversionCache(maxsize=1024, conversions=None):
+    '''Memoize the results of the static conversion functions.
+
+    Each conversion function gets its own cache holding the results of its
+    maxsize most recently used inputs (the white reference is part of the
+    input). The calls with unhashable arguments are not cached.
+
+    The cache is disabled by default, enabling it again replaces the caches
+    (and their statistics).
+
+    Parameters:
+      :maxsize:
+        The number of results kept for each function, None for no limit.
+      :conversions:
+        The names of the cached functions, default is all the conversion
+        functions (RgbToHsl, HtmlToRgb, XyzToLab...).
+
+    >>> Colour.EnableConversionCache(256, ('HtmlToRgb',))
+    >>> Colour.HtmlToRgb('#ff8000') == Colour.HtmlToRgb('#ff8000')
+    True
+    >>> Colour.ConversionCacheInfo()
+    {'HtmlToRgb': CacheInfo(hits=1, misses=1, maxsize=256, currsize=1)}
+    >>> Colour.DisableConversionCache()
+
+    '''
+    Colour.DisableConversionCache()
+    _converters.clear()
+    for name in conversions or _CACHEABLE_CONVERSIONS:
+      if name not in _CACHEABLE_CONVERSIONS:
+        raise ValueError('Not a conversion function: %s' % name)
+      fn = Colour.__dict__[name].__func__
+      _conversionCache[name] = _CachedConversion(fn, maxsize)
+      setattr(Colour, name, staticmethod(_conversionCache[name]))
+
+  @staticmethod
+  def DisableConversionCache():
+    '''Remove the conversion functions cache, and its statistics.'''
+    for name, cached in _conversionCache.items():
+      setattr(Colour, name, staticmethod(cached.__wrapped__))
+    _conversionCache.clear()
+    _converters.clear()
+
+  @staticmethod
+  def ClearConversionCache():
+    '''Empty the conversion functions cache and reset its statistics.'''
+    for cached in _conversionCache.values():
+      cached.cache_clear()
+
+  @staticmethod
+  def ConversionCacheInfo():
+    '''Return the statistics of the conversion functions cache.
+
+    Returns:
+      A dictionary with the (hits, misses, maxsize, currsize) named tuple of
+      each cached function, empty if the cache is disabled.
+
+    '''
+    return dict(((name, cached.cache_info()) for name, cached in _conversionCache.items()))
+
+  @staticmethod
+  def EnableInstrumentation(functions=None):
+    '''Record the call statistics of the Colour and ColourArray functions.
+
+    The instrumented functions, methods and properties are replaced by
+    wrappers counting their calls and measuring their latency. The original
+    ones are put back by DisableInstrumentation, so the instrumentation has
+    no cost at all when it is disabled (the default).
+
+    The measured times include the nested calls (e.g. the time of
+    NewFromHtml includes the one of HtmlToRgb). Enabling the instrumentation
+    again resets the statistics. When the conversion cache is also used,
+    enable and disable both in nested order.
+
+    Parameters:
+      :functions:
+        The names of the instrumented functions, methods and properties,
+        qualified by their class ('ColourArray.RgbToHsl') or not for the
+        Colour ones ('RgbToHsl', 'Blend', 'lab'). Default is all the public
+        ones of Colour and ColourArray.
+
+    Throws:
+      :ValueError:
+        If one of the functions is unknown.
+
+    '''
+    Colour.DisableInstrumentation()
+    _instrumentation.clear()
+    classes = dict(((cls.__name__, cls) for cls in (Colour, ColourArray)))
+    if functions is None:
+      targets = [(cls, name) for cls in classes.values() for name in sorted(vars(cls))
+        if not name.startswith('_') and name not in _UNINSTRUMENTED]
+    else:
+      targets = []
+      for qualified in functions:
+        owner, _, name = qualified.rpartition('.')
+        cls = classes.get(owner or 'Colour')
+        if cls is None or name.startswith('_') or name in _UNINSTRUMENTED or name not in vars(cls):
+          raise ValueError('Not an instrumentable function: %s' % qualified)
+        targets.append((cls, name))
+
+    for cls, name in targets:
+      value = vars(cls)[name]
+      wrapper = _InstrumentedAttribute(cls, name, value)
+      if wrapper is None:
+        if functions is None: continue
+        raise ValueError('Not an instrumentable function: %s.%s' % (cls.__name__, name))
+      setattr(cls, name, wrapper)
+      _instrumented.append((cls, name, value, _AttributeFunction(wrapper)))
+    _converters.clear()
+
+  @staticmethod
+  def DisableInstrumentation():
+    '''Restore the instrumented functions, keeping their statistics.'''
+    for cls, name, value, wrapper in reversed(_instrumented):
+      if _AttributeFunction(vars(cls).get(name)) is wrapper:
+        setattr(cls, name, value)
+    del _instrumented[:]
+    _converters.clear()
+
+  @staticmethod
+  @contextlib.contextmanager
+  def Instrumented(functions=None):
+    '''Enable the instrumentation for the duration of a with statement.
+
+    The statistics remain available after the with statement.
+
+    Parameters:
+      :functions:
+        The names of the instrumented functions, see EnableInstrumentation.
+
+    >>> with Colour.Instrumented(('HtmlToRgb', 'NewFromHtml', 'ColourArray.HtmlToRgb')):
+    ...   c = Colour.NewFromHtml('#ff8000')
+    ...   c = Colour.NewFromHtml('lemonchiffon')
+    >>> stats = Colour.InstrumentationStats()
+    >>> sorted(stats)
+    ['Colour.HtmlToRgb', 'Colour.NewFromHtml']
+    >>> stats['Colour.NewFromHtml']['calls']
+    2
+    >>> stats['Colour.NewFromHtml']['time'] >= stats['Colour.HtmlToRgb']['time']
+    True
+
+    '''
+    Colour.EnableInstrumentation(functions)
+    try:
+      yield
+    finally:
+      Colour.DisableInstrumentation()
+
+  @staticmethod
+  def InstrumentationStats():
+    '''Return a snapshot of the instrumentation statistics.
+
+    Returns:
+      A dictionary with the statistics of each instrumented function called
+      at least once, by qualified name ('Colour.RgbToHsl'). The statistics
+      are a dictionary holding:
+        :calls: The number of calls.
+        :time: The cumulative time of the calls, in seconds.
+        :histogram: The latency histogram, as the list of the (upper bound
+          in seconds, number of calls) of the non empty buckets. The bounds
+          double from 100ns up to ~3.3ms, the last one is infinite.
+
+    '''
+    bounds = _LATENCY_BOUNDS + (float('inf'),)
+    return dict(((name, {'calls': calls, 'time': total,
+      'histogram': [(b, n) for b, n in zip(bounds, histogram) if n]})
+      for name, (calls, total, histogram) in _instrumentation.items() if calls))
+
   def __GetAlpha(self):
     return self.__a
   alpha = property(fget=__GetAlpha, doc='The transparency of this Colour. 0.0 is transparent and 1.0 is fully opaque.')
@@ -1486,65 +2342,106 @@ class Colour:
   whiteRef = property(fget=__GetWRef, doc='the white reference point of this Colour.')
 
   def __GetRGB(self):
+    if self.__rgb is None:
+      self.__rgb = Colour.HslToRgb(*self.__hsl)
     return self.__rgb
   rgb = property(fget=__GetRGB, doc='The RGB values of this Colour.')
 
   def __GetHue(self):
-    return self.__hsl[0]
+    return self.__GetHSL()[0]
   hue = property(fget=__GetHue, doc='The hue of this Colour.')
 
   def __GetHSL(self):
+    if self.__hsl is None:
+      self.__hsl = Colour.RgbToHsl(*self.__rgb)
     return self.__hsl
   hsl = property(fget=__GetHSL, doc='The HSL values of this Colour.')
 
+  def __Cached(key, compute):
+    '''Wrap a property getter so that its value is computed once per instance.
+
+    The values are stored in a dictionary created on the first access, unless
+    Colour.CACHE_DERIVED is False.
+
+    '''
+    def fget(self):
+      cache = self.__cache
+      if cache is None:
+        if not Colour.CACHE_DERIVED:
+          return compute(self)
+        cache = self.__cache = {}
+      elif key in cache:
+        return cache[key]
+      value = cache[key] = compute(self)
+      return value
+    return fget
+
+  def __CopyCache(self, colour):
+    '''Give colour the cached values of this instance.
+
+    colour must have the same RGB values as this instance, the values
+    depending on the white reference are only kept if colour uses the same one.
+
+    '''
+    if self.__cache:
+      # The HSV hue comes from the HSL values, which colour might not share.
+      drop = ('hsv',)
+      if colour.__wref!=self.__wref: drop += Colour._WREF_DEPENDENT
+      colour.__cache = dict(((k, v) for k, v in self.__cache.items() if k not in drop))
+    return colour
+
   def __GetHSV(self):
-    h, s, v = Colour.RgbToHsv(*self.__rgb)
-    return (self.__hsl[0], s, v)
-  hsv = property(fget=__GetHSV, doc='The HSV values of this Colour.')
+    h, s, v = Colour.RgbToHsv(*self.rgb)
+    return (self.hsl[0], s, v)
+  hsv = property(fget=__Cached('hsv', __GetHSV), doc='The HSV values of this Colour.')
 
   def __GetYIQ(self):
-    return Colour.RgbToYiq(*self.__rgb)
-  yiq = property(fget=__GetYIQ, doc='The YIQ values of this Colour.')
+    return Colour.RgbToYiq(*self.rgb)
+  yiq = property(fget=__Cached('yiq', __GetYIQ), doc='The YIQ values of this Colour.')
 
   def __GetYUV(self):
-    return Colour.RgbToYuv(*self.__rgb)
-  yuv = property(fget=__GetYUV, doc='The YUV values of this Colour.')
+    return Colour.RgbToYuv(*self.rgb)
+  yuv = property(fget=__Cached('yuv', __GetYUV), doc='The YUV values of this Colour.')
 
   def __GetXYZ(self):
-    return Colour.RgbToXyz(*self.__rgb)
-  xyz = property(fget=__GetXYZ, doc='The CIE-XYZ values of this Colour.')
+    return Colour.RgbToXyz(*self.rgb)
+  xyz = property(fget=__Cached('xyz', __GetXYZ), doc='The CIE-XYZ values of this Colour.')
 
   def __GetLAB(self):
-    return Colour.XyzToLab(wref=self.__wref, *Colour.RgbToXyz(*self.__rgb))
-  lab = property(fget=__GetLAB, doc='The CIE-LAB values of this Colour.')
+    return Colour.XyzToLab(wref=self.__wref, *self.xyz)
+  lab = property(fget=__Cached('lab', __GetLAB), doc='The CIE-LAB values of this Colour.')
 
   def __GetCMY(self):
-    return Colour.RgbToCmy(*self.__rgb)
-  cmy = property(fget=__GetCMY, doc='The CMY values of this Colour.')
+    return Colour.RgbToCmy(*self.rgb)
+  cmy = property(fget=__Cached('cmy', __GetCMY), doc='The CMY values of this Colour.')
 
   def __GetCMYK(self):
-    return Colour.CmyToCmyk(*Colour.RgbToCmy(*self.__rgb))
-  cmyk = property(fget=__GetCMYK, doc='The CMYK values of this Colour.')
+    return Colour.CmyToCmyk(*self.cmy)
+  cmyk = property(fget=__Cached('cmyk', __GetCMYK), doc='The CMYK values of this Colour.')
 
   def __GetIntTuple(self):
-    return Colour.RgbToIntTuple(*self.__rgb)
-  intTuple = property(fget=__GetIntTuple, doc='This Colour as a tuple of integers in the range [0...255]')
+    return Colour.RgbToIntTuple(*self.rgb)
+  intTuple = property(fget=__Cached('intTuple', __GetIntTuple), doc='This Colour as a tuple of integers in the range [0...255]')
 
   def __GetHTML(self):
-    return Colour.RgbToHtml(*self.__rgb)
-  html = property(fget=__GetHTML, doc='This Colour as an HTML Colour definition.')
+    return Colour.RgbToHtml(*self.rgb)
+  html = property(fget=__Cached('html', __GetHTML), doc='This Colour as an HTML Colour definition.')
 
   def __GetPIL(self):
-    return Colour.RgbToPil(*self.__rgb)
-  pil = property(fget=__GetPIL, doc='This Colour as a PIL compatible value.')
+    return Colour.RgbToPil(*self.rgb)
+  pil = property(fget=__Cached('pil', __GetPIL), doc='This Colour as a PIL compatible value.')
 
   def __GetwebSafe(self):
-    return Colour.RgbToWebSafe(*self.__rgb)
-  webSafe = property(fget=__GetwebSafe, doc='The web safe Colour nearest to this one (RGB).')
+    return Colour.RgbToWebSafe(*self.rgb)
+  webSafe = property(fget=__Cached('webSafe', __GetwebSafe), doc='The web safe Colour nearest to this one (RGB).')
 
   def __GetGreyscale(self):
     return Colour.RgbToGreyscale(*self.rgb)
-  greyscale = property(fget=__GetGreyscale, doc='The greyscale equivalent to this Colour (RGB).')
+  greyscale = property(fget=__Cached('greyscale', __GetGreyscale), doc='The greyscale equivalent to this Colour (RGB).')
+
+  def __GetNearestName(self):
+    return Colour.NearestNamed((self,))[0]
+  nearestName = property(fget=__Cached('nearestName', __GetNearestName), doc='The name of the named Colour nearest to this one (see NearestNamed).')
 
   def ColourWithAlpha(self, alpha):
     '''Create a new instance based on this one with a new alpha value.
@@ -1560,9 +2457,9 @@ class Colour:
     (1.0, 0.5, 0.0, 0.5)
 
     '''
-    return Colour(self.__rgb, 'rgb', alpha, self.__wref)
+    return self.__CopyCache(Colour(self.rgb, 'rgb', alpha, self.__wref))
 
-  def ColourWithWhiteRef(self, wref, labAsRef=False):
+  def ColourWithWhiteRef(self, wref, labAsRef=False, adaptation=None):
     '''Create a new instance based on this one with a new white reference.
 
     Parameters:
@@ -1571,6 +2468,10 @@ class Colour:
       :labAsRef:
         If True, the L*a*b* values of the current instance are used as reference
         for the new Colour; otherwise, the RGB values are used as reference.
+      :adaptation:
+        If set, the chromatic adaptation transform (bradford/vonkries/cat02/
+        xyzscaling) applied to the XYZ values of the current instance to get
+        the new Colour, see :meth:`AdaptXyz`. labAsRef is ignored then.
 
     Returns:
       A grapefruit.Colour instance.
@@ -1594,12 +2495,19 @@ class Colour:
     >>> '(%g, %g, %g)' % c2.lab
     '(66.9518, 0.43084, 0.739693)'
 
+    >>> c2 = c.ColourWithWhiteRef(Colour.WHITE_REFERENCE['std_D50'], adaptation='bradford')
+    >>> '(%g, %g, %g)' % c2.rgb
+    '(1.03649, 0.489178, -0.143927)'
+
     '''
+    if adaptation is not None:
+      xyz = Colour.AdaptXyz(src=self.__wref, dst=wref, method=adaptation, *self.xyz)
+      return Colour.NewFromXyz(xyz[0], xyz[1], xyz[2], self.__a, wref)
     if labAsRef:
-      l, a, b = self.__GetLAB()
+      l, a, b = self.lab
       return Colour.NewFromLab(l, a, b, self.__a, wref)
     else:
-      return Colour(self.__rgb, 'rgb', self.__a, wref)
+      return self.__CopyCache(Colour(self.rgb, 'rgb', self.__a, wref))
 
   def ColourWithHue(self, hue):
     '''Create a new instance based on this one with a new hue.
@@ -1617,7 +2525,7 @@ class Colour:
     (60, 1, 0.5)
 
     '''
-    h, s, l = self.__hsl
+    h, s, l = self.hsl
     return Colour((hue, s, l), 'hsl', self.__a, self.__wref)
 
   def ColourWithSaturation(self, saturation):
@@ -1640,7 +2548,7 @@ class Colour:
     (30, 0.5, 0.5)
 
     '''
-    h, s, l = self.__hsl
+    h, s, l = self.hsl
     return Colour((h, saturation, l), 'hsl', self.__a, self.__wref)
 
   def ColourWithLightness(self, lightness):
@@ -1659,7 +2567,7 @@ class Colour:
     (30, 1, 0.25)
 
     '''
-    h, s, l = self.__hsl
+    h, s, l = self.hsl
     return Colour((h, s, lightness), 'hsl', self.__a, self.__wref)
 
   def DarkerColour(self, level):
@@ -1679,7 +2587,7 @@ class Colour:
     (30, 1, 0.25)
 
     '''
-    h, s, l = self.__hsl
+    h, s, l = self.hsl
     return Colour((h, s, max(l - level, 0)), 'hsl', self.__a, self.__wref)
 
   def LighterColour(self, level):
@@ -1699,7 +2607,7 @@ class Colour:
     (30, 1, 0.75)
 
     '''
-    h, s, l = self.__hsl
+    h, s, l = self.hsl
     return Colour((h, s, min(l + level, 1)), 'hsl', self.__a, self.__wref)
 
   def Saturate(self, level):
@@ -1719,7 +2627,7 @@ class Colour:
     (30, 0.75, 0.5)
 
     '''
-    h, s, l = self.__hsl
+    h, s, l = self.hsl
     return Colour((h, min(s + level, 1), l), 'hsl', self.__a, self.__wref)
 
   def Desaturate(self, level):
@@ -1739,7 +2647,7 @@ class Colour:
     (30, 0.25, 0.5)
 
     '''
-    h, s, l = self.__hsl
+    h, s, l = self.hsl
     return Colour((h, max(s - level, 0), l), 'hsl', self.__a, self.__wref)
 
   def WebSafeDither(self):
@@ -1758,8 +2666,8 @@ class Colour:
 
     '''
     return (
-      Colour(Colour.RgbToWebSafe(*self.__rgb), 'rgb', self.__a, self.__wref),
-      Colour(Colour.RgbToWebSafe(alt=True, *self.__rgb), 'rgb', self.__a, self.__wref))
+      Colour(Colour.RgbToWebSafe(*self.rgb), 'rgb', self.__a, self.__wref),
+      Colour(Colour.RgbToWebSafe(alt=True, *self.rgb), 'rgb', self.__a, self.__wref))
 
   def Gradient(self, target, steps=100):
     '''Create a list with the gradient Colours between this and the other Colour.
@@ -1772,7 +2680,8 @@ class Colour:
 
 
     Returns:
-      A list of grapefruit.Colour instances.
+      A list of grapefruit.Colour instances. See grapefruit.ColourGradient
+      to compute the Colours on demand instead.
 
     >>> c1 = Colour.NewFromRgb(1.0, 0.0, 0.0, alpha=1)
     >>> c2 = Colour.NewFromRgb(0.0, 1.0, 0.0, alpha=0)
@@ -1781,8 +2690,8 @@ class Colour:
 
     '''
     gradient = []
-    rgba1 = self.__rgb + (self.__a,)
-    rgba2 = target.__rgb + (target.__a,)
+    rgba1 = self.rgb + (self.__a,)
+    rgba2 = target.rgb + (target.__a,)
 
     steps += 1
     for n in range(1, steps):
@@ -1813,7 +2722,7 @@ class Colour:
     (210, 1, 0.5)
 
     '''
-    h, s, l = self.__hsl
+    h, s, l = self.hsl
 
     if mode == 'ryb': h = Colour.RgbToRyb(h)
     h = (h+180)%360
@@ -1837,7 +2746,7 @@ class Colour:
       if (x-min) < thres: return x + plus
       else: return x-min
 
-    h, s, l = self.__hsl
+    h, s, l = self.hsl
 
     s1 = _wrap(s, 0.3, 0.1, 0.3)
     l1 = _wrap(l, 0.5, 0.2, 0.3)
@@ -1886,7 +2795,7 @@ class Colour:
     (230.0, 1, 0.5)
 
     '''
-    h, s, l = self.__hsl
+    h, s, l = self.hsl
     angle = min(angle, 120) / 2.0
 
     if mode == 'ryb': h = Colour.RgbToRyb(h)
@@ -1920,7 +2829,7 @@ class Colour:
     [(90, 1, 0.5), (210, 1, 0.5), (270, 1, 0.5)]
 
     '''
-    h, s, l = self.__hsl
+    h, s, l = self.hsl
 
     if mode == 'ryb': h = Colour.RgbToRyb(h)
     h1 = (h + 90 - angle) % 360
@@ -1963,7 +2872,7 @@ class Colour:
     (40, 1, 0.5)
 
     '''
-    h, s, l = self.__hsl
+    h, s, l = self.hsl
 
     if mode == 'ryb': h = Colour.RgbToRyb(h)
     h += 360
@@ -2004,8 +2913,8 @@ class Colour:
     # destination percentage is just the additive inverse
     da = 1.0 - sa
 
-    sr, sg, sb = [v * sa for v in self.__rgb]
-    dr, dg, db = [v * da for v in other.__rgb]
+    sr, sg, sb = [v * sa for v in self.rgb]
+    dr, dg, db = [v * da for v in other.rgb]
 
     return Colour((sr+dr, sg+dg, sb+db), 'rgb', fa, self.__wref)
 
@@ -2028,10 +2937,3543 @@ class Colour:
 
     '''
     dest = 1.0 - percent
-    rgb = tuple(((u * percent) + (v * dest) for u, v in zip(self.__rgb, other.__rgb)))
+    rgb = tuple(((u * percent) + (v * dest) for u, v in zip(self.rgb, other.rgb)))
     a = (self.__a * percent) + (other.__a * dest)
     return Colour(rgb, 'rgb', a, self.__wref)
 
+# The white references known by Colour, so that all the instances using the
+# same white point reference the same tuple.
+_INTERNED_WREF = {_DEFAULT_WREF: _DEFAULT_WREF}
+for _wref in Colour.WHITE_REFERENCE.values():
+  _INTERNED_WREF.setdefault(_wref, _wref)
+del _wref
+
+def _SrgbToLinear(v):
+  '''Remove the sRGB gamma correction from a component value.'''
+  return (v / 12.92) if v <= 0.03928 else ((v+0.055) / 1.055) **2.4
+
+def _LinearToSrgb(v):
+  '''Apply the sRGB gamma correction to a linear component value.'''
+  return (v * 12.92) if v <= _srgbGammaCorrInv else (1.055 * (v ** (1/2.4))) - 0.055
+
+# The lookup tables are only built when first used.
+_srgbDecodeTables = {}
+_srgbEncodeTable = array('d')
+
+def _SrgbDecodeTable(bits):
+  '''Return the table mapping the integer components to linear values.
+
+  Parameters:
+    :bits:
+      The number of bits of the integer components (8 or 16).
+
+  Returns:
+    An array('d') of 2**bits values, the item i being the linear value of
+    the component i / (2**bits - 1).
+
+  '''
+  table = _srgbDecodeTables.get(bits)
+  if table is None:
+    if bits not in (8, 16):
+      raise ValueError('Invalid component size: %r bits' % (bits,))
+    scale = float((1 << bits) - 1)
+    table = array('d', (_SrgbToLinear(i / scale) for i in range(1 << bits)))
+    _srgbDecodeTables[bits] = table
+  return table
+
+def _SrgbEncodeTable():
+  '''Return the table sampling the sRGB gamma correction over [0...1].
+
+  The item i is the encoded value of i / _SRGB_ENCODE_STEPS.
+
+  '''
+  if not _srgbEncodeTable:
+    steps = float(_SRGB_ENCODE_STEPS)
+    _srgbEncodeTable.extend((_LinearToSrgb(i / steps) for i in range(_SRGB_ENCODE_STEPS + 1)))
+  return _srgbEncodeTable
+
+def _Channel(values):
+  '''Return values as a float channel of the active array backend.'''
+  if numpy is not None:
+    return numpy.asarray(values, dtype=numpy.float64)
+  if isinstance(values, array) and values.typecode=='d':
+    return values
+  return array('d', values)
+
+def _Channels(*channels):
+  return tuple((_Channel(c) for c in channels))
+
+def _FastSrgbToLinear(v):
+  '''Remove the sRGB gamma correction from a NumPy channel, approximately.
+
+  The power is computed in single precision, the absolute error is less
+  than 4e-7.
+
+  '''
+  p = v.astype(numpy.float32)
+  p += numpy.float32(0.055)
+  p *= numpy.float32(1 / 1.055)
+  # The values of the linear segment are replaced afterwards, clamping them
+  # avoids the slow powers of zero and of the negative numbers.
+  numpy.maximum(p, numpy.float32(0.055 / 1.055), out=p)
+  numpy.power(p, numpy.float32(2.4), out=p)
+  linear = v / 12.92
+  numpy.copyto(linear, p, where=v > 0.03928)
+  return linear
+
+def _FastLinearToSrgb(v):
+  '''Apply the sRGB gamma correction to a NumPy channel, approximately.
+
+  The power is computed in single precision, the absolute error is less
+  than 2e-7.
+
+  '''
+  p = v.astype(numpy.float32)
+  numpy.maximum(p, numpy.float32(_srgbGammaCorrInv), out=p)
+  numpy.power(p, numpy.float32(1 / 2.4), out=p)
+  p *= numpy.float32(1.055)
+  p -= numpy.float32(0.055)
+  srgb = v * 12.92
+  numpy.copyto(srgb, p, where=v > _srgbGammaCorrInv)
+  return srgb
+
+def _ByteChannel(values):
+  '''Return values [0...1] as a channel of clamped and rounded 8 bits ints.
+
+  The channel is a NumPy uint8 array when NumPy is available, an
+  array('B') otherwise.
+
+  '''
+  if numpy is not None:
+    return numpy.clip(numpy.rint(numpy.asarray(values) * 255.0), 0, 255).astype(numpy.uint8)
+  def encode(v):
+    return min(255, max(0, int(round(v * 255))))
+  return array('B', map(encode, values))
+
+# The array typecode of the unsigned 32 bits integers.
+_UINT32 = array('I').itemsize >= 4 and 'I' or 'L'
+
+# The shifts of the (R, G, B) components and of the alpha in the packed 32
+# bits integers.
+_INT_FORMATS = {
+  'pil':  ((0, 8, 16), None),
+  'rgb':  ((16, 8, 0), None),
+  'argb': ((16, 8, 0), 24)}
+
+# The two hexadecimal digits of each 8 bits value.
+_HEX_BYTES = ['%02x' % v for v in range(256)]
+
+# The float value of each pair of hexadecimal digits, in either case.
+_HEX_VALUES = dict(((d0 + d1, v / 255.0) for v, h in enumerate(_HEX_BYTES)
+  for d0 in set((h[0], h[0].upper())) for d1 in set((h[1], h[1].upper()))))
+
+# The value of each ASCII character as an hexadecimal digit (-1 if it is not).
+_HEX_DIGITS = [-1] * 256
+for _i, _c in enumerate('0123456789abcdef'):
+  _HEX_DIGITS[ord(_c)] = _HEX_DIGITS[ord(_c.upper())] = _i
+del _i, _c
+
+def _IntByteOffset(shift, size):
+  '''Return the offset of the byte at shift in a native integer of size bytes.'''
+  if sys.byteorder=='little':
+    return shift // 8
+  return size - 1 - shift // 8
+
+# The (R, G, B) offsets and the alpha offset of the packed 8 bits layouts.
+_BUFFER_LAYOUTS = {
+  'rgb':  ((0, 1, 2), None),
+  'rgba': ((0, 1, 2), 3),
+  'bgr':  ((2, 1, 0), None),
+  'bgra': ((2, 1, 0), 3)}
+
+# The float values of the 8 bits components, shared by all the channels.
+_BYTE_VALUES = [i / 255.0 for i in range(256)]
+
+# The index [0...5] of the nearest web safe level (multiple of 51) of each
+# 8 bits component, the integer equivalent of Colour._WebSafeComponent.
+_WEB_SAFE_LEVEL = [(v + 25) // 51 for v in range(256)]
+
+# The error diffusion kernels: the (dx, dy, weight) of the neighbours
+# receiving the quantization error, and the sum the weights are relative to.
+_DITHER_KERNELS = {
+  'floydsteinberg': (((1, 0, 7), (-1, 1, 3), (0, 1, 5), (1, 1, 1)), 16),
+  'atkinson': (((1, 0, 1), (2, 0, 1), (-1, 1, 1), (0, 1, 1), (1, 1, 1), (0, 2, 1)), 8)}
+
+# The 8x8 Bayer matrix, as offsets [-25...25] added to the 8 bits components
+# before they are rounded to the nearest web safe level (51 apart).
+_BAYER_OFFSETS = [[((2*v + 1) * 51) // 128 - 25 for v in row] for row in (
+  (0, 32, 8, 40, 2, 34, 10, 42),
+  (48, 16, 56, 24, 50, 18, 58, 26),
+  (12, 44, 4, 36, 14, 46, 6, 38),
+  (60, 28, 52, 20, 62, 30, 54, 22),
+  (3, 35, 11, 43, 1, 33, 9, 41),
+  (51, 19, 59, 27, 49, 17, 57, 25),
+  (15, 47, 7, 39, 13, 45, 5, 37),
+  (63, 31, 55, 23, 61, 29, 53, 21))]
+
+# The coefficients of Colour.RgbToYuv/YuvToRgb and Colour.RgbToYiq/YiqToRgb:
+# the (Y, chroma, chroma) rows of the forward matrix and the (chroma, chroma)
+# terms added to Y to get back each of the R, G and B components.
+_VIDEO_COEFFICIENTS = {
+  'yuv': (
+    ((0.299, 0.587, 0.114),
+     (-0.14713, -0.28886, 0.436),
+     (0.615, -0.51499, -0.10001)),
+    ((0.0, 1.13983),
+     (-0.39465, -0.58060),
+     (2.03211, 0.0))),
+  'yiq': (
+    ((0.29895808, 0.58660979, 0.11443213),
+     (0.59590296, -0.27405705, -0.32184591),
+     (0.21133576, -0.52263517, 0.31129940)),
+    ((0.9562, 0.6210),
+     (-0.2717, -0.6485),
+     (-1.1053, 1.7020)))}
+
+# The number of fractional bits of the fixed-point video coefficients.
+_VIDEO_SHIFT = 16
+
+# The frame formats of the 8 bits video conversions.
+_VIDEO_FORMATS = ('yuv444', 'i420', 'nv12')
+
+def _VideoMatrix(forward, inverse):
+  '''Return the fixed-point coefficients of a video matrix.
+
+  The 8 bits Y is the luma scaled to [0...255], each 8 bits chroma is offset
+  by 128 and scaled so that its whole range (the largest value the forward
+  matrix can produce) spans [1...255].
+
+  Returns:
+    The (forward, inverse) integer coefficients, relative to the 8 bits
+    components and scaled by 2**_VIDEO_SHIFT.
+
+  '''
+  one = 1 << _VIDEO_SHIFT
+  ranges = [max(sum((k for k in row if k > 0)), -sum((k for k in row if k < 0)))
+    for row in forward[1:]]
+  scales = [1.0] + [127 / (255.0 * r) for r in ranges]
+  fwd = tuple((tuple((int(round(k * s * one)) for k in row)) for row, s in zip(forward, scales)))
+  inv = tuple((tuple((int(round(k * 255.0 * r / 127 * one)) for k, r in zip(row, ranges)))
+    for row in inverse))
+  return fwd, inv
+
+_VIDEO_MATRICES = dict(((k, _VideoMatrix(*v)) for k, v in _VIDEO_COEFFICIENTS.items()))
+
+def _VideoFrameSize(format, width, height):
+  '''Return the (size of the frame, chroma width, chroma height) of a frame.'''
+  if format not in _VIDEO_FORMATS:
+    raise ValueError('Invalid frame format: ' + format)
+  if width <= 0 or height <= 0:
+    raise ValueError('Invalid frame size: %dx%d' % (width, height))
+  if format=='yuv444':
+    cw, ch = width, height
+  else:
+    cw, ch = (width + 1) // 2, (height + 1) // 2
+  return width * height + 2 * cw * ch, cw, ch
+
+def _SumBlocks(values, width, height):
+  '''Sum the 2x2 blocks of a list of width*height values.
+
+  The last column and row are repeated when width or height is odd.
+
+  '''
+  sums = []
+  for y in range(0, height, 2):
+    r0 = y * width
+    r1 = min(y + 1, height - 1) * width
+    for x in range(0, width, 2):
+      x1 = min(x + 1, width - 1)
+      sums.append(values[r0 + x] + values[r0 + x1] + values[r1 + x] + values[r1 + x1])
+  return sums
+
+def _ArrayBytes(values):
+  '''Return the bytes of an array.array (tobytes is missing from Python 2).'''
+  if hasattr(values, 'tobytes'):
+    return values.tobytes()
+  return values.tostring()
+
+# Whether the memoryviews can be cast, they can't on Python 2 (where their
+# items are also strings instead of ints).
+_MEMORYVIEW_CAST = hasattr(memoryview, 'cast')
+
+def _ByteView(buffer, writable=False):
+  '''Return a flat view of the bytes of buffer, indexed by ints.
+
+  The view is a memoryview. On Python 2 it is buffer itself if it is a
+  bytearray, a bytearray copy of its bytes otherwise.
+
+  Throws:
+    :TypeError:
+      If writable is True, buffer is not a bytearray and the memoryviews
+      can't be cast (the writes would go to a copy).
+
+  '''
+  if not _MEMORYVIEW_CAST:
+    if isinstance(buffer, bytearray):
+      return buffer
+    if writable:
+      raise TypeError('The output buffer must be a bytearray')
+    if isinstance(buffer, array):
+      return bytearray(_ArrayBytes(buffer))
+    return bytearray(memoryview(buffer).tobytes())
+  view = memoryview(buffer)
+  if view.format!='B' or view.ndim!=1:
+    view = view.cast('B')
+  return view
+
+def _ByteTarget(out, size):
+  '''Return a writable bytes view of out (a new bytearray if None).'''
+  if out is None:
+    out = bytearray(size)
+  target = _ByteView(out, True)
+  if len(target)!=size:
+    raise ValueError('out must hold %d bytes' % size)
+  return out, target
+
+def _PackedView(buffer, layout, writable=False):
+  '''Return a bytes view of a packed pixels buffer and its layout.
+
+  Returns:
+    The (view, stride, offsets, alpha offset) tuple. The view is a NumPy
+    uint8 array when NumPy is available, a memoryview (or a bytearray, see
+    _ByteView) otherwise.
+
+  '''
+  if layout not in _BUFFER_LAYOUTS:
+    raise ValueError('Invalid buffer layout: ' + layout)
+  offsets, alpha = _BUFFER_LAYOUTS[layout]
+  stride = len(layout)
+  view = _ByteView(buffer, writable)
+  if len(view) % stride:
+    raise ValueError('The buffer size is not a multiple of the pixel size')
+  if numpy is not None:
+    view = numpy.frombuffer(view, dtype=numpy.uint8)
+  return view, stride, offsets, alpha
+
+def _DiffuseErrors(data, width, height, stride, offsets, kernel, divisor):
+  '''Dither packed 8 bits pixels to the web safe levels by error diffusion.
+
+  The errors are kept multiplied by divisor, and rounded half away from zero
+  when they are added to a pixel: rounding the negative errors down would
+  darken the image.
+
+  Parameters:
+    :data:
+      The bytes of the pixels.
+    :width, height:
+      The size of the image.
+    :stride, offsets:
+      The pixel size and the offsets of the R, G and B components.
+    :kernel, divisor:
+      The (dx, dy, weight) neighbours the error is diffused to, and the sum
+      the weights are relative to.
+
+  Returns:
+    The list of the (r, g, b) levels [0...5] of each pixel.
+
+  '''
+  level = _WEB_SAFE_LEVEL
+  depth = max((dy for dx, dy, w in kernel)) + 1
+  # The pending errors of the next rows, with a margin of 2 on each side.
+  rows = [[[0] * (width + 4) for o in offsets] for dy in range(depth)]
+  half = divisor // 2
+  levels = []
+  for y in range(height):
+    current = rows[0]
+    p = y * width * stride
+    for x in range(2, width + 2):
+      pixel = []
+      for c, o in enumerate(offsets):
+        e = current[c][x]
+        if e < 0:
+          v = data[p + o] - (half - e) // divisor
+        else:
+          v = data[p + o] + (e + half) // divisor
+        if v < 0: v = 0
+        elif v > 255: v = 255
+        l = level[v]
+        pixel.append(l)
+        e = v - l * 51
+        if e:
+          for dx, dy, w in kernel:
+            rows[dy][c][x + dx] += e * w
+      levels.append(tuple(pixel))
+      p += stride
+    rows = rows[1:] + [[[0] * (width + 4) for o in offsets]]
+  return levels
+
+def _ConvertChunk(fn, args, source, target, inputs, outputs, count, start, stop):
+  '''Convert the values [start:stop] of the channels held in shared memory.
+
+  This is the task run by the worker processes of ColourArray.ConvertParallel,
+  the source and target blocks hold the input and output channels one after
+  the other, as doubles. The blocks are unlinked by the parent process (the
+  workers share its resource tracker).
+
+  '''
+  source = shared_memory.SharedMemory(name=source)
+  target = shared_memory.SharedMemory(name=target)
+  try:
+    if numpy is not None:
+      src = numpy.ndarray((inputs, count), dtype=numpy.float64, buffer=source.buf)
+      dst = numpy.ndarray((outputs, count), dtype=numpy.float64, buffer=target.buf)
+      values = fn(*([c[start:stop] for c in src] + list(args)))
+      for i, v in enumerate(values):
+        dst[i, start:stop] = v
+      del src, dst
+    else:
+      src = source.buf.cast('d')
+      dst = target.buf.cast('d')
+      values = fn(*([array('d', src[i*count+start:i*count+stop]) for i in range(inputs)] + list(args)))
+      for i, v in enumerate(values):
+        dst[i*count+start:i*count+stop] = array('d', v)
+      src.release()
+      dst.release()
+  finally:
+    source.close()
+    target.close()
+
+def _MapChannels(fn, count, channels, *args):
+  '''Apply the scalar conversion fn to each element of channels.
+
+  This is the pure Python fallback used by the ColourArray conversions when
+  NumPy is not available.
+
+  Parameters:
+    :fn:
+      The scalar conversion function (one of the Colour static methods).
+    :count:
+      The number of channels returned by fn.
+    :channels:
+      A sequence of the input channels.
+    :args:
+      Extra arguments appended to each call of fn (e.g. the white reference).
+
+  Returns:
+    A tuple of count channels.
+
+  '''
+  cols = list(zip(*[fn(*(v + args)) for v in zip(*channels)]))
+  if not cols:
+    return tuple((array('d') for i in range(count)))
+  return tuple((array('d', c) for c in cols))
+
+def _ErrorReport(exact, approx):
+  '''Compare channels of approximated values with the exact ones.
+
+  Parameters:
+    :exact:
+      A sequence of the exact channels.
+    :approx:
+      A sequence of the approximated channels, in the same order.
+
+  Returns:
+    A dictionary holding the number of compared values (samples) and the
+    largest (max), mean (mean) and root mean square (rms) absolute errors of
+    each channel.
+
+  '''
+  report = {'samples': 0, 'max': [], 'mean': [], 'rms': []}
+  for e, a in zip(exact, approx):
+    errors = [abs(float(u) - float(v)) for u, v in zip(e, a)]
+    samples = report['samples'] = len(errors)
+    report['max'].append(max(errors))
+    report['mean'].append(sum(errors) / samples)
+    report['rms'].append(math.sqrt(sum((v*v for v in errors)) / samples))
+  return report
+
+class _KdTree(object):
+  '''A k-d tree holding points for the nearest neighbours queries.'''
+
+  def __init__(self, points):
+    '''Build the tree.
+
+    Parameters:
+      :points:
+        A sequence of points, all the points having the same dimension.
+
+    '''
+    self.__points = [tuple(p) for p in points]
+    self.__dims = len(self.__points[0]) if self.__points else 0
+    self.__root = self.__Build(list(range(len(self.__points))), 0)
+
+  def __Build(self, indices, depth):
+    '''Return the node (index, axis, left, right) splitting indices.'''
+    if not indices:
+      return None
+    axis = depth % self.__dims
+    points = self.__points
+    indices.sort(key=lambda i: points[i][axis])
+    m = len(indices) // 2
+    return (indices[m], axis,
+        self.__Build(indices[:m], depth + 1),
+        self.__Build(indices[m+1:], depth + 1))
+
+  def __len__(self):
+    return len(self.__points)
+
+  def Nearest(self, point, k=1):
+    '''Find the k points nearest to point.
+
+    Returns:
+      A list of (squared distance, index) tuples, the nearest first.
+
+    '''
+    points = self.__points
+    heap = []   # (-squared distance, index) of the k best points so far
+
+    def search(node):
+      if node is None: return
+      i, axis, left, right = node
+      d = sum(((u - v) * (u - v) for u, v in zip(point, points[i])))
+      if len(heap) < k:
+        heapq.heappush(heap, (-d, i))
+      elif d < -heap[0][0]:
+        heapq.heapreplace(heap, (-d, i))
+
+      diff = point[axis] - points[i][axis]
+      if diff < 0: near, far = left, right
+      else: near, far = right, left
+      search(near)
+      if len(heap) < k or (diff * diff) < -heap[0][0]:
+        search(far)
+
+    search(self.__root)
+    return sorted(((-d, i) for d, i in heap))
+
+def _NearestBrute(queries, points, k=1, budget=1<<20):
+  '''Find the k points nearest to each query by computing all the distances.
+
+  NumPy only, the distances are computed a chunk of queries at a time so that
+  at most budget distances are held in memory.
+
+  Parameters:
+    :queries:
+      A (n, d) array of points.
+    :points:
+      A (p, d) array of points.
+    :k:
+      The number of points to find for each query.
+    :budget:
+      The number of distances computed at once.
+
+  Returns:
+    The (n, k) arrays of indices and of squared distances, nearest first.
+
+  '''
+  k = min(k, len(points))
+  chunk = max(1, budget // max(1, len(points)))
+  indices = numpy.empty((len(queries), k), dtype=numpy.intp)
+  distances = numpy.empty((len(queries), k))
+
+  # |q - p|² = |q|² - 2q.p + |p|², the |q|² term does not change the ranking
+  # and is only added to the distances kept.
+  pp = (points * points).sum(axis=1)
+  pt = -2.0 * points.T
+  for start in range(0, len(queries), chunk):
+    q = queries[start:start+chunk]
+    d = numpy.dot(q, pt)
+    d += pp
+    if k==1:
+      best = d.argmin(axis=1)[:, numpy.newaxis]
+    elif k < len(points):
+      best = numpy.argpartition(d, k - 1, axis=1)[:, :k]
+    else:
+      best = numpy.tile(numpy.arange(len(points)), (len(q), 1))
+    bestd = numpy.take_along_axis(d, best, axis=1)
+    bestd += (q * q).sum(axis=1)[:, numpy.newaxis]
+    numpy.maximum(bestd, 0.0, out=bestd)
+    order = numpy.argsort(bestd, axis=1, kind='stable')
+    indices[start:start+chunk] = numpy.take_along_axis(best, order, axis=1)
+    distances[start:start+chunk] = numpy.take_along_axis(bestd, order, axis=1)
+  return indices, distances
+
+def _MedianCut(points, count):
+  '''Split points in at most count boxes with the median cut algorithm.
+
+  The box with the widest range along one of its axes is split at its median
+  along that axis, until there are count boxes or no box can be split.
+
+  Parameters:
+    :points:
+      A list of points (tuples).
+    :count:
+      The number of boxes to create.
+
+  Returns:
+    A list of (population, mean point) tuples, one for each box.
+
+  '''
+  def widest(box):
+    ranges = [max(c) - min(c) for c in zip(*box)]
+    axis = ranges.index(max(ranges))
+    return (ranges[axis], axis)
+
+  boxes = [(widest(points), points)]
+  while len(boxes) < count:
+    (extent, axis), box = max(boxes, key=lambda b: b[0][0])
+    if extent <= 0:
+      break
+    boxes.remove(((extent, axis), box))
+    box = sorted(box, key=lambda p: p[axis])
+    m = len(box) // 2
+    boxes.extend(((widest(b), b) for b in (box[:m], box[m:])))
+  return [(len(b), tuple((sum(c) / len(b) for c in zip(*b)))) for e, b in boxes]
+
+def _KMeans(points, count, iterations, tolerance, rnd):
+  '''Cluster points with the k-means algorithm, seeded with k-means++.
+
+  Parameters:
+    :points:
+      A (n, d) NumPy array or a list of points (tuples).
+    :count:
+      The number of clusters.
+    :iterations:
+      The maximum number of Lloyd iterations.
+    :tolerance:
+      The iterations stop early when no centre moves more than this.
+    :rnd:
+      The random.Random instance used to pick the initial centres.
+
+  Returns:
+    A list of (population, centre) tuples for the non empty clusters.
+
+  '''
+  def sqdist(p, q):
+    return sum(((u - v) * (u - v) for u, v in zip(p, q)))
+
+  # k-means++: the next centre is a point picked with a probability
+  # proportional to its squared distance to the nearest centre.
+  n = len(points)
+  centres = [points[rnd.randrange(n)]]
+  if numpy is not None:
+    d2 = ((points - centres[0])**2).sum(axis=1)
+  else:
+    d2 = [sqdist(p, centres[0]) for p in points]
+  while len(centres) < count:
+    total = float(sum(d2))
+    if total <= 0:
+      break
+    target = rnd.random() * total
+    if numpy is not None:
+      i = min(int(numpy.searchsorted(numpy.cumsum(d2), target, side='right')), n - 1)
+      centres.append(points[i])
+      d2 = numpy.minimum(d2, ((points - points[i])**2).sum(axis=1))
+    else:
+      acc = 0.0
+      for i, d in enumerate(d2):
+        acc += d
+        if acc > target: break
+      centres.append(points[i])
+      d2 = [min(d, sqdist(p, points[i])) for d, p in zip(d2, points)]
+
+  if numpy is not None:
+    centres = numpy.array(centres)
+    for it in range(iterations + 1):
+      labels = _NearestBrute(points, centres)[0][:, 0]
+      counts = numpy.bincount(labels, minlength=len(centres))
+      if it==iterations:
+        break
+      sums = numpy.column_stack([numpy.bincount(labels, points[:, axis], len(centres)) for axis in range(points.shape[1])])
+      moved = centres.copy()
+      filled = counts > 0
+      moved[filled] = sums[filled] / counts[filled, numpy.newaxis]
+      shift = ((moved - centres)**2).sum(axis=1).max()
+      centres = moved
+      if shift <= tolerance * tolerance:
+        labels = _NearestBrute(points, centres)[0][:, 0]
+        counts = numpy.bincount(labels, minlength=len(centres))
+        break
+    return [(int(c), tuple(centre.tolist())) for c, centre in zip(counts, centres) if c]
+
+  centres = [tuple(c) for c in centres]
+  for it in range(iterations + 1):
+    clusters = [[] for c in centres]
+    for p in points:
+      clusters[min(range(len(centres)), key=lambda i: sqdist(p, centres[i]))].append(p)
+    if it==iterations:
+      break
+    moved = [c and tuple((sum(v) / len(c) for v in zip(*c))) or centre for c, centre in zip(clusters, centres)]
+    shift = max((sqdist(c, m) for c, m in zip(centres, moved)))
+    centres = moved
+    if shift <= tolerance * tolerance:
+      clusters = [[] for c in centres]
+      for p in points:
+        clusters[min(range(len(centres)), key=lambda i: sqdist(p, centres[i]))].append(p)
+      break
+  return [(len(c), centre) for c, centre in zip(clusters, centres) if c]
+
+def _CieLab(l, a, b):
+  '''Scale the a* and b* components (scalars or channels) to the CIE range.'''
+  return (l, a * _LAB_AB_SCALE, b * _LAB_AB_SCALE)
+
+def _DeltaE76(l1, a1, b1, l2, a2, b2):
+  '''Return the CIE76 colour difference of two CIE-LAB values (CIE scale).'''
+  return math.sqrt((l1-l2)**2 + (a1-a2)**2 + (b1-b2)**2)
+
+def _DeltaE94(l1, a1, b1, l2, a2, b2):
+  '''Return the CIE94 colour difference (graphic arts weights).'''
+  c1 = math.sqrt(a1*a1 + b1*b1)
+  c2 = math.sqrt(a2*a2 + b2*b2)
+  dl = l1 - l2
+  dc = c1 - c2
+  dh2 = max(0.0, (a1-a2)**2 + (b1-b2)**2 - dc*dc)
+  sc = 1 + 0.045*c1
+  sh = 1 + 0.015*c1
+  return math.sqrt(dl*dl + (dc/sc)**2 + dh2/(sh*sh))
+
+def _DeltaE2000(l1, a1, b1, l2, a2, b2):
+  '''Return the CIEDE2000 colour difference (kL = kC = kH = 1).'''
+  cm = (math.sqrt(a1*a1 + b1*b1) + math.sqrt(a2*a2 + b2*b2)) / 2
+  cm7 = cm**7
+  g = 0.5 * (1 - math.sqrt(cm7 / (cm7 + _25_POW_7)))
+  a1 *= 1 + g
+  a2 *= 1 + g
+  c1 = math.sqrt(a1*a1 + b1*b1)
+  c2 = math.sqrt(a2*a2 + b2*b2)
+  h1 = math.degrees(math.atan2(b1, a1)) % 360
+  h2 = math.degrees(math.atan2(b2, a2)) % 360
+
+  dl = l2 - l1
+  dc = c2 - c1
+  if c1*c2==0:
+    dh = 0.0
+    hm = h1 + h2
+  else:
+    dh = h2 - h1
+    hm = h1 + h2
+    if dh > 180: dh -= 360
+    elif dh < -180: dh += 360
+    if abs(h1 - h2) > 180:
+      hm += (hm < 360) and 360 or -360
+    hm /= 2
+  dhh = 2 * math.sqrt(c1*c2) * math.sin(math.radians(dh / 2))
+
+  lm = (l1 + l2) / 2 - 50
+  cm = (c1 + c2) / 2
+  cm7 = cm**7
+  t = (1 - 0.17*math.cos(math.radians(hm - 30)) + 0.24*math.cos(math.radians(2*hm))
+      + 0.32*math.cos(math.radians(3*hm + 6)) - 0.20*math.cos(math.radians(4*hm - 63)))
+  dtheta = 30 * math.exp(-((hm - 275) / 25)**2)
+  rt = -2 * math.sqrt(cm7 / (cm7 + _25_POW_7)) * math.sin(math.radians(2*dtheta))
+  sl = 1 + 0.015*lm*lm / math.sqrt(20 + lm*lm)
+  sc = 1 + 0.045*cm
+  sh = 1 + 0.015*cm*t
+  dl /= sl
+  dc /= sc
+  dhh /= sh
+  return math.sqrt(dl*dl + dc*dc + dhh*dhh + rt*dc*dhh)
+
+def _CieLabChannels(lab):
+  '''Return the NumPy channels (or scalars) of lab scaled to the CIE range.'''
+  return _CieLab(*[numpy.asarray(c, dtype=numpy.float64) for c in lab])
+
+_DELTA_E = {
+  'cie76': _DeltaE76,
+  'cie94': _DeltaE94,
+  'ciede2000': _DeltaE2000}
+
+def _DeltaEFunction(formula):
+  '''Return the scalar function computing the formula colour difference.'''
+  try:
+    return _DELTA_E[formula]
+  except KeyError:
+    raise ValueError('Invalid colour difference formula: %s' % formula)
+
+def _DeltaEArrays(l1, a1, b1, l2, a2, b2, formula):
+  '''NumPy version of the colour differences, for broadcastable arrays.'''
+  _DeltaEFunction(formula)
+  if formula=='cie76':
+    return numpy.sqrt((l1-l2)**2 + (a1-a2)**2 + (b1-b2)**2)
+
+  if formula=='cie94':
+    c1 = numpy.hypot(a1, b1)
+    dc = c1 - numpy.hypot(a2, b2)
+    dh2 = numpy.maximum((a1-a2)**2 + (b1-b2)**2 - dc*dc, 0)
+    sc = 1 + 0.045*c1
+    sh = 1 + 0.015*c1
+    return numpy.sqrt((l1-l2)**2 + (dc/sc)**2 + dh2/(sh*sh))
+
+  cm = (numpy.hypot(a1, b1) + numpy.hypot(a2, b2)) / 2
+  cm7 = cm**7
+  g = 1.5 - 0.5*numpy.sqrt(cm7 / (cm7 + _25_POW_7))
+  a1 = a1 * g
+  a2 = a2 * g
+  c1 = numpy.hypot(a1, b1)
+  c2 = numpy.hypot(a2, b2)
+  h1 = numpy.degrees(numpy.arctan2(b1, a1)) % 360
+  h2 = numpy.degrees(numpy.arctan2(b2, a2)) % 360
+
+  dl = l2 - l1
+  dc = c2 - c1
+  c12 = c1 * c2
+  dh = h2 - h1
+  dh = dh - 360*(dh > 180) + 360*(dh < -180)
+  dh = numpy.where(c12==0, 0.0, dh)
+  hm = h1 + h2
+  wrap = (c12!=0) & (numpy.abs(h1 - h2) > 180)
+  hm = hm + numpy.where(wrap, numpy.where(hm < 360, 360.0, -360.0), 0.0)
+  hm = numpy.where(c12==0, hm, hm / 2)
+  dhh = 2 * numpy.sqrt(c12) * numpy.sin(numpy.radians(dh / 2))
+
+  lm = (l1 + l2) / 2 - 50
+  cm = (c1 + c2) / 2
+  cm7 = cm**7
+  t = (1 - 0.17*numpy.cos(numpy.radians(hm - 30)) + 0.24*numpy.cos(numpy.radians(2*hm))
+      + 0.32*numpy.cos(numpy.radians(3*hm + 6)) - 0.20*numpy.cos(numpy.radians(4*hm - 63)))
+  dtheta = 30 * numpy.exp(-((hm - 275) / 25)**2)
+  rt = -2 * numpy.sqrt(cm7 / (cm7 + _25_POW_7)) * numpy.sin(numpy.radians(2*dtheta))
+  dl = dl / (1 + 0.015*lm*lm / numpy.sqrt(20 + lm*lm))
+  dc = dc / (1 + 0.045*cm)
+  dhh = dhh / (1 + 0.015*cm*t)
+  return numpy.sqrt(dl*dl + dc*dc + dhh*dhh + rt*dc*dhh)
+
+# The named Colours index is only built when first used.
+_namedColourIndex = []
+
+def _NamedColourIndex():
+  '''Return the names, L*a*b* values and k-d tree of Colour.NAMED_Colour.'''
+  if not _namedColourIndex:
+    byValue = {}
+    for name in sorted(Colour.NAMED_Colour):
+      byValue.setdefault(Colour.NAMED_Colour[name], name)
+    names = sorted(byValue.values())
+    labs = [_CieLab(*Colour.XyzToLab(*Colour.RgbToXyz(*Colour.HtmlToRgb(Colour.NAMED_Colour[n])))) for n in names]
+    _namedColourIndex.extend((names, labs, _KdTree(labs)))
+  return _namedColourIndex
+
+class ColourArray(object):
+  '''Hold a batch of Colour values as a structure of arrays.
+
+  A ColourArray stores the RGB components of many Colours as three separate
+  channels (NumPy arrays when NumPy is available, array.array('d') otherwise)
+  and converts them all at once, without creating a grapefruit.Colour
+  instance per value.
+
+  The static conversion methods mirror the Colour ones but take and return
+  channels instead of scalars, so ColourArray.RgbToHsl(r, g, b) computes the
+  same values as Colour.RgbToHsl for each (r, g, b) triplet.
+
+  Example usage:
+
+    >>> ca = ColourArray.NewFromRgb((1, 0), (0.5, 0), (0, 1))
+    >>> len(ca)
+    2
+    >>> h, s, l = ca.ToHsl()
+    >>> ['(%g, %g, %g)' % v for v in zip(h, s, l)]
+    ['(30, 1, 0.5)', '(240, 1, 0.5)']
+    >>> ca[0]
+    (1.0, 0.5, 0.0, 1.0)
+
+  '''
+
+  def __init__(self, values, mode='rgb', alpha=None, wref=_DEFAULT_WREF):
+    '''Instantiate a new grapefruit.ColourArray object.
+
+    Parameters:
+      :values:
+        A tuple of three channels holding the Colour values in the specified
+        representation.
+      :mode:
+        The representation mode used for values (rgb/hsl).
+      :alpha:
+        The alpha channel, None if all the Colours are opaque.
+      :wref:
+        The whitepoint reference, default is 2° D65.
+
+    '''
+    if not(isinstance(values, tuple)) or len(values)!=3:
+      raise TypeError('values must be a tuple of three channels')
+
+    if mode=='rgb':
+      self.__rgb = _Channels(*values)
+    elif mode=='hsl':
+      self.__rgb = ColourArray.HslToRgb(*values)
+    else:
+      raise ValueError('Invalid Colour mode: ' + mode)
+
+    if len(set((len(c) for c in self.__rgb)))!=1:
+      raise ValueError('all the channels must have the same length')
+
+    if alpha is not None:
+      alpha = _Channel(alpha)
+      if len(alpha)!=len(self.__rgb[0]):
+        raise ValueError('all the channels must have the same length')
+
+    self.__a = alpha
+    self.__wref = wref
+
+  def __len__(self):
+    return len(self.__rgb[0])
+
+  def __getitem__(self, index):
+    if isinstance(index, slice):
+      r, g, b = [c[index] for c in self.__rgb]
+      a = self.__a
+      if a is not None: a = a[index]
+      return ColourArray((r, g, b), 'rgb', a, self.__wref)
+
+    rgb = tuple((float(c[index]) for c in self.__rgb))
+    if self.__a is None: a = 1.0
+    else: a = float(self.__a[index])
+    return Colour(rgb, 'rgb', a, self.__wref)
+
+  def __iter__(self):
+    for i in range(len(self)):
+      yield self[i]
+
+  def __repr__(self):
+    return 'ColourArray(%r)' % list(self)
+
+  @staticmethod
+  def RgbToHsl(r, g, b):
+    '''Convert channels of RGB values to HSL.
+
+    Batch version of :meth:`Colour.RgbToHsl`.
+
+    >>> h, s, l = ColourArray.RgbToHsl((1, 0.75), (0.5, 0.5), (0, 0))
+    >>> ['(%g, %g, %g)' % v for v in zip(h, s, l)]
+    ['(30, 1, 0.5)', '(40, 1, 0.375)']
+
+    '''
+    if numpy is None:
+      return _MapChannels(Colour.RgbToHsl, 3, (r, g, b))
+
+    r, g, b = _Channels(r, g, b)
+    minVal = numpy.minimum(numpy.minimum(r, g), b)
+    maxVal = numpy.maximum(numpy.maximum(r, g), b)
+
+    l = (maxVal + minVal) / 2.0
+    d = maxVal - minVal
+    grey = (d==0)
+
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+      s = numpy.where(l < 0.5, d / (maxVal + minVal), d / (2.0 - maxVal - minVal))
+      dr, dg, db = [(maxVal-val) / d for val in (r, g, b)]
+
+    h = numpy.where(r==maxVal, db - dg,
+        numpy.where(g==maxVal, 2.0 + dr - db, 4.0 + dg - dr))
+    h = (h*60.0) % 360.0
+
+    return (numpy.where(grey, 0.0, h), numpy.where(grey, 0.0, s), l)
+
+  @staticmethod
+  def _HueToRgb(n1, n2, h):
+    h = h % 6.0
+    return numpy.where(h < 1.0, n1 + ((n2-n1) * h),
+        numpy.where(h < 3.0, n2,
+        numpy.where(h < 4.0, n1 + ((n2-n1) * (4.0 - h)), n1)))
+
+  @staticmethod
+  def HslToRgb(h, s, l):
+    '''Convert channels of HSL values to RGB.
+
+    Batch version of :meth:`Colour.HslToRgb`.
+
+    >>> r, g, b = ColourArray.HslToRgb((30, 0), (1, 0), (0.5, 0.25))
+    >>> ['(%g, %g, %g)' % v for v in zip(r, g, b)]
+    ['(1, 0.5, 0)', '(0.25, 0.25, 0.25)']
+
+    '''
+    if numpy is None:
+      return _MapChannels(Colour.HslToRgb, 3, (h, s, l))
+
+    h, s, l = _Channels(h, s, l)
+    n2 = numpy.where(l < 0.5, l * (1.0 + s), l+s - (l*s))
+    n1 = (2.0 * l) - n2
+
+    h = h / 60.0
+    hueToRgb = ColourArray._HueToRgb
+    grey = (s==0)
+    r = numpy.where(grey, l, hueToRgb(n1, n2, h + 2))
+    g = numpy.where(grey, l, hueToRgb(n1, n2, h))
+    b = numpy.where(grey, l, hueToRgb(n1, n2, h - 2))
+    return (r, g, b)
+
+  @staticmethod
+  def RgbToHsv(r, g, b):
+    '''Convert channels of RGB values to HSV.
+
+    Batch version of :meth:`Colour.RgbToHsv`.
+
+    >>> h, s, v = ColourArray.RgbToHsv((1,), (0.5,), (0,))
+    >>> ['(%g, %g, %g)' % c for c in zip(h, s, v)]
+    ['(30, 1, 1)']
+
+    '''
+    if numpy is None:
+      return _MapChannels(Colour.RgbToHsv, 3, (r, g, b))
+
+    r, g, b = _Channels(r, g, b)
+    v = numpy.maximum(numpy.maximum(r, g), b)
+    d = v - numpy.minimum(numpy.minimum(r, g), b)
+    grey = (d==0)
+
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+      s = d / v
+      dr, dg, db = [(v - val) / d for val in (r, g, b)]
+
+    h = numpy.where(r==v, db - dg,
+        numpy.where(g==v, 2.0 + dr - db, 4.0 + dg - dr))
+    h = (h*60.0) % 360.0
+
+    return (numpy.where(grey, 0.0, h), numpy.where(grey, 0.0, s), v)
+
+  @staticmethod
+  def HsvToRgb(h, s, v):
+    '''Convert channels of HSV values to RGB.
+
+    Batch version of :meth:`Colour.HsvToRgb`.
+
+    >>> r, g, b = ColourArray.HsvToRgb((30,), (1,), (1,))
+    >>> ['(%g, %g, %g)' % c for c in zip(r, g, b)]
+    ['(1, 0.5, 0)']
+
+    '''
+    if numpy is None:
+      return _MapChannels(Colour.HsvToRgb, 3, (h, s, v))
+
+    h, s, v = _Channels(h, s, v)
+    h = (h / 60.0) % 6.0
+
+    i = numpy.floor(h)
+    f = h - i
+    f = numpy.where(i % 2==0, 1-f, f)   # if i is even
+
+    m = v * (1.0 - s)
+    n = v * (1.0 - (s * f))
+
+    cases = [i==0, i==1, i==2, i==3, i==4]
+    grey = (s==0)
+    r = numpy.where(grey, v, numpy.select(cases, [v, n, m, m, n], v))
+    g = numpy.where(grey, v, numpy.select(cases, [n, v, v, n, m], m))
+    b = numpy.where(grey, v, numpy.select(cases, [m, m, n, v, v], n))
+    return (r, g, b)
+
+  @staticmethod
+  def RgbToYiq(r, g, b):
+    '''Convert channels of RGB values to YIQ.
+
+    Batch version of :meth:`Colour.RgbToYiq`.
+
+    >>> y, i, q = ColourArray.RgbToYiq((1,), (0.5,), (0,))
+    >>> ['(%g, %g, %g)' % v for v in zip(y, i, q)]
+    ['(0.592263, 0.458874, -0.0499818)']
+
+    '''
+    if numpy is None:
+      return _MapChannels(Colour.RgbToYiq, 3, (r, g, b))
+
+    r, g, b = _Channels(r, g, b)
+    y = (r * 0.29895808) + (g * 0.58660979) + (b *0.11443213)
+    i = (r * 0.59590296) - (g * 0.27405705) - (b *0.32184591)
+    q = (r * 0.21133576) - (g * 0.52263517) + (b *0.31129940)
+    return (y, i, q)
+
+  @staticmethod
+  def YiqToRgb(y, i, q):
+    '''Convert channels of YIQ values to RGB.
+
+    Batch version of :meth:`Colour.YiqToRgb`.
+
+    '''
+    if numpy is None:
+      return _MapChannels(Colour.YiqToRgb, 3, (y, i, q))
+
+    y, i, q = _Channels(y, i, q)
+    r = y + (i * 0.9562) + (q * 0.6210)
+    g = y - (i * 0.2717) - (q * 0.6485)
+    b = y - (i * 1.1053) + (q * 1.7020)
+    return (r, g, b)
+
+  @staticmethod
+  def RgbToYuv(r, g, b):
+    '''Convert channels of RGB values to YUV.
+
+    Batch version of :meth:`Colour.RgbToYuv`.
+
+    >>> y, u, v = ColourArray.RgbToYuv((1,), (0.5,), (0,))
+    >>> ['(%g, %g, %g)' % c for c in zip(y, u, v)]
+    ['(0.5925, -0.29156, 0.357505)']
+
+    '''
+    if numpy is None:
+      return _MapChannels(Colour.RgbToYuv, 3, (r, g, b))
+
+    r, g, b = _Channels(r, g, b)
+    y =  (r * 0.29900) + (g * 0.58700) + (b * 0.11400)
+    u = -(r * 0.14713) - (g * 0.28886) + (b * 0.43600)
+    v =  (r * 0.61500) - (g * 0.51499) - (b * 0.10001)
+    return (y, u, v)
+
+  @staticmethod
+  def YuvToRgb(y, u, v):
+    '''Convert channels of YUV values to RGB.
+
+    Batch version of :meth:`Colour.YuvToRgb`.
+
+    '''
+    if numpy is None:
+      return _MapChannels(Colour.YuvToRgb, 3, (y, u, v))
+
+    y, u, v = _Channels(y, u, v)
+    r = y + (v * 1.13983)
+    g = y - (u * 0.39465) - (v * 0.58060)
+    b = y + (u * 2.03211)
+    return (r, g, b)
+
+  @staticmethod
+  def RgbToXyz(r, g, b, fast=None):
+    '''Convert channels of sRGB values to CIE XYZ.
+
+    Batch version of :meth:`Colour.RgbToXyz`. With NumPy, the fast
+    computation removes the gamma correction in single precision: it is
+    about twice as fast, the absolute error being less than 4e-7 (see
+    :meth:`FastMathAccuracy`). Without NumPy, fast is ignored: a single power
+    is already the fastest way to remove the gamma correction in Python.
+
+    >>> x, y, z = ColourArray.RgbToXyz((1,), (0.5,), (0,))
+    >>> ['(%g, %g, %g)' % v for v in zip(x, y, z)]
+    ['(0.488941, 0.365682, 0.0448137)']
+    >>> x, y, z = ColourArray.RgbToXyz((1,), (0.5,), (0,), fast=True)
+    >>> ['(%.5f, %.5f, %.5f)' % v for v in zip(x, y, z)]
+    ['(0.48894, 0.36568, 0.04481)']
+
+    '''
+    if numpy is None:
+      return _MapChannels(Colour.RgbToXyz, 3, (r, g, b))
+
+    if fast or (fast is None and Colour.FAST_MATH):
+      r, g, b = [_FastSrgbToLinear(v) for v in _Channels(r, g, b)]
+    else:
+      with numpy.errstate(invalid='ignore'):
+        r, g, b = [numpy.where(v <= 0.03928, v / 12.92, ((v+0.055) / 1.055) **2.4) for v in _Channels(r, g, b)]
+
+    x = (r * 0.4124) + (g * 0.3576) + (b * 0.1805)
+    y = (r * 0.2126) + (g * 0.7152) + (b * 0.0722)
+    z = (r * 0.0193) + (g * 0.1192) + (b * 0.9505)
+    return (x, y, z)
+
+  @staticmethod
+  def IntTupleToXyz(r, g, b, bits=8):
+    '''Convert channels of integer sRGB values to CIE XYZ.
+
+    Batch version of :meth:`Colour.IntTupleToXyz`, the channels hold
+    integers in the range [0...2**bits-1].
+
+    >>> x, y, z = ColourArray.IntTupleToXyz((255,), (128,), (0,))
+    >>> ['(%g, %g, %g)' % v for v in zip(x, y, z)]
+    ['(0.489592, 0.366983, 0.0450306)']
+
+    '''
+    if numpy is None:
+      return _MapChannels(lambda *v: Colour.IntTupleToXyz(v, bits), 3, (r, g, b))
+
+    table = numpy.frombuffer(_SrgbDecodeTable(bits), dtype=numpy.float64)
+    r, g, b = [table[numpy.asarray(c, dtype=numpy.intp)] for c in (r, g, b)]
+
+    x = (r * 0.4124) + (g * 0.3576) + (b * 0.1805)
+    y = (r * 0.2126) + (g * 0.7152) + (b * 0.0722)
+    z = (r * 0.0193) + (g * 0.1192) + (b * 0.9505)
+    return (x, y, z)
+
+  @staticmethod
+  def XyzToRgb(x, y, z, lut=False, fast=None):
+    '''Convert channels of CIE XYZ values to sRGB.
+
+    Batch version of :meth:`Colour.XyzToRgb`. The lut parameter is only used
+    without NumPy, the vectorized computation being faster than the table.
+    With NumPy, the fast computation applies the gamma correction in single
+    precision, the absolute error being less than 2e-7. Without NumPy, fast
+    is ignored (see :meth:`RgbToXyz`).
+
+    '''
+    if numpy is None:
+      return _MapChannels(Colour.XyzToRgb, 3, (x, y, z), lut)
+
+    x, y, z = _Channels(x, y, z)
+    r =  (x * 3.2406255) - (y * 1.5372080) - (z * 0.4986286)
+    g = -(x * 0.9689307) + (y * 1.8757561) + (z * 0.0415175)
+    b =  (x * 0.0557101) - (y * 0.2040211) + (z * 1.0569959)
+    if fast or (fast is None and Colour.FAST_MATH):
+      return (_FastLinearToSrgb(r), _FastLinearToSrgb(g), _FastLinearToSrgb(b))
+    with numpy.errstate(invalid='ignore'):
+      return tuple((numpy.where(v <= _srgbGammaCorrInv, v * 12.92, (1.055 * (v ** (1/2.4))) - 0.055) for v in (r, g, b)))
+
+  @staticmethod
+  def XyzToLab(x, y, z, wref=_DEFAULT_WREF, fast=None):
+    '''Convert channels of CIE XYZ values to CIE L*a*b*.
+
+    Batch version of :meth:`Colour.XyzToLab`. With NumPy, the fast
+    computation uses numpy.cbrt instead of a power, the results only differ
+    by rounding errors. Without NumPy, fast is ignored.
+
+    >>> l, a, b = ColourArray.XyzToLab((0.488941,), (0.365682,), (0.0448137,))
+    >>> ['(%g, %g, %g)' % v for v in zip(l, a, b)]
+    ['(66.9518, 0.43084, 0.739692)']
+
+    '''
+    if numpy is None:
+      return _MapChannels(Colour.XyzToLab, 3, (x, y, z), wref)
+
+    x, y, z = _Channels(x, y, z)
+
+    # White point correction
+    x = x / wref[0]
+    y = y / wref[1]
+    z = z / wref[2]
+
+    # Nonlinear distortion and linear transformation
+    if fast or (fast is None and Colour.FAST_MATH):
+      channels = []
+      for v in (x, y, z):
+        f = (7.787 * v) + _sixteenHundredsixteenth
+        numpy.copyto(f, numpy.cbrt(v), where=v > 0.008856)
+        channels.append(f)
+      x, y, z = channels
+    else:
+      with numpy.errstate(invalid='ignore'):
+        x, y, z = [numpy.where(v > 0.008856, v**_oneThird, (7.787 * v) + _sixteenHundredsixteenth) for v in (x, y, z)]
+
+    # Vector scaling
+    l = (116 * y) - 16
+    a = 5.0 * (x - y)
+    b = 2.0 * (y - z)
+
+    return (l, a, b)
+
+  @staticmethod
+  def LabToXyz(l, a, b, wref=_DEFAULT_WREF, fast=None):
+    '''Convert channels of CIE L*a*b* values to CIE XYZ.
+
+    Batch version of :meth:`Colour.LabToXyz`. The fast computation uses
+    multiplications instead of a power, the results only differ by rounding
+    errors.
+
+    '''
+    if numpy is None:
+      return _MapChannels(Colour.LabToXyz, 3, (l, a, b), wref, fast)
+
+    l, a, b = _Channels(l, a, b)
+    y = (l + 16) / 116
+    x = (a / 5.0) + y
+    z = y - (b / 2.0)
+    if fast or (fast is None and Colour.FAST_MATH):
+      channels = []
+      for v, w in zip((x, y, z), wref):
+        f = (v - _sixteenHundredsixteenth) / 7.787
+        numpy.copyto(f, v*v*v, where=v > 0.206893)
+        f *= w
+        channels.append(f)
+      return tuple(channels)
+    return tuple((numpy.where(v > 0.206893, v**3, (v - _sixteenHundredsixteenth) / 7.787) * w for v, w in zip((x, y, z), wref)))
+
+  @staticmethod
+  def FastMathAccuracy(samples=4096, seed=0):
+    '''Compare the fast approximate conversions with the exact ones.
+
+    Random RGB values are converted to CIE XYZ and L*a*b* (and back), with
+    and without the fast computation of :meth:`RgbToXyz`,
+    :meth:`XyzToRgb`, :meth:`XyzToLab` and :meth:`LabToXyz`.
+
+    Parameters:
+      :samples:
+        The number of random Colours to compare.
+      :seed:
+        The seed of the random generator, so that the reports can be compared.
+
+    Returns:
+      A dictionary holding, for each of the four conversions, the error
+      report of its channels (the samples, max, mean and rms keys, as in
+      :meth:`ColourLut.Accuracy`), and under the deltaE key the largest
+      (max) and mean (mean) CIE76 colour difference between the exact and
+      fast L*a*b* values of the RGB Colours.
+
+    >>> report = ColourArray.FastMathAccuracy(1000)
+    >>> report['deltaE']['max'] < 0.01
+    True
+    >>> max(report['XyzToRgb']['max']) < 1e-6
+    True
+
+    '''
+    rnd = random.Random(seed)
+    r, g, b = [[rnd.random() for i in range(samples)] for c in range(3)]
+
+    xyz = ColourArray.RgbToXyz(r, g, b, fast=False)
+    lab = ColourArray.XyzToLab(*xyz, fast=False)
+    fastLab = ColourArray.XyzToLab(*ColourArray.RgbToXyz(r, g, b, fast=True), fast=True)
+
+    report = {
+      'RgbToXyz': _ErrorReport(xyz, ColourArray.RgbToXyz(r, g, b, fast=True)),
+      'XyzToRgb': _ErrorReport(ColourArray.XyzToRgb(*xyz, fast=False), ColourArray.XyzToRgb(*xyz, fast=True)),
+      'XyzToLab': _ErrorReport(lab, ColourArray.XyzToLab(*xyz, fast=True)),
+      'LabToXyz': _ErrorReport(ColourArray.LabToXyz(*lab, fast=False), ColourArray.LabToXyz(*lab, fast=True))}
+
+    deltas = [Colour.DeltaE(u, v) for u, v in zip(zip(*lab), zip(*fastLab))]
+    report['deltaE'] = {'max': max(deltas), 'mean': sum(deltas) / samples}
+    return report
+
+  @staticmethod
+  def CmykToCmy(c, m, y, k):
+    '''Convert channels of CMYK values to CMY.
+
+    Batch version of :meth:`Colour.CmykToCmy`.
+
+    '''
+    if numpy is None:
+      return _MapChannels(Colour.CmykToCmy, 3, (c, m, y, k))
+
+    c, m, y, k = _Channels(c, m, y, k)
+    mk = 1-k
+    return ((c*mk + k), (m*mk + k), (y*mk + k))
+
+  @staticmethod
+  def CmyToCmyk(c, m, y):
+    '''Convert channels of CMY values to CMYK.
+
+    Batch version of :meth:`Colour.CmyToCmyk`.
+
+    >>> c, m, y, k = ColourArray.CmyToCmyk((1, 1), (0.66, 1), (0.5, 1))
+    >>> ['(%g, %g, %g, %g)' % v for v in zip(c, m, y, k)]
+    ['(1, 0.32, 0, 0.5)', '(0, 0, 0, 1)']
+
+    '''
+    if numpy is None:
+      return _MapChannels(Colour.CmyToCmyk, 4, (c, m, y))
+
+    c, m, y = _Channels(c, m, y)
+    k = numpy.minimum(numpy.minimum(c, m), y)
+    black = (k==1.0)
+    mk = 1-k
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+      c, m, y = [numpy.where(black, 0.0, (v-k) / mk) for v in (c, m, y)]
+    return (c, m, y, k)
+
+  @staticmethod
+  def RgbToCmy(r, g, b):
+    '''Convert channels of RGB values to CMY.
+
+    Batch version of :meth:`Colour.RgbToCmy`.
+
+    '''
+    if numpy is None:
+      return _MapChannels(Colour.RgbToCmy, 3, (r, g, b))
+
+    r, g, b = _Channels(r, g, b)
+    return (1-r, 1-g, 1-b)
+
+  @staticmethod
+  def CmyToRgb(c, m, y):
+    '''Convert channels of CMY values to RGB.
+
+    Batch version of :meth:`Colour.CmyToRgb`.
+
+    '''
+    if numpy is None:
+      return _MapChannels(Colour.CmyToRgb, 3, (c, m, y))
+
+    c, m, y = _Channels(c, m, y)
+    return (1-c, 1-m, 1-y)
+
+  @staticmethod
+  def RgbToGreyscale(r, g, b):
+    '''Convert channels of RGB values to their greyscale equivalent.
+
+    Batch version of :meth:`Colour.RgbToGreyscale`.
+
+    '''
+    if numpy is None:
+      return _MapChannels(Colour.RgbToGreyscale, 3, (r, g, b))
+
+    r, g, b = _Channels(r, g, b)
+    v = (r + g + b) / 3.0
+    return (v, v.copy(), v.copy())
+
+  @staticmethod
+  def RgbToIntTuple(r, g, b):
+    '''Convert channels of RGB values to 8 bits ints.
+
+    Batch version of :meth:`Colour.RgbToIntTuple`, the values are also
+    clamped to [0...255].
+
+    Returns:
+      The (r, g, b) channels as NumPy uint8 arrays, or array('B') without
+      NumPy.
+
+    >>> [c.tolist() for c in ColourArray.RgbToIntTuple((1, 0), (0.5, 0), (0, 1.2))]
+    [[255, 0], [128, 0], [0, 255]]
+
+    '''
+    return tuple((_ByteChannel(c) for c in (r, g, b)))
+
+  @staticmethod
+  def IntTupleToRgb(r, g, b):
+    '''Convert channels of 8 bits ints to RGB.
+
+    Batch version of :meth:`Colour.IntTupleToRgb`.
+
+    '''
+    if numpy is None:
+      return tuple((array('d', (v / 255.0 for v in c)) for c in (r, g, b)))
+    return tuple((numpy.asarray(c) / 255.0 for c in (r, g, b)))
+
+  @staticmethod
+  def RgbToInt(r, g, b, alpha=None, format='pil'):
+    '''Pack channels of RGB values as 32 bits integers.
+
+    The values are clamped to [0...1] and rounded like in
+    :meth:`Colour.RgbToIntTuple`.
+
+    Parameters:
+      :r, g, b:
+        The RGB channels.
+      :alpha:
+        The alpha channel, only packed by the argb format (opaque if None).
+      :format:
+        The layout of the integers:
+          :pil: 0xBBGGRR, like :meth:`Colour.RgbToPil`.
+          :rgb: 0xRRGGBB.
+          :argb: 0xAARRGGBB.
+
+    Returns:
+      The integers as a NumPy uint32 array, or an array('I') without NumPy.
+
+    >>> ['0x%08x' % v for v in ColourArray.RgbToInt((1, 0), (0.5, 0), (0, 1), (1, 0.5), 'argb')]
+    ['0xffff8000', '0x800000ff']
+
+    '''
+    if format not in _INT_FORMATS:
+      raise ValueError('Invalid integer format: ' + format)
+    shifts, ashift = _INT_FORMATS[format]
+    channels = list(zip(shifts, (r, g, b)))
+    if ashift is not None:
+      if alpha is None: alpha = [1.0] * len(r)
+      channels.append((ashift, alpha))
+
+    if numpy is not None:
+      packed = numpy.zeros(len(r), dtype=numpy.uint32)
+      for shift, c in channels:
+        packed |= _ByteChannel(c).astype(numpy.uint32) << numpy.uint32(shift)
+      return packed
+
+    size = array(_UINT32).itemsize
+    data = bytearray(size * len(r))
+    for shift, c in channels:
+      data[_IntByteOffset(shift, size)::size] = _ByteChannel(c)
+    return array(_UINT32, bytes(data))
+
+  @staticmethod
+  def IntToRgb(values, format='pil'):
+    '''Unpack channels of RGB values from 32 bits integers.
+
+    Parameters:
+      :values:
+        The packed integers (a sequence, an array('I') or a NumPy array).
+      :format:
+        The layout of the integers (pil/rgb/argb), see :meth:`RgbToInt`.
+
+    Returns:
+      The (r, g, b) channels, followed by the alpha channel with the argb
+      format.
+
+    >>> r, g, b, a = ColourArray.IntToRgb([0xffff8000, 0x800000ff], 'argb')
+    >>> ['(%g, %g, %g, %g)' % v for v in zip(r, g, b, a)]
+    ['(1, 0.501961, 0, 1)', '(0, 0, 1, 0.501961)']
+
+    '''
+    if format not in _INT_FORMATS:
+      raise ValueError('Invalid integer format: ' + format)
+    shifts, ashift = _INT_FORMATS[format]
+    if ashift is not None:
+      shifts += (ashift,)
+
+    if numpy is not None:
+      values = numpy.asarray(values, dtype=numpy.uint32)
+      return tuple((((values >> numpy.uint32(s)) & 0xff) / 255.0 for s in shifts))
+
+    if not isinstance(values, array) or values.typecode!=_UINT32:
+      values = array(_UINT32, values)
+    size = values.itemsize
+    data = _ByteView(values)
+    value = _BYTE_VALUES.__getitem__
+    return tuple((array('d', map(value, data[_IntByteOffset(s, size)::size])) for s in shifts))
+
+  @staticmethod
+  def RgbToPil(r, g, b):
+    '''Convert channels of RGB values to PIL-compatible integers (0xBBGGRR).
+
+    Batch version of :meth:`Colour.RgbToPil`, see :meth:`RgbToInt`.
+
+    '''
+    return ColourArray.RgbToInt(r, g, b)
+
+  @staticmethod
+  def PilToRgb(pil):
+    '''Convert PIL-compatible integers (0xBBGGRR) to channels of RGB values.
+
+    Batch version of :meth:`Colour.PilToRgb`, see :meth:`IntToRgb`.
+
+    '''
+    return ColourArray.IntToRgb(pil)
+
+  @staticmethod
+  def RgbToHtml(r, g, b):
+    '''Convert channels of RGB values to #RRGGBB strings.
+
+    Batch version of :meth:`Colour.RgbToHtml`, the values are also clamped
+    to [0...1]. The digits are looked up in a 256 entries table.
+
+    Returns:
+      The list of the #rrggbb strings.
+
+    >>> ColourArray.RgbToHtml((1, 0), (0.5, 0), (0, 1))
+    ['#ff8000', '#0000ff']
+
+    '''
+    if numpy is None:
+      digits = _HEX_BYTES
+      r, g, b = [_ByteChannel(c) for c in (r, g, b)]
+      return ['#' + digits[v0] + digits[v1] + digits[v2] for v0, v1, v2 in zip(r, g, b)]
+    data = ColourArray.RgbToHtmlBytes(r, g, b).decode('ascii')
+    return [data[i:i+7] for i in range(0, len(data), 7)]
+
+  @staticmethod
+  def RgbToHtmlBytes(r, g, b):
+    '''Convert channels of RGB values to a buffer of #RRGGBB strings.
+
+    Returns:
+      A bytes object holding the 7 ASCII characters of each #rrggbb string,
+      one after the other.
+
+    >>> print(ColourArray.RgbToHtmlBytes((1, 0), (0.5, 0), (0, 1)).decode('ascii'))
+    #ff8000#0000ff
+
+    '''
+    if numpy is None:
+      return ''.join(ColourArray.RgbToHtml(r, g, b)).encode('ascii')
+    r, g, b = [_ByteChannel(c) for c in (r, g, b)]
+    digits = numpy.frombuffer(''.join(_HEX_BYTES).encode('ascii'), dtype=numpy.uint8).reshape((256, 2))
+    data = numpy.empty((len(r), 7), dtype=numpy.uint8)
+    data[:, 0] = ord('#')
+    data[:, 1:3] = digits[r]
+    data[:, 3:5] = digits[g]
+    data[:, 5:7] = digits[b]
+    return data.tobytes()
+
+  @staticmethod
+  def HtmlToRgb(html):
+    '''Convert HTML Colours to channels of RGB values.
+
+    Batch version of :meth:`Colour.HtmlToRgb`. The #rrggbb strings are
+    decoded through lookup tables, the other forms (#rgb, Colour names,
+    surrounding spaces...) go through :meth:`Colour.HtmlToRgb`.
+
+    Parameters:
+      :html:
+        A sequence of HTML definitions, or a buffer holding #rrggbb strings
+        one after the other (see :meth:`RgbToHtmlBytes`).
+
+    Returns:
+      The (r, g, b) channels.
+
+    Throws:
+      :ValueError:
+        If one of the Colours is not a valid HTML definition.
+
+    >>> r, g, b = ColourArray.HtmlToRgb(['#ff8000', 'lemonchiffon', '#F60'])
+    >>> ['(%g, %g, %g)' % v for v in zip(r, g, b)]
+    ['(1, 0.501961, 0)', '(1, 0.980392, 0.803922)', '(1, 0.4, 0)']
+    >>> r, g, b = ColourArray.HtmlToRgb(b'#ff8000#0000FF')
+    >>> ['(%g, %g, %g)' % v for v in zip(r, g, b)]
+    ['(1, 0.501961, 0)', '(0, 0, 1)']
+
+    '''
+    strict = isinstance(html, (bytes, bytearray, memoryview))
+    if strict:
+      data = _ByteView(html)
+      if len(data) % 7:
+        raise ValueError('The buffer size is not a multiple of 7')
+      if numpy is None:
+        data = bytes(data).decode('ascii')
+        html = [data[i:i+7] for i in range(0, len(data), 7)]
+    else:
+      data = None
+      if numpy is not None:
+        joined = ''.join(html)
+        if all((len(h)==7 for h in html)) and joined[::7]=='#' * len(html):
+          try:
+            data = joined.encode('ascii')
+          except UnicodeError:
+            pass
+
+    if numpy is not None and data is not None:
+      data = numpy.frombuffer(data, dtype=numpy.uint8).reshape((-1, 7))
+      digits = numpy.array(_HEX_DIGITS, dtype=numpy.int16)[data[:, 1:]]
+      if (data[:, 0]!=ord('#')).any() or (digits < 0).any():
+        raise ValueError('The buffer does not hold #RRGGBB strings')
+      values = (digits[:, 0::2] * 16 + digits[:, 1::2]) / 255.0
+      return (values[:, 0].copy(), values[:, 1].copy(), values[:, 2].copy())
+
+    value = _HEX_VALUES
+    rgb = []
+    for h in html:
+      if len(h)==7 and h[0]=='#':
+        try:
+          rgb.append((value[h[1:3]], value[h[3:5]], value[h[5:7]]))
+          continue
+        except KeyError:
+          pass
+      if strict:
+        raise ValueError('The buffer does not hold #RRGGBB strings')
+      rgb.append(Colour.HtmlToRgb(h))
+    if not rgb:
+      return _Channels((), (), ())
+    return _Channels(*zip(*rgb))
+
+  @staticmethod
+  def AdaptXyz(x, y, z, src, dst, method='bradford'):
+    '''Adapt channels of CIE 1931 XYZ values from a white reference to another.
+
+    Batch version of :meth:`Colour.AdaptXyz`.
+
+    '''
+    if numpy is None:
+      return _MapChannels(Colour.AdaptXyz, 3, (x, y, z), src, dst, method)
+
+    m = numpy.array(_AdaptationMatrix(src, dst, method))
+    xyz = numpy.dot(m, numpy.vstack(_Channels(x, y, z)))
+    return (xyz[0], xyz[1], xyz[2])
+
+  @staticmethod
+  def Convert(channels, src='rgb', dst='lab', wref=_DEFAULT_WREF):
+    '''Convert channels of values between any two representations.
+
+    Batch version of :meth:`Colour.Convert`.
+
+    >>> l, a, b = ColourArray.Convert(((30, 240), (1, 1), (1, 1)), 'hsv', 'lab')
+    >>> ['(%g, %g, %g)' % v for v in zip(l, a, b)]
+    ['(66.9518, 0.43084, 0.739692)', '(32.3026, 0.792007, -1.0786)']
+
+    '''
+    return _Converter(ColourArray, src, dst)(*channels, wref=wref)
+
+  @staticmethod
+  def Converter(src, dst):
+    '''Return the function converting channels from src to dst.
+
+    Batch version of :meth:`Colour.Converter`.
+
+    '''
+    return _Converter(ColourArray, src, dst)
+
+  @staticmethod
+  def DeltaE(lab1, lab2, formula='cie76'):
+    '''Compute the differences between channels of CIE L*a*b* values.
+
+    Batch version of :meth:`Colour.DeltaE`.
+
+    Parameters:
+      :lab1:
+        The (l, a, b) tuple of channels of the reference Colours.
+      :lab2:
+        The (l, a, b) tuple of channels of the compared Colours, or a single
+        (l, a, b) Colour compared to all the Colours of lab1.
+      :formula:
+        The colour difference formula (cie76/cie94/ciede2000).
+
+    Returns:
+      The channel of the ΔE values.
+
+    >>> lab = ColourArray.NewFromRgb((1, 1, 0), (0, 0.5, 0), (0, 0, 1)).ToLab()
+    >>> ['%.2f' % d for d in ColourArray.DeltaE(lab, Colour.NewFromHtml('red').lab)]
+    ['0.00', '40.06', '176.33']
+
+    '''
+    fn = _DeltaEFunction(formula)
+    if numpy is not None:
+      return _DeltaEArrays(*(_CieLabChannels(lab1) + _CieLabChannels(lab2) + (formula,)))
+
+    if not hasattr(lab2[0], '__len__'):
+      ref = _CieLab(*lab2)
+      return array('d', [fn(*(_CieLab(*lab) + ref)) for lab in zip(*lab1)])
+    return array('d', [fn(*(_CieLab(*v1) + _CieLab(*v2))) for v1, v2 in zip(zip(*lab1), zip(*lab2))])
+
+  @staticmethod
+  def DeltaEMatrix(lab1, lab2=None, formula='cie76', budget=1<<20):
+    '''Compute the differences between all the pairs of two sets of Colours.
+
+    The differences are computed by chunks of rows, so that at most budget
+    differences are computed at once (the temporary arrays of CIEDE2000 are
+    several times larger than the result).
+
+    Parameters:
+      :lab1:
+        The (l, a, b) tuple of channels of the reference Colours (rows).
+      :lab2:
+        The (l, a, b) tuple of channels of the compared Colours (columns),
+        None to compare the lab1 Colours to each other.
+      :formula:
+        The colour difference formula (cie76/cie94/ciede2000).
+      :budget:
+        The number of differences computed at once.
+
+    Returns:
+      The len(lab1) x len(lab2) matrix of the ΔE values: a NumPy array when
+      NumPy is available, a list of array.array('d') rows otherwise.
+
+    >>> lab = ColourArray.NewFromRgb((1, 1, 0), (0, 0.5, 0), (0, 0, 1)).ToLab()
+    >>> [['%.1f' % d for d in row] for row in ColourArray.DeltaEMatrix(lab)]
+    [['0.0', '40.1', '176.3'], ['40.1', '0.0', '188.6'], ['176.3', '188.6', '0.0']]
+
+    '''
+    fn = _DeltaEFunction(formula)
+    if lab2 is None: lab2 = lab1
+
+    if numpy is None:
+      lab1 = [_CieLab(*v) for v in zip(*lab1)]
+      lab2 = [_CieLab(*v) for v in zip(*lab2)]
+      return [array('d', [fn(*(v1 + v2)) for v2 in lab2]) for v1 in lab1]
+
+    l1, a1, b1 = _CieLabChannels(lab1)
+    l2, a2, b2 = _CieLabChannels(lab2)
+    matrix = numpy.empty((len(l1), len(l2)))
+    chunk = max(1, budget // max(1, len(l2)))
+    for start in range(0, len(l1), chunk):
+      rows = slice(start, start + chunk)
+      matrix[rows] = _DeltaEArrays(l1[rows, numpy.newaxis], a1[rows, numpy.newaxis], b1[rows, numpy.newaxis], l2, a2, b2, formula)
+    return matrix
+
+  @staticmethod
+  def DeltaEPairs(lab1, lab2=None, threshold=1.0, formula='cie76', budget=1<<20):
+    '''Find the pairs of Colours whose difference is within a tolerance.
+
+    The differences are computed like in :meth:`ColourArray.DeltaEMatrix`,
+    but only the matching pairs are kept, so the whole matrix is never held
+    in memory.
+
+    Parameters:
+      :lab1:
+        The (l, a, b) tuple of channels of the reference Colours.
+      :lab2:
+        The (l, a, b) tuple of channels of the compared Colours, None to find
+        the near duplicates in lab1 (only the pairs i < j are returned).
+      :threshold:
+        The largest difference of the returned pairs.
+      :formula:
+        The colour difference formula (cie76/cie94/ciede2000).
+      :budget:
+        The number of differences computed at once.
+
+    Returns:
+      The (i, j, d) tuple of channels: the indices in lab1 and lab2 of each
+      pair and its ΔE value, sorted by i then j.
+
+    >>> lab = ColourArray.NewFromRgb((1, 1, 0.99), (0, 0.5, 0.01), (0, 0, 0)).ToLab()
+    >>> i, j, d = ColourArray.DeltaEPairs(lab, threshold=2)
+    >>> [(int(a), int(b), '%.2f' % c) for a, b, c in zip(i, j, d)]
+    [(0, 2, '1.04')]
+
+    '''
+    fn = _DeltaEFunction(formula)
+    same = lab2 is None
+    if same: lab2 = lab1
+
+    if numpy is None:
+      lab1 = [_CieLab(*v) for v in zip(*lab1)]
+      lab2 = [_CieLab(*v) for v in zip(*lab2)]
+      pairs = (array('l'), array('l'), array('d'))
+      for i, v1 in enumerate(lab1):
+        for j in range(same and i + 1 or 0, len(lab2)):
+          d = fn(*(v1 + lab2[j]))
+          if d <= threshold:
+            pairs[0].append(i)
+            pairs[1].append(j)
+            pairs[2].append(d)
+      return pairs
+
+    l1, a1, b1 = _CieLabChannels(lab1)
+    l2, a2, b2 = _CieLabChannels(lab2)
+    found = ([], [], [])
+    chunk = max(1, budget // max(1, len(l2)))
+    for start in range(0, len(l1), chunk):
+      rows = slice(start, start + chunk)
+      # Compare the lab1 Colours to each other only once.
+      first = same and start + 1 or 0
+      d = _DeltaEArrays(l1[rows, numpy.newaxis], a1[rows, numpy.newaxis], b1[rows, numpy.newaxis],
+          l2[first:], a2[first:], b2[first:], formula)
+      mask = d <= threshold
+      if same:
+        mask &= numpy.arange(first, len(l2)) > numpy.arange(start, start + len(d))[:, numpy.newaxis]
+      i, j = numpy.nonzero(mask)
+      found[0].append(i + start)
+      found[1].append(j + first)
+      found[2].append(d[i, j])
+    if not found[0]:
+      return (numpy.empty(0, dtype=numpy.intp), numpy.empty(0, dtype=numpy.intp), numpy.empty(0))
+    return tuple((numpy.concatenate(f) for f in found))
+
+  @staticmethod
+  def NewFromRgb(r, g, b, alpha=None, wref=_DEFAULT_WREF):
+    '''Create a new instance based on the specifed RGB channels.
+
+    Parameters:
+      :r:
+        The Red component values [0...1]
+      :g:
+        The Green component values [0...1]
+      :b:
+        The Blue component values [0...1]
+      :alpha:
+        The Colours transparency [0...1], default is opaque
+      :wref:
+        The whitepoint reference, default is 2° D65.
+
+    Returns:
+      A grapefruit.ColourArray instance.
+
+    >>> ColourArray.NewFromRgb((1.0,), (0.5,), (0.0,))
+    ColourArray([(1.0, 0.5, 0.0, 1.0)])
+
+    '''
+    return ColourArray((r, g, b), 'rgb', alpha, wref)
+
+  @staticmethod
+  def NewFromHsl(h, s, l, alpha=None, wref=_DEFAULT_WREF):
+    '''Create a new instance based on the specifed HSL channels.
+
+    >>> ColourArray.NewFromHsl((30,), (1,), (0.5,))
+    ColourArray([(1.0, 0.5, 0.0, 1.0)])
+
+    '''
+    return ColourArray((h, s, l), 'hsl', alpha, wref)
+
+  @staticmethod
+  def NewFromHsv(h, s, v, alpha=None, wref=_DEFAULT_WREF):
+    '''Create a new instance based on the specifed HSV channels.'''
+    return ColourArray(ColourArray.HsvToRgb(h, s, v), 'rgb', alpha, wref)
+
+  @staticmethod
+  def NewFromYiq(y, i, q, alpha=None, wref=_DEFAULT_WREF):
+    '''Create a new instance based on the specifed YIQ channels.'''
+    return ColourArray(ColourArray.YiqToRgb(y, i, q), 'rgb', alpha, wref)
+
+  @staticmethod
+  def NewFromYuv(y, u, v, alpha=None, wref=_DEFAULT_WREF):
+    '''Create a new instance based on the specifed YUV channels.'''
+    return ColourArray(ColourArray.YuvToRgb(y, u, v), 'rgb', alpha, wref)
+
+  @staticmethod
+  def NewFromXyz(x, y, z, alpha=None, wref=_DEFAULT_WREF):
+    '''Create a new instance based on the specifed CIE-XYZ channels.'''
+    return ColourArray(ColourArray.XyzToRgb(x, y, z), 'rgb', alpha, wref)
+
+  @staticmethod
+  def NewFromLab(l, a, b, alpha=None, wref=_DEFAULT_WREF):
+    '''Create a new instance based on the specifed CIE-LAB channels.'''
+    return ColourArray(ColourArray.XyzToRgb(*ColourArray.LabToXyz(l, a, b, wref)), 'rgb', alpha, wref)
+
+  @staticmethod
+  def NewFromCmy(c, m, y, alpha=None, wref=_DEFAULT_WREF):
+    '''Create a new instance based on the specifed CMY channels.'''
+    return ColourArray(ColourArray.CmyToRgb(c, m, y), 'rgb', alpha, wref)
+
+  @staticmethod
+  def NewFromCmyk(c, m, y, k, alpha=None, wref=_DEFAULT_WREF):
+    '''Create a new instance based on the specifed CMYK channels.'''
+    return ColourArray(ColourArray.CmyToRgb(*ColourArray.CmykToCmy(c, m, y, k)), 'rgb', alpha, wref)
+
+  @staticmethod
+  def NewFromColours(colours, wref=_DEFAULT_WREF):
+    '''Create a new instance holding the values of grapefruit.Colour instances.
+
+    Parameters:
+      :colours:
+        A sequence of grapefruit.Colour instances.
+      :wref:
+        The whitepoint reference, default is 2° D65.
+
+    Returns:
+      A grapefruit.ColourArray instance.
+
+    >>> ColourArray.NewFromColours([Colour.NewFromHtml('red'), Colour.NewFromHsl(30, 1, 0.5, 0.5)])
+    ColourArray([(1.0, 0.0, 0.0, 1.0), (1.0, 0.5, 0.0, 0.5)])
+
+    '''
+    colours = list(colours)
+    rgb = tuple(zip(*[c.rgb for c in colours])) or ((), (), ())
+    alpha = [c.alpha for c in colours]
+    if all(a==1.0 for a in alpha): alpha = None
+    return ColourArray(rgb, 'rgb', alpha, wref)
+
+  @staticmethod
+  def NewFromBuffer(buffer, layout='rgb'):
+    '''Create a new instance from a buffer of packed 8 bits pixels.
+
+    Parameters:
+      :buffer:
+        Any object supporting the buffer protocol (bytes, bytearray,
+        memoryview, array...) holding the interleaved components.
+      :layout:
+        The order of the components of each pixel (rgb/rgba/bgr/bgra).
+
+    Returns:
+      A grapefruit.ColourArray instance.
+
+    >>> ColourArray.NewFromBuffer(bytearray([0, 128, 255, 255, 0, 0]), 'bgr')
+    ColourArray([(1.0, 0.5019607843137255, 0.0, 1.0), (0.0, 0.0, 1.0, 1.0)])
+
+    '''
+    view, stride, offsets, alpha = _PackedView(buffer, layout)
+    if numpy is not None:
+      rgb = tuple((view[i::stride] / 255.0 for i in offsets))
+      if alpha is not None: alpha = view[alpha::stride] / 255.0
+    else:
+      value = _BYTE_VALUES.__getitem__
+      rgb = tuple((array('d', map(value, view[i::stride])) for i in offsets))
+      if alpha is not None: alpha = array('d', map(value, view[alpha::stride]))
+    return ColourArray(rgb, 'rgb', alpha)
+
+  @staticmethod
+  def NewFromInt(values, format='pil', wref=_DEFAULT_WREF):
+    '''Create a new instance from packed 32 bits integers.
+
+    Parameters:
+      :values:
+        The packed integers (a sequence, an array('I') or a NumPy array).
+      :format:
+        The layout of the integers (pil/rgb/argb), see :meth:`RgbToInt`.
+      :wref:
+        The whitepoint reference, default is 2° D65.
+
+    Returns:
+      A grapefruit.ColourArray instance.
+
+    >>> ColourArray.NewFromInt([0x0080ff, 0xff0000])
+    ColourArray([(1.0, 0.5019607843137255, 0.0, 1.0), (0.0, 0.0, 1.0, 1.0)])
+
+    '''
+    channels = ColourArray.IntToRgb(values, format)
+    alpha = None
+    if len(channels) > 3: alpha = channels[3]
+    return ColourArray(channels[:3], 'rgb', alpha, wref)
+
+  @staticmethod
+  def ConvertBuffer(buffer, fn=None, layout='rgb', out=None):
+    '''Convert a buffer of packed 8 bits pixels to interleaved float32 values.
+
+    Parameters:
+      :buffer:
+        Any object supporting the buffer protocol holding the interleaved
+        components.
+      :fn:
+        The batch conversion applied to the RGB channels, taking and returning
+        channels (e.g. ColourArray.RgbToHsl). None to keep the RGB values.
+      :layout:
+        The order of the components of each pixel (rgb/rgba/bgr/bgra).
+      :out:
+        A writable float32 buffer (e.g. array.array('f'), or a bytearray of
+        the right size) receiving the values, a new array.array('f') is
+        created if None. It must be one of those on Python 2.
+
+    Returns:
+      out, holding the values returned by fn for each pixel.
+
+    >>> out = ColourArray.ConvertBuffer(b'\\xff\\x80\\x00', ColourArray.RgbToHsl)
+    >>> ['%.4g' % v for v in out]
+    ['30.12', '1', '0.5']
+
+    '''
+    colours = ColourArray.NewFromBuffer(buffer, layout)
+    values = colours.rgb if fn is None else fn(*colours.rgb)
+    count = len(values)
+
+    if out is None:
+      out = array('f', [0.0]) * (count * len(colours))
+    if not _MEMORYVIEW_CAST:
+      # The values of a bytearray out are written to a float array, whose
+      # bytes are copied to out at the end.
+      if isinstance(out, bytearray):
+        if len(out)!=4 * count * len(colours):
+          raise ValueError('out must hold %d values' % (count * len(colours)))
+        view = array('f', [0.0]) * (count * len(colours))
+      elif isinstance(out, array) and out.typecode=='f':
+        view = out
+      else:
+        raise TypeError('out must be a float32 array or a bytearray')
+    else:
+      view = memoryview(out)
+      if view.format not in ('f', 'B'):
+        raise TypeError('out must be a float32 or a bytes buffer')
+      if view.format!='f' or view.ndim!=1:
+        view = view.cast('B').cast('f')
+    if len(view)!=count * len(colours):
+      raise ValueError('out must hold %d values' % (count * len(colours)))
+
+    if numpy is not None:
+      target = numpy.frombuffer(view, dtype=numpy.float32).reshape((-1, count))
+      for i, c in enumerate(values):
+        target[:, i] = c
+    else:
+      for i, c in enumerate(values):
+        view[i::count] = array('f', c)
+    if isinstance(view, array) and view is not out:
+      out[:] = _ArrayBytes(view)
+    return out
+
+  @staticmethod
+  def ConvertParallel(fn, channels, args=(), workers=None, chunk=1<<18):
+    '''Apply a batch conversion to channels, split across worker processes.
+
+    The input channels are copied once to a shared memory block, each worker
+    converts chunks of it and writes the results to a second shared block,
+    so the values are never pickled.
+
+    Parameters:
+      :fn:
+        The batch conversion, taking and returning channels. It must be
+        picklable: one of the ColourArray static methods (e.g.
+        ColourArray.RgbToXyz) or a module level function.
+      :channels:
+        The tuple of the input channels.
+      :args:
+        Extra arguments appended to each call of fn (e.g. (wref,)).
+      :workers:
+        The number of worker processes, default is the number of CPUs.
+      :chunk:
+        The number of values converted by each task. If all the values fit in
+        a single chunk, or workers is 1, fn is called in this process.
+
+    Returns:
+      The tuple of the output channels, as returned by fn.
+
+    >>> r, g, b = [float(v) / 100 for v in range(100)], [0.5] * 100, [0.0] * 100
+    >>> h, s, l = ColourArray.ConvertParallel(ColourArray.RgbToHsl, (r, g, b), workers=2, chunk=30)
+    >>> '(%g, %g, %g)' % (h[99], s[99], l[99])
+    '(30.303, 1, 0.495)'
+
+    '''
+    count = len(channels[0])
+    # Without shared memory (Python < 3.8), the conversion runs inline.
+    if workers is None and shared_memory is not None:
+      workers = os.cpu_count() or 1
+    if shared_memory is None or workers<=1 or count<=chunk:
+      return fn(*(tuple(channels) + tuple(args)))
+
+    inputs = len(channels)
+    outputs = len(fn(*([_Channel(c[:1]) for c in channels] + list(args))))
+    source = shared_memory.SharedMemory(create=True, size=8 * inputs * count)
+    try:
+      target = shared_memory.SharedMemory(create=True, size=8 * outputs * count)
+      try:
+        if numpy is not None:
+          src = numpy.ndarray((inputs, count), dtype=numpy.float64, buffer=source.buf)
+          for i, c in enumerate(channels):
+            src[i] = c
+          del src
+        else:
+          src = source.buf.cast('d')
+          for i, c in enumerate(channels):
+            src[i*count:(i+1)*count] = _Channel(c)
+          src.release()
+
+        with ProcessPoolExecutor(min(workers, (count + chunk - 1) // chunk)) as pool:
+          tasks = [pool.submit(_ConvertChunk, fn, args, source.name, target.name, inputs, outputs, count, start, min(count, start + chunk))
+              for start in range(0, count, chunk)]
+          for task in tasks:
+            task.result()
+
+        if numpy is not None:
+          dst = numpy.ndarray((outputs, count), dtype=numpy.float64, buffer=target.buf)
+          values = tuple([c.copy() for c in dst])
+          dst = None
+        else:
+          dst = target.buf.cast('d')
+          values = tuple((array('d', dst[i*count:(i+1)*count]) for i in range(outputs)))
+          dst.release()
+        return values
+      finally:
+        target.close()
+        target.unlink()
+    finally:
+      source.close()
+      source.unlink()
+
+  @staticmethod
+  def DitherWebSafe(buffer, width, layout='rgb', method='floydsteinberg', indexed=False, out=None):
+    '''Dither a buffer of packed 8 bits pixels to the web safe palette.
+
+    The whole image is processed in a single pass with integer arithmetic:
+    the components are rounded to the nearest web safe level through a 256
+    entries table instead of :meth:`Colour.RgbToWebSafe`.
+
+    Parameters:
+      :buffer:
+        Any object supporting the buffer protocol holding the interleaved
+        components of the image, row by row.
+      :width:
+        The width of the image, in pixels.
+      :layout:
+        The order of the components of each pixel (rgb/rgba/bgr/bgra).
+      :method:
+        The dithering method:
+          :floydsteinberg: Floyd-Steinberg error diffusion.
+          :atkinson: Atkinson error diffusion (only 3/4 of the error is
+            diffused, keeping more contrast).
+          :bayer: ordered dithering with an 8x8 Bayer matrix.
+          :nearest: no dithering, each pixel gets its nearest web safe Colour.
+      :indexed:
+        If True, return the index of the web safe Colour of each pixel
+        (r*36 + g*6 + b, each component being the level [0...5]) instead of
+        packed pixels.
+      :out:
+        A writable buffer of the right size receiving the result, it can be
+        the source buffer unless indexed is True. A new bytearray is created
+        if None.
+
+    Returns:
+      out, holding the pixels in the same layout as buffer (the alpha is
+      copied unchanged) or one index per pixel.
+
+    >>> grey = bytes(bytearray([90] * 48))
+    >>> list(ColourArray.DitherWebSafe(grey, 4, method='nearest', indexed=True))
+    [86, 86, 86, 86, 86, 86, 86, 86, 86, 86, 86, 86, 86, 86, 86, 86]
+    >>> list(ColourArray.DitherWebSafe(grey, 4, method='bayer', indexed=True))
+    [43, 86, 43, 86, 86, 86, 86, 86, 43, 86, 43, 86, 86, 86, 86, 86]
+
+    '''
+    if method not in _DITHER_KERNELS and method not in ('bayer', 'nearest'):
+      raise ValueError('Invalid dithering method: ' + method)
+    view, stride, offsets, alpha = _PackedView(buffer, layout)
+    count = len(view) // stride
+    if width <= 0 or count % width:
+      raise ValueError('The buffer does not hold whole rows of %d pixels' % width)
+    height = count // width
+
+    out, target = _ByteTarget(out, indexed and count or len(view))
+
+    level = _WEB_SAFE_LEVEL
+    if method in _DITHER_KERNELS:
+      levels = _DiffuseErrors(bytearray(view), width, height, stride, offsets, *_DITHER_KERNELS[method])
+    elif numpy is not None:
+      pixels = view.reshape((height, width, stride)).astype(numpy.intp)
+      if method=='bayer':
+        bayer = numpy.array(_BAYER_OFFSETS, dtype=numpy.intp)
+        pixels += numpy.tile(bayer, (height // 8 + 1, width // 8 + 1))[:height, :width, numpy.newaxis]
+        numpy.clip(pixels, 0, 255, out=pixels)
+      levels = numpy.array(level, dtype=numpy.uint8)[pixels[:, :, list(offsets)]].reshape((-1, 3))
+    else:
+      data = bytearray(view)
+      levels = []
+      for y in range(height):
+        bayer = _BAYER_OFFSETS[y % 8]
+        for x in range(width):
+          p = (y * width + x) * stride
+          if method=='bayer':
+            t = bayer[x % 8]
+            levels.append(tuple((level[min(255, max(0, data[p + o] + t))] for o in offsets)))
+          else:
+            levels.append(tuple((level[data[p + o]] for o in offsets)))
+
+    if numpy is not None:
+      levels = numpy.asarray(levels, dtype=numpy.uint8).reshape((-1, 3))
+      target = numpy.frombuffer(target, dtype=numpy.uint8)
+      if indexed:
+        target[:] = levels[:, 0] * 36 + levels[:, 1] * 6 + levels[:, 2]
+      else:
+        if alpha is not None and out is not buffer:
+          target[alpha::stride] = view[alpha::stride]
+        for i, o in enumerate(offsets):
+          target[o::stride] = levels[:, i] * 51
+    elif indexed:
+      target[:] = bytes(bytearray((r * 36 + g * 6 + b for r, g, b in levels)))
+    else:
+      if alpha is not None and out is not buffer:
+        target[alpha::stride] = view[alpha::stride]
+      for i, o in enumerate(offsets):
+        target[o::stride] = bytes(bytearray((l[i] * 51 for l in levels)))
+    return out
+
+  @staticmethod
+  def RgbBufferToYuvFrame(buffer, width, layout='rgb', format='i420', matrix='yuv', out=None):
+    '''Convert a buffer of packed 8 bits pixels to an 8 bits video frame.
+
+    The conversion uses fixed-point integer arithmetic with the coefficients
+    of :meth:`Colour.RgbToYuv` (or :meth:`Colour.RgbToYiq`): the 8 bits Y is
+    the luma scaled to [0...255], and each 8 bits chroma is the chroma scaled
+    so that its whole range spans [1...255], centered on 128 (e.g.
+    U = 128 + u * 127 / 0.436). The results are within 1 of the rounded
+    values of the scalar conversions.
+
+    Parameters:
+      :buffer:
+        Any object supporting the buffer protocol holding the interleaved
+        components of the image, row by row.
+      :width:
+        The width of the image, in pixels.
+      :layout:
+        The order of the components of each pixel (rgb/rgba/bgr/bgra).
+      :format:
+        The layout of the frame, the Y plane always comes first:
+          :yuv444: full resolution U and V planes.
+          :i420: U and V planes subsampled by 2 horizontally and vertically
+            (YUV 4:2:0 planar), each chroma is the average of a 2x2 block.
+          :nv12: like i420, but with a single plane of interleaved U and V.
+      :matrix:
+        The conversion matrix (yuv/yiq). With yiq, the U and V planes hold
+        the I and Q components.
+      :out:
+        A writable buffer of the right size receiving the frame. A new
+        bytearray is created if None.
+
+    Returns:
+      out, holding the frame.
+
+    >>> red = bytes(bytearray([255, 0, 0] * 4))
+    >>> list(ColourArray.RgbBufferToYuvFrame(red, 2))
+    [76, 76, 76, 76, 85, 255]
+    >>> list(ColourArray.RgbBufferToYuvFrame(red, 2, format='yuv444', matrix='yiq'))
+    [76, 76, 76, 76, 255, 255, 255, 255, 179, 179, 179, 179]
+
+    '''
+    if matrix not in _VIDEO_MATRICES:
+      raise ValueError('Invalid video matrix: ' + matrix)
+    view, stride, offsets, alpha = _PackedView(buffer, layout)
+    count = len(view) // stride
+    if width <= 0 or count % width:
+      raise ValueError('The buffer does not hold whole rows of %d pixels' % width)
+    height = count // width
+    size, cw, ch = _VideoFrameSize(format, width, height)
+    out, target = _ByteTarget(out, size)
+
+    fwd = _VIDEO_MATRICES[matrix][0]
+    shift = _VIDEO_SHIFT
+    # The chroma of the subsampled formats are the sums of 4 values.
+    cshift = format=='yuv444' and shift or shift + 2
+    cround = (128 << cshift) + (1 << (cshift - 1))
+    half = 1 << (shift - 1)
+    if numpy is not None:
+      pixels = view.reshape((height, width, stride)).astype(numpy.intp)
+      r, g, b = [pixels[:, :, o] for o in offsets]
+      y, u, v = [k[0] * r + k[1] * g + k[2] * b for k in fwd]
+      if format!='yuv444':
+        pad = ((0, height % 2), (0, width % 2))
+        u, v = [numpy.pad(c, pad, 'edge') for c in (u, v)]
+        u, v = [c[0::2, 0::2] + c[0::2, 1::2] + c[1::2, 0::2] + c[1::2, 1::2] for c in (u, v)]
+      target = numpy.frombuffer(target, dtype=numpy.uint8)
+      target[:count] = numpy.clip((y + half) >> shift, 0, 255).ravel()
+      u, v = [numpy.clip((c + cround) >> cshift, 0, 255).ravel() for c in (u, v)]
+      if format=='nv12':
+        target[count::2] = u
+        target[count+1::2] = v
+      else:
+        target[count:count+cw*ch] = u
+        target[count+cw*ch:] = v
+      return out
+
+    data = bytearray(view)
+    (yr, yg, yb), (ur, ug, ub), (vr, vg, vb) = [
+      [[k * c for c in range(256)] for k in row] for row in fwd]
+    ro, go, bo = offsets
+    luma = []
+    us = []
+    vs = []
+    for p in range(0, len(data), stride):
+      r, g, b = data[p + ro], data[p + go], data[p + bo]
+      luma.append((yr[r] + yg[g] + yb[b] + half) >> shift)
+      us.append(ur[r] + ug[g] + ub[b])
+      vs.append(vr[r] + vg[g] + vb[b])
+    if format!='yuv444':
+      us = _SumBlocks(us, width, height)
+      vs = _SumBlocks(vs, width, height)
+    target[:count] = bytes(bytearray((min(255, max(0, l)) for l in luma)))
+    u = bytearray((min(255, max(0, (c + cround) >> cshift)) for c in us))
+    v = bytearray((min(255, max(0, (c + cround) >> cshift)) for c in vs))
+    if format=='nv12':
+      target[count::2] = bytes(u)
+      target[count+1::2] = bytes(v)
+    else:
+      target[count:count+cw*ch] = bytes(u)
+      target[count+cw*ch:] = bytes(v)
+    return out
+
+  @staticmethod
+  def YuvFrameToRgbBuffer(frame, width, height, format='i420', matrix='yuv', layout='rgb', out=None):
+    '''Convert an 8 bits video frame to a buffer of packed 8 bits pixels.
+
+    This is the inverse of :meth:`RgbBufferToYuvFrame`, using the
+    coefficients of :meth:`Colour.YuvToRgb` (or :meth:`Colour.YiqToRgb`).
+    The subsampled chroma are upsampled by repeating each of them over its
+    2x2 block.
+
+    Parameters:
+      :frame:
+        Any object supporting the buffer protocol holding the frame.
+      :width, height:
+        The size of the image, in pixels.
+      :format:
+        The layout of the frame (yuv444/i420/nv12).
+      :matrix:
+        The conversion matrix (yuv/yiq).
+      :layout:
+        The order of the components of each pixel (rgb/rgba/bgr/bgra), the
+        alpha is set to 255.
+      :out:
+        A writable buffer of the right size receiving the pixels. A new
+        bytearray is created if None.
+
+    Returns:
+      out, holding the packed pixels.
+
+    >>> frame = bytes(bytearray([76, 76, 76, 76, 85, 255]))
+    >>> list(ColourArray.YuvFrameToRgbBuffer(frame, 2, 2, layout='rgba')[:4])
+    [255, 0, 0, 255]
+
+    '''
+    if matrix not in _VIDEO_MATRICES:
+      raise ValueError('Invalid video matrix: ' + matrix)
+    if layout not in _BUFFER_LAYOUTS:
+      raise ValueError('Invalid buffer layout: ' + layout)
+    offsets, alpha = _BUFFER_LAYOUTS[layout]
+    stride = len(layout)
+    size, cw, ch = _VideoFrameSize(format, width, height)
+    view = _ByteView(frame)
+    if len(view)!=size:
+      raise ValueError('The frame must hold %d bytes' % size)
+    count = width * height
+    out, target = _ByteTarget(out, count * stride)
+
+    inv = _VIDEO_MATRICES[matrix][1]
+    shift = _VIDEO_SHIFT
+    half = 1 << (shift - 1)
+    if format=='nv12':
+      uo, vo, step = count, count + 1, 2
+    else:
+      uo, vo, step = count, count + cw * ch, 1
+    if numpy is not None:
+      data = numpy.frombuffer(view, dtype=numpy.uint8)
+      y = (data[:count].reshape((height, width)).astype(numpy.intp) << shift) + half
+      u, v = [data[o:o+cw*ch*step:step].reshape((ch, cw)).astype(numpy.intp) - 128 for o in (uo, vo)]
+      if format!='yuv444':
+        u, v = [c.repeat(2, 0).repeat(2, 1)[:height, :width] for c in (u, v)]
+      target = numpy.frombuffer(target, dtype=numpy.uint8)
+      for (ku, kv), o in zip(inv, offsets):
+        target[o::stride] = numpy.clip((y + ku * u + kv * v) >> shift, 0, 255).ravel()
+      if alpha is not None:
+        target[alpha::stride] = 255
+      return out
+
+    data = bytearray(view)
+    luma = [(l << shift) + half for l in range(256)]
+    (ru, rv), (gu, gv), (bu, bv) = [
+      [[k * (c - 128) for c in range(256)] for k in row] for row in inv]
+    ro, go, bo = offsets
+    pixels = bytearray(count * stride)
+    if alpha is not None:
+      pixels[alpha::stride] = b'\xff' * count
+    sub = format!='yuv444' and 1 or 0
+    p = 0
+    for row in range(height):
+      crow = (row >> sub) * cw
+      for x in range(width):
+        c = (crow + (x >> sub)) * step
+        u, v = data[uo + c], data[vo + c]
+        l = luma[data[p // stride]]
+        r = (l + ru[u] + rv[v]) >> shift
+        g = (l + gu[u] + gv[v]) >> shift
+        b = (l + bu[u] + bv[v]) >> shift
+        pixels[p + ro] = min(255, max(0, r))
+        pixels[p + go] = min(255, max(0, g))
+        pixels[p + bo] = min(255, max(0, b))
+        p += stride
+    target[:] = bytes(pixels)
+    return out
+
+  def __GetAlpha(self):
+    if self.__a is None:
+      return _Channel([1.0] * len(self))
+    return self.__a
+  alpha = property(fget=__GetAlpha, doc='The transparency channel of these Colours.')
+
+  def __GetWRef(self):
+    return self.__wref
+  whiteRef = property(fget=__GetWRef, doc='the white reference point of these Colours.')
+
+  def __GetRGB(self):
+    return self.__rgb
+  rgb = property(fget=__GetRGB, doc='The RGB channels of these Colours.')
+
+  def ToHsl(self):
+    '''Return the HSL channels of these Colours.'''
+    return ColourArray.RgbToHsl(*self.__rgb)
+
+  def ToHsv(self):
+    '''Return the HSV channels of these Colours.'''
+    return ColourArray.RgbToHsv(*self.__rgb)
+
+  def ToYiq(self):
+    '''Return the YIQ channels of these Colours.'''
+    return ColourArray.RgbToYiq(*self.__rgb)
+
+  def ToYuv(self):
+    '''Return the YUV channels of these Colours.'''
+    return ColourArray.RgbToYuv(*self.__rgb)
+
+  def ToXyz(self):
+    '''Return the CIE-XYZ channels of these Colours.'''
+    return ColourArray.RgbToXyz(*self.__rgb)
+
+  def ToLab(self, wref=None):
+    '''Return the CIE-LAB channels of these Colours.
+
+    Parameters:
+      :wref:
+        The whitepoint reference, default is the one of this instance.
+
+    >>> ca = ColourArray.NewFromRgb((1,), (0.5,), (0,))
+    >>> ['(%g, %g, %g)' % v for v in zip(*ca.ToLab())]
+    ['(66.9518, 0.43084, 0.739692)']
+    >>> ['(%g, %g, %g)' % v for v in zip(*ca.ToLab(Colour.WHITE_REFERENCE['std_D50']))]
+    ['(66.9518, 0.411662, 0.672821)']
+
+    '''
+    if wref is None: wref = self.__wref
+    return ColourArray.XyzToLab(wref=wref, *ColourArray.RgbToXyz(*self.__rgb))
+
+  def ToCmy(self):
+    '''Return the CMY channels of these Colours.'''
+    return ColourArray.RgbToCmy(*self.__rgb)
+
+  def ToCmyk(self):
+    '''Return the CMYK channels of these Colours.'''
+    return ColourArray.CmyToCmyk(*ColourArray.RgbToCmy(*self.__rgb))
+
+  def ToGreyscale(self):
+    '''Return the greyscale equivalent of these Colours (RGB channels).'''
+    return ColourArray.RgbToGreyscale(*self.__rgb)
+
+  def ToInt(self, format='pil'):
+    '''Return these Colours packed as 32 bits integers.
+
+    Parameters:
+      :format:
+        The layout of the integers (pil/rgb/argb), see :meth:`RgbToInt`.
+
+    >>> ca = ColourArray.NewFromRgb((1, 0), (0.5, 0), (0, 1), alpha=(1, 0.5))
+    >>> ['0x%08x' % v for v in ca.ToInt('argb')]
+    ['0xffff8000', '0x800000ff']
+
+    '''
+    return ColourArray.RgbToInt(alpha=self.__a, format=format, *self.__rgb)
+
+  def ToBuffer(self, layout='rgb', out=None):
+    '''Pack these Colours as 8 bits pixels.
+
+    The values are clamped to [0...1] and rounded like in
+    :meth:`Colour.RgbToIntTuple`.
+
+    Parameters:
+      :layout:
+        The order of the components of each pixel (rgb/rgba/bgr/bgra).
+      :out:
+        A writable buffer of the right size receiving the pixels, it can be
+        the buffer these Colours were read from. A new bytearray is created
+        if None. It must be a bytearray on Python 2.
+
+    Returns:
+      out, holding the packed pixels.
+
+    >>> ca = ColourArray.NewFromRgb((1, 0), (0.5, 0), (0, 1), alpha=(1, 0.5))
+    >>> list(ca.ToBuffer('bgra'))
+    [0, 128, 255, 255, 255, 0, 0, 128]
+
+    '''
+    if out is None:
+      out = bytearray(len(layout) * len(self))
+    view, stride, offsets, alpha = _PackedView(out, layout, True)
+    if len(view)!=stride * len(self):
+      raise ValueError('out must hold %d bytes' % (stride * len(self)))
+
+    channels = list(zip(offsets, self.__rgb))
+    if alpha is not None:
+      channels.append((alpha, self.alpha))
+
+    for i, c in channels:
+      view[i::stride] = _ByteChannel(c)
+    return out
+
+  def DominantColours(self, count=8, method='mediancut', space='rgb', sample=4096,
+      iterations=20, tolerance=1e-3, seed=0):
+    '''Extract the dominant Colours of these Colours (e.g. of an image).
+
+    Use :meth:`ColourArray.NewFromBuffer` to extract the palette of packed
+    pixels.
+
+    Parameters:
+      :count:
+        The number of Colours to extract.
+      :method:
+        The clustering algorithm:
+          :mediancut: split the Colours recursively at the median of their
+            widest component.
+          :kmeans: k-means clustering, seeded with k-means++.
+      :space:
+        The space the Colours are clustered in (rgb/lab).
+      :sample:
+        If there are more Colours than this, only this number of randomly
+        picked Colours are clustered. None or 0 to use all the Colours.
+      :iterations:
+        The maximum number of k-means iterations.
+      :tolerance:
+        The k-means iterations stop when no centre moves by more than this
+        (in the units of the space).
+      :seed:
+        The seed of the sampling and of the k-means++ initialization.
+
+    Returns:
+      A list of (grapefruit.Colour, weight) tuples, the weight being the
+      share of the Colours represented by the Colour, the largest first.
+
+    >>> ca = ColourArray.NewFromRgb([1, 0, 1, 0.8, 0], [0, 0, 0, 0, 0.5], [0, 1, 0, 0, 1])
+    >>> [(c.html, w) for c, w in ca.DominantColours(2)]
+    [('#ee0000', 0.6), ('#0040ff', 0.4)]
+    >>> [(c.html, w) for c, w in ca.DominantColours(2, 'kmeans', 'lab')]
+    [('#ee0000', 0.6), ('#2051ff', 0.4)]
+
+    '''
+    if method not in ('mediancut', 'kmeans'):
+      raise ValueError('Invalid palette extraction method: ' + method)
+    if space not in ('rgb', 'lab'):
+      raise ValueError('Invalid palette extraction space: ' + space)
+    if not len(self):
+      return []
+
+    indices = None
+    if sample and len(self) > sample:
+      indices = sorted(random.Random(seed).sample(range(len(self)), sample))
+
+    # Only the sampled Colours are converted.
+    channels = self.__rgb
+    if indices is not None:
+      if numpy is not None:
+        channels = [c[indices] for c in channels]
+      else:
+        channels = [[c[i] for i in indices] for c in channels]
+    if space=='lab':
+      channels = ColourArray.XyzToLab(wref=self.__wref, *ColourArray.RgbToXyz(*channels))
+    if numpy is not None:
+      points = numpy.column_stack(channels)
+      if space=='lab': points = numpy.column_stack(_CieLab(*points.T))
+    else:
+      points = list(zip(*channels))
+      if space=='lab': points = [_CieLab(*p) for p in points]
+
+    if method=='mediancut':
+      if numpy is not None: points = [tuple(p) for p in points.tolist()]
+      clusters = _MedianCut(points, count)
+    else:
+      clusters = _KMeans(points, count, iterations, tolerance, random.Random(seed))
+
+    total = float(sum((c[0] for c in clusters)))
+    colours = []
+    for population, centre in sorted(clusters, key=lambda c: -c[0]):
+      if space=='lab':
+        l, a, b = centre
+        centre = Colour.XyzToRgb(*Colour.LabToXyz(l, a / _LAB_AB_SCALE, b / _LAB_AB_SCALE, self.__wref))
+      rgb = tuple((min(1.0, max(0.0, v)) for v in centre))
+      colours.append((Colour(rgb, 'rgb', 1.0, self.__wref), population / total))
+    return colours
+
+class ColourLut(object):
+  '''A 3D lookup table sampling a function of the RGB values.
+
+  The table is "baked" once by evaluating the function on a regular
+  size x size x size grid covering the RGB cube, then the function is
+  approximated for any RGB value by interpolating the nearest grid nodes.
+  This makes long chains of conversions as cheap as a single one.
+
+  Two interpolation methods are available:
+    :trilinear:
+      Interpolate the 8 nodes of the grid cell holding the value.
+    :tetrahedral:
+      Interpolate the 4 nodes of the tetrahedron of the cell holding the
+      value. Faster, and usually at least as accurate along the grey axis.
+
+  The input values are clamped to [0...1].
+
+  Example usage:
+
+    >>> toLab = lambda r, g, b: Colour.XyzToLab(*Colour.RgbToXyz(r, g, b))
+    >>> lut = ColourLut(toLab, size=33)
+    >>> '(%.2f, %.2f, %.2f)' % lut.Lookup(1, 0.5, 0)
+    '(66.95, 0.43, 0.74)'
+
+  '''
+
+  def __init__(self, fn, size=33, batch=False):
+    '''Bake a new grapefruit.ColourLut.
+
+    Parameters:
+      :fn:
+        The function to sample. It takes the r, g and b components and returns
+        a tuple of values (e.g. Colour.RgbToHsl).
+      :size:
+        The number of nodes along each axis of the grid [2...].
+      :batch:
+        If True, fn is a batch function taking and returning channels
+        (e.g. ColourArray.RgbToHsl), and is called once for the whole grid.
+
+    '''
+    if size < 2:
+      raise ValueError('The lookup table size must be at least 2')
+
+    self.__fn = fn
+    self.__batch = batch
+    self.__size = size
+
+    # The grid nodes, in (r, g, b) order with b varying the fastest.
+    axis = [i / (size - 1.0) for i in range(size)]
+    r = [v for v in axis for i in range(size * size)]
+    g = [v for v in axis for i in range(size)] * size
+    b = axis * (size * size)
+
+    if batch:
+      nodes = list(zip(*fn(r, g, b)))
+    else:
+      nodes = [tuple(fn(*rgb)) for rgb in zip(r, g, b)]
+
+    self.__channels = len(nodes[0])
+    if numpy is None:
+      self.__table = nodes
+    else:
+      self.__table = numpy.array(nodes, dtype=numpy.float64).reshape((size, size, size, self.__channels))
+
+  def __GetSize(self):
+    return self.__size
+  size = property(fget=__GetSize, doc='The number of nodes along each axis of the grid.')
+
+  def __GetChannels(self):
+    return self.__channels
+  channels = property(fget=__GetChannels, doc='The number of values returned for each Colour.')
+
+  def Lookup(self, r, g, b, method='trilinear'):
+    '''Return the interpolated value of the function for a single Colour.
+
+    Parameters:
+      :r:
+        The Red component value [0...1]
+      :g:
+        The Green component value [0...1]
+      :b:
+        The Blue component value [0...1]
+      :method:
+        The interpolation method (trilinear/tetrahedral).
+
+    Returns:
+      A tuple of self.channels values.
+
+    '''
+    return tuple((float(c[0]) for c in self.Apply((r,), (g,), (b,), method)))
+
+  def Apply(self, r, g, b, method='trilinear'):
+    '''Return the interpolated value of the function for channels of Colours.
+
+    Parameters:
+      :r:
+        The Red channel [0...1]
+      :g:
+        The Green channel [0...1]
+      :b:
+        The Blue channel [0...1]
+      :method:
+        The interpolation method (trilinear/tetrahedral).
+
+    Returns:
+      A tuple of self.channels channels.
+
+    >>> lut = ColourLut(ColourArray.RgbToGreyscale, size=2, batch=True)
+    >>> y, y, y = lut.Apply((1, 0.25), (0.5, 0.5), (0, 0.75), 'tetrahedral')
+    >>> ['%g' % v for v in y]
+    ['0.5', '0.5']
+
+    '''
+    if method not in ('trilinear', 'tetrahedral'):
+      raise ValueError('Invalid interpolation method: ' + method)
+    if numpy is None:
+      return self.__ApplyPython(r, g, b, method)
+    return self.__ApplyNumpy(r, g, b, method)
+
+  def __ApplyNumpy(self, r, g, b, method):
+    last = self.__size - 1
+    index, frac = [], []
+    for v in _Channels(r, g, b):
+      p = numpy.clip(v, 0.0, 1.0) * last
+      i = numpy.minimum(numpy.floor(p), last - 1).astype(numpy.intp)
+      index.append(i)
+      frac.append((p - i)[:, numpy.newaxis])
+    (ir, ig, ib), (fr, fg, fb) = index, frac
+
+    t = self.__table
+    def node(dr, dg, db):
+      return t[ir + dr, ig + dg, ib + db]
+
+    if method=='trilinear':
+      c00 = node(0, 0, 0) + (node(1, 0, 0) - node(0, 0, 0)) * fr
+      c01 = node(0, 0, 1) + (node(1, 0, 1) - node(0, 0, 1)) * fr
+      c10 = node(0, 1, 0) + (node(1, 1, 0) - node(0, 1, 0)) * fr
+      c11 = node(0, 1, 1) + (node(1, 1, 1) - node(0, 1, 1)) * fr
+      c0 = c00 + (c10 - c00) * fg
+      c1 = c01 + (c11 - c01) * fg
+      out = c0 + (c1 - c0) * fb
+    else:
+      out = numpy.empty((len(ir), self.__channels))
+      for mask, (w1, w2, w3), (a, bb) in self.__Tetrahedra(fr[:, 0], fg[:, 0], fb[:, 0]):
+        if not mask.any(): continue
+        i = (ir[mask], ig[mask], ib[mask])
+        c000 = t[i]
+        ca = t[i[0] + a[0], i[1] + a[1], i[2] + a[2]]
+        cb = t[i[0] + bb[0], i[1] + bb[1], i[2] + bb[2]]
+        c111 = t[i[0] + 1, i[1] + 1, i[2] + 1]
+        w1, w2, w3 = [w[mask][:, numpy.newaxis] for w in (w1, w2, w3)]
+        out[mask] = c000 + (ca - c000) * w1 + (cb - ca) * w2 + (c111 - cb) * w3
+
+    return tuple((out[:, c] for c in range(self.__channels)))
+
+  @staticmethod
+  def __Tetrahedra(fr, fg, fb):
+    '''Return the tetrahedra of a cell along with the masks selecting them.
+
+    Each item is (mask, weights, vertices) where weights are the fractional
+    parts sorted in decreasing order and vertices are the offsets of the two
+    nodes between the (0, 0, 0) and (1, 1, 1) corners of the cell.
+
+    '''
+    rg, gb, rb = (fr >= fg), (fg >= fb), (fr >= fb)
+    return (
+      (rg & gb,           (fr, fg, fb), ((1, 0, 0), (1, 1, 0))),
+      (rg & ~gb & rb,     (fr, fb, fg), ((1, 0, 0), (1, 0, 1))),
+      (rg & ~gb & ~rb,    (fb, fr, fg), ((0, 0, 1), (1, 0, 1))),
+      (~rg & gb & rb,     (fg, fr, fb), ((0, 1, 0), (1, 1, 0))),
+      (~rg & gb & ~rb,    (fg, fb, fr), ((0, 1, 0), (0, 1, 1))),
+      (~rg & ~gb,         (fb, fg, fr), ((0, 0, 1), (0, 1, 1))))
+
+  @staticmethod
+  def __Tetrahedron(fr, fg, fb):
+    '''Return the tetrahedron of a cell holding a single Colour.
+
+    Scalar version of __Tetrahedra, returning (weights, vertices).
+
+    '''
+    if fr >= fg:
+      if fg >= fb: return (fr, fg, fb), ((1, 0, 0), (1, 1, 0))
+      if fr >= fb: return (fr, fb, fg), ((1, 0, 0), (1, 0, 1))
+      return (fb, fr, fg), ((0, 0, 1), (1, 0, 1))
+    if fg >= fb:
+      if fr >= fb: return (fg, fr, fb), ((0, 1, 0), (1, 1, 0))
+      return (fg, fb, fr), ((0, 1, 0), (0, 1, 1))
+    return (fb, fg, fr), ((0, 0, 1), (0, 1, 1))
+
+  def __ApplyPython(self, r, g, b, method):
+    size = self.__size
+    last = size - 1
+    t = self.__table
+    n = range(self.__channels)
+    tetrahedron = ColourLut.__Tetrahedron
+    out = []
+
+    # Offsets of the cell corners from the (0, 0, 0) one.
+    offsets = dict((((dr, dg, db), (dr * size + dg) * size + db)
+        for dr in (0, 1) for dg in (0, 1) for db in (0, 1)))
+    o001, o010, o011 = offsets[0, 0, 1], offsets[0, 1, 0], offsets[0, 1, 1]
+    o100, o101, o110, o111 = offsets[1, 0, 0], offsets[1, 0, 1], offsets[1, 1, 0], offsets[1, 1, 1]
+
+    for rgb in zip(r, g, b):
+      base = 0
+      frac = []
+      for v in rgb:
+        p = min(max(v, 0.0), 1.0) * last
+        i = min(int(p), last - 1)
+        base = base * size + i
+        frac.append(p - i)
+      fr, fg, fb = frac
+
+      if method=='trilinear':
+        c000, c001, c010, c011 = t[base], t[base + o001], t[base + o010], t[base + o011]
+        c100, c101, c110, c111 = t[base + o100], t[base + o101], t[base + o110], t[base + o111]
+        values = []
+        for c in n:
+          c00 = c000[c] + (c100[c] - c000[c]) * fr
+          c01 = c001[c] + (c101[c] - c001[c]) * fr
+          c10 = c010[c] + (c110[c] - c010[c]) * fr
+          c11 = c011[c] + (c111[c] - c011[c]) * fr
+          c0 = c00 + (c10 - c00) * fg
+          c1 = c01 + (c11 - c01) * fg
+          values.append(c0 + (c1 - c0) * fb)
+      else:
+        (w1, w2, w3), (a, bb) = tetrahedron(fr, fg, fb)
+        c000, ca, cb, c111 = t[base], t[base + offsets[a]], t[base + offsets[bb]], t[base + o111]
+        values = [c000[c] + (ca[c] - c000[c]) * w1 + (cb[c] - ca[c]) * w2 + (c111[c] - cb[c]) * w3 for c in n]
+      out.append(values)
+
+    if not out:
+      return tuple((array('d') for c in n))
+    return tuple((array('d', c) for c in zip(*out)))
+
+  def Accuracy(self, samples=4096, method='trilinear', seed=0):
+    '''Compare the interpolated values with the exact ones.
+
+    The function baked in the table is evaluated on random RGB values and
+    compared with the values interpolated from the table.
+
+    Parameters:
+      :samples:
+        The number of random Colours to compare.
+      :method:
+        The interpolation method (trilinear/tetrahedral).
+      :seed:
+        The seed of the random generator, so that the reports can be compared.
+
+    Returns:
+      A dictionary with the following keys:
+        :samples:
+          The number of Colours compared.
+        :max:
+          The largest absolute error, for each channel.
+        :mean:
+          The mean absolute error, for each channel.
+        :rms:
+          The root mean square error, for each channel.
+
+    >>> lut = ColourLut(Colour.RgbToXyz, size=33)
+    >>> report = lut.Accuracy(1000)
+    >>> max(report['max']) < 1e-3
+    True
+
+    '''
+    rnd = random.Random(seed)
+    r, g, b = [[rnd.random() for i in range(samples)] for c in range(3)]
+
+    if self.__batch:
+      exact = self.__fn(r, g, b)
+    else:
+      exact = list(zip(*[self.__fn(*rgb) for rgb in zip(r, g, b)]))
+    return _ErrorReport(exact, self.Apply(r, g, b, method))
+
+class ColourGradient(object):
+  '''The gradient Colours between two Colours, computed on demand.
+
+  This is the lazy counterpart of :meth:`Colour.Gradient`: it behaves like
+  the list returned by Gradient (same Colours, in the same order) but only
+  stores its two ends, each Colour being computed when it is accessed.
+  Slicing returns another ColourGradient, and the RGBA values of a whole
+  gradient can be computed at once with :meth:`ToRgba`.
+
+  Example usage:
+
+    >>> c1 = Colour.NewFromRgb(1.0, 0.0, 0.0, alpha=1)
+    >>> c2 = Colour.NewFromRgb(0.0, 1.0, 0.0, alpha=0)
+    >>> g = ColourGradient(c1, c2, 65535)
+    >>> len(g)
+    65535
+    >>> g[32767]
+    (0.5, 0.5, 0.0, 0.5)
+    >>> list(ColourGradient(c1, c2, 3))
+    [(0.75, 0.25, 0.0, 0.75), (0.5, 0.5, 0.0, 0.5), (0.25, 0.75, 0.0, 0.25)]
+    >>> len(g[::256])
+    256
+
+  '''
+
+  def __init__(self, start, target, steps=100):
+    '''Instantiate a new grapefruit.ColourGradient object.
+
+    Parameters:
+      :start:
+        The grapefruit.Colour at the start of the gradient.
+      :target:
+        The grapefruit.Colour at the other end of the gradient.
+      :steps:
+        The number of gradients steps.
+
+    '''
+    self.__rgba1 = start.rgb + (start.alpha,)
+    self.__rgba2 = target.rgb + (target.alpha,)
+    self.__wref = start.whiteRef
+    self.__steps = steps + 1
+    self.__indices = range(1, self.__steps)
+
+  def __len__(self):
+    return len(self.__indices)
+
+  def __getitem__(self, index):
+    if isinstance(index, slice):
+      gradient = object.__new__(ColourGradient)
+      gradient.__rgba1 = self.__rgba1
+      gradient.__rgba2 = self.__rgba2
+      gradient.__wref = self.__wref
+      gradient.__steps = self.__steps
+      gradient.__indices = self.__indices[index]
+      return gradient
+
+    d = 1.0*self.__indices[index]/self.__steps
+    r, g, b, a = [(v1*(1-d)) + (v2*d) for v1, v2 in zip(self.__rgba1, self.__rgba2)]
+    return Colour((r, g, b), 'rgb', a, self.__wref)
+
+  def __iter__(self):
+    for i in range(len(self)):
+      yield self[i]
+
+  def __repr__(self):
+    return 'ColourGradient(%r)' % list(self)
+
+  def ToRgba(self):
+    '''Return the RGBA channels of all the Colours of this gradient.
+
+    Returns:
+      The (r, g, b, a) tuple of channels, NumPy arrays when NumPy is
+      available, array.array('d') otherwise.
+
+    >>> c1 = Colour.NewFromRgb(1.0, 0.0, 0.0, alpha=1)
+    >>> c2 = Colour.NewFromRgb(0.0, 1.0, 0.0, alpha=0)
+    >>> r, g, b, a = ColourGradient(c1, c2, 3).ToRgba()
+    >>> [float(v) for v in g]
+    [0.25, 0.5, 0.75]
+
+    '''
+    indices = self.__indices
+    if numpy is not None:
+      d = numpy.arange(indices.start, indices.stop, indices.step, dtype=numpy.float64) / self.__steps
+      e = 1 - d
+      return tuple(((v1*e) + (v2*d) for v1, v2 in zip(self.__rgba1, self.__rgba2)))
+
+    d = [1.0*n/self.__steps for n in indices]
+    return tuple((array('d', [(v1*(1-t)) + (v2*t) for t in d]) for v1, v2 in zip(self.__rgba1, self.__rgba2)))
+
+  def ToColourArray(self):
+    '''Return the Colours of this gradient as a grapefruit.ColourArray.'''
+    r, g, b, a = self.ToRgba()
+    return ColourArray((r, g, b), 'rgb', a, self.__wref)
+
+class Palette(object):
+  '''A fixed set of Colours indexed for the nearest Colour queries.
+
+  The Colours are converted once to the space of the distance metric, then
+  snapping any Colour (or a whole batch of them) to the palette only returns
+  the index of the nearest entry, no grapefruit.Colour instance is created.
+
+  The available metrics are:
+    :rgb:
+      The euclidean distance between the RGB values.
+    :lab:
+      The CIE76 ΔE, the euclidean distance between the CIE-LAB values
+      (2° D65 white reference).
+
+  Example usage:
+
+    >>> p = Palette([Colour.NewFromHtml(n) for n in ('black', 'white', 'red', 'navy')])
+    >>> len(p)
+    4
+    >>> p.Nearest(Colour.NewFromRgb(0.8, 0.1, 0.2))
+    2
+    >>> [int(i) for i in p.NearestMany(ColourArray.NewFromRgb((0.1, 0.9, 0), (0.1, 0.9, 0), (0.3, 0.9, 0.4)))]
+    [0, 1, 3]
+
+  '''
+
+  def __init__(self, colours, metric='lab'):
+    '''Instantiate a new grapefruit.Palette object.
+
+    Parameters:
+      :colours:
+        The entries of the palette, a sequence of grapefruit.Colour instances
+        or a grapefruit.ColourArray instance.
+      :metric:
+        The distance used to compare the Colours (rgb/lab).
+
+    '''
+    if metric not in ('rgb', 'lab'):
+      raise ValueError('Invalid distance metric: ' + metric)
+    if not isinstance(colours, ColourArray):
+      colours = ColourArray.NewFromColours(colours)
+    if not len(colours):
+      raise ValueError('A palette needs at least one Colour')
+
+    self.__colours = colours
+    self.__metric = metric
+    self.__points = list(zip(*self.__ToSpace(*colours.rgb)))
+    self.__tree = None
+    self.__array = None
+
+  def __ToSpace(self, r, g, b):
+    '''Return the channels of the RGB channels in the metric space.'''
+    if self.__metric=='rgb':
+      return (r, g, b)
+    lab = ColourArray.XyzToLab(*ColourArray.RgbToXyz(r, g, b))
+    if numpy is not None:
+      return _CieLab(*[numpy.asarray(c, dtype=numpy.float64) for c in lab])
+    return tuple(zip(*[_CieLab(*v) for v in zip(*lab)])) or ((), (), ())
+
+  def __len__(self):
+    return len(self.__colours)
+
+  def __getitem__(self, index):
+    return self.__colours[index]
+
+  def __GetColours(self):
+    return self.__colours
+  colours = property(fget=__GetColours, doc='The entries of this palette, as a grapefruit.ColourArray.')
+
+  def __GetMetric(self):
+    return self.__metric
+  metric = property(fget=__GetMetric, doc='The distance metric of this palette (rgb/lab).')
+
+  def Nearest(self, colour):
+    '''Return the index of the palette entry nearest to a Colour.
+
+    Parameters:
+      :colour:
+        A grapefruit.Colour instance, or a (r, g, b) tuple.
+
+    Returns:
+      The index of the nearest entry.
+
+    '''
+    if isinstance(colour, Colour):
+      colour = colour.rgb
+    if self.__metric=='rgb':
+      point = colour
+    else:
+      point = _CieLab(*Colour.XyzToLab(*Colour.RgbToXyz(*colour)))
+    if self.__tree is None:
+      self.__tree = _KdTree(self.__points)
+    return self.__tree.Nearest(point)[0][1]
+
+  def NearestMany(self, colours):
+    '''Return the index of the palette entry nearest to each Colour.
+
+    With NumPy, all the distances are computed by chunks of Colours. Otherwise
+    the k-d tree of the entries is searched once for each distinct Colour.
+
+    Parameters:
+      :colours:
+        A grapefruit.ColourArray instance, or a sequence of grapefruit.Colour
+        instances.
+
+    Returns:
+      The indices, a NumPy array when NumPy is available, an array.array
+      otherwise.
+
+    '''
+    if not isinstance(colours, ColourArray):
+      colours = ColourArray.NewFromColours(colours)
+
+    if numpy is not None:
+      if self.__array is None:
+        self.__array = numpy.array(self.__points, dtype=numpy.float64)
+      queries = numpy.column_stack(self.__ToSpace(*colours.rgb)).reshape((-1, 3))
+      return _NearestBrute(queries, self.__array)[0][:, 0]
+
+    known = {}
+    indices = array('l')
+    for rgb in zip(*colours.rgb):
+      i = known.get(rgb)
+      if i is None:
+        i = known[rgb] = self.Nearest(rgb)
+      indices.append(i)
+    return indices
+
+# The binary format of the Colour collections: a header followed by fixed
+# size records, all little endian. The header holds the magic bytes, the
+# format version, the code of the values type, the flags of the optional
+# fields and the number of records (_SERIAL_UNKNOWN_COUNT when it wasn't
+# known, the records then go up to the end of the data). Each record holds
+# the r, g and b values, then the alpha value and the index of the white
+# reference in _WREF_NAMES when their flags are set.
+_SERIAL_MAGIC = b'GFCL'
+_SERIAL_VERSION = 1
+_SERIAL_HEADER = struct.Struct('<4sBBBxQ')
+_SERIAL_ALPHA = 0x01
+_SERIAL_WREF = 0x02
+_SERIAL_UNKNOWN_COUNT = (1 << 64) - 1
+
+# The types of the values: (code, struct format, NumPy type, scale of the
+# integers).
+_SERIAL_TYPES = {
+  'uint8':   (0, 'B', 'u1', 255),
+  'uint16':  (1, 'H', '<u2', 65535),
+  'float32': (2, 'f', '<f4', None),
+  'float64': (3, 'd', '<f8', None)}
+
+# The white references by index in the records, and the index of their
+# values (the first name wins for the duplicated values). The order is part
+# of the format: the new references must be added at the end.
+_WREF_NAMES = (
+  'std_A', 'std_B', 'std_C', 'std_D50', 'std_D55', 'std_D65', 'std_D75',
+  'std_E', 'std_F1', 'std_F2', 'std_F3', 'std_F4', 'std_F5', 'std_F6',
+  'std_F7', 'std_F8', 'std_F9', 'std_F10', 'std_F11', 'std_F12',
+  'sup_A', 'sup_B', 'sup_C', 'sup_D50', 'sup_D55', 'sup_D65', 'sup_D75',
+  'sup_E', 'sup_F1', 'sup_F2', 'sup_F3', 'sup_F4', 'sup_F5', 'sup_F6',
+  'sup_F7', 'sup_F8', 'sup_F9', 'sup_F10', 'sup_F11', 'sup_F12')
+_WREF_INDEX = {}
+for _i, _name in enumerate(_WREF_NAMES):
+  _WREF_INDEX.setdefault(Colour.WHITE_REFERENCE[_name], _i)
+del _i, _name
+
+class _RecordLayout(object):
+  '''The layout of the records of a binary Colour collection.'''
+
+  def __init__(self, dtype, alpha, wref):
+    if dtype not in _SERIAL_TYPES:
+      raise ValueError('Invalid value type: %s' % dtype)
+    self.code, fmt, npType, self.scale = _SERIAL_TYPES[dtype]
+    self.dtype = dtype
+    self.alpha = alpha
+    self.wref = wref
+    self.values = alpha and 4 or 3
+    self.record = struct.Struct('<' + fmt * self.values + (wref and 'B' or ''))
+    self.size = self.record.size
+    self.names = ('r', 'g', 'b', 'alpha')[:self.values]
+    if numpy is not None:
+      fields = [(name, npType) for name in self.names]
+      if wref: fields.append(('wref', 'u1'))
+      self.numpy = numpy.dtype(fields)
+
+  @staticmethod
+  def FromHeader(data):
+    '''Return the layout and the number of records (None if unknown) of a header.'''
+    if len(data) < _SERIAL_HEADER.size:
+      raise ValueError('Truncated Colour collection header')
+    magic, version, code, flags, count = _SERIAL_HEADER.unpack_from(data)
+    if magic!=_SERIAL_MAGIC:
+      raise ValueError('Not a Colour collection')
+    if version!=_SERIAL_VERSION:
+      raise ValueError('Unsupported Colour collection version: %d' % version)
+    types = [name for name, t in _SERIAL_TYPES.items() if t[0]==code]
+    if not types:
+      raise ValueError('Invalid value type code: %d' % code)
+    if count==_SERIAL_UNKNOWN_COUNT: count = None
+    return _RecordLayout(types[0], bool(flags & _SERIAL_ALPHA), bool(flags & _SERIAL_WREF)), count
+
+  def Header(self, count=None):
+    '''Return the header of count records (None if unknown).'''
+    flags = (self.alpha and _SERIAL_ALPHA or 0) | (self.wref and _SERIAL_WREF or 0)
+    if count is None: count = _SERIAL_UNKNOWN_COUNT
+    return _SERIAL_HEADER.pack(_SERIAL_MAGIC, _SERIAL_VERSION, self.code, flags, count)
+
+  def WrefIndex(self, wref):
+    '''Return the index of the white reference wref.'''
+    try:
+      return _WREF_INDEX[tuple(wref)]
+    except KeyError:
+      raise ValueError('Not a Colour.WHITE_REFERENCE value: %r' % (wref,))
+
+  def Pack(self, values, wref):
+    '''Return the record of the (r, g, b, alpha) values and white reference.'''
+    values = tuple(values)[:self.values]
+    scale = self.scale
+    if scale is not None:
+      values = tuple((min(scale, max(0, int(round(v * scale)))) for v in values))
+    if self.wref: values += (self.WrefIndex(wref),)
+    return self.record.pack(*values)
+
+  def IterUnpack(self, data):
+    '''Iterate over the unpacked values of the records held by data.'''
+    if hasattr(self.record, 'iter_unpack'):
+      return self.record.iter_unpack(data)
+    # Python 2 has no Struct.iter_unpack.
+    return (self.record.unpack_from(data, i) for i in range(0, len(data), self.size))
+
+  def Unpack(self, values):
+    '''Return the Colour of the unpacked values of a record.'''
+    scale = self.scale or 1.0
+    rgb = (values[0] / scale, values[1] / scale, values[2] / scale)
+    alpha = 1.0
+    if self.alpha: alpha = values[3] / scale
+    wref = _DEFAULT_WREF
+    if self.wref: wref = Colour.WHITE_REFERENCE[_WREF_NAMES[values[-1]]]
+    return Colour(rgb, 'rgb', alpha, wref)
+
+  def PackArray(self, colours):
+    '''Return the records of the Colours of a ColourArray.'''
+    if numpy is None:
+      wref = colours.whiteRef
+      return b''.join((self.Pack(v, wref) for v in zip(*(colours.rgb + (colours.alpha,)))))
+
+    channels = list(colours.rgb)
+    if self.alpha: channels.append(colours.alpha)
+    records = numpy.empty(len(colours), dtype=self.numpy)
+    for name, c in zip(self.names, channels):
+      if self.scale is not None:
+        c = numpy.clip(numpy.rint(numpy.asarray(c) * self.scale), 0, self.scale)
+      records[name] = c
+    if self.wref: records['wref'] = self.WrefIndex(colours.whiteRef)
+    return records.tobytes()
+
+  def UnpackArray(self, data):
+    '''Return the ColourArray of the records held by data.'''
+    if numpy is None:
+      columns = list(zip(*self.IterUnpack(data))) or [()] * (self.values + self.wref)
+      scale = self.scale or 1.0
+      channels = [array('d', (v / scale for v in c)) for c in columns[:self.values]]
+      indices = self.wref and set(columns[-1]) or ()
+    else:
+      records = numpy.frombuffer(data, dtype=self.numpy)
+      channels = [records[name].astype(numpy.float64) for name in self.names]
+      if self.scale is not None:
+        for c in channels: c /= self.scale
+      indices = self.wref and numpy.unique(records['wref']).tolist() or ()
+
+    if len(indices) > 1:
+      raise ValueError('The records use several white references')
+    wref = _DEFAULT_WREF
+    if indices: wref = Colour.WHITE_REFERENCE[_WREF_NAMES[min(indices)]]
+    alpha = None
+    if self.alpha: alpha = channels[3]
+    return ColourArray(tuple(channels[:3]), 'rgb', alpha, wref)
+
+class ColourWriter(object):
+  '''Write Colours to a binary stream, in a compact format.
+
+  The stream starts with a fixed size header describing the records: the
+  type of the values (uint8, uint16, float32 or float64), whether the alpha
+  values and the white references are stored, and the number of records.
+  Each Colour is then written as a fixed size record. The integer types
+  store the values clamped to [0...1] and rounded, the float types store
+  them as is. The white references are stored as an index into
+  :const:`Colour.WHITE_REFERENCE`.
+
+  The records are written as they are received. When the stream is seekable
+  (e.g. a file), the number of records is written in the header by
+  :meth:`Close`. Otherwise it is left unknown and the readers read the
+  records up to the end of the stream.
+
+  Example usage:
+
+    >>> import io
+    >>> stream = io.BytesIO()
+    >>> with ColourWriter(stream, 'uint8', alpha=True) as writer:
+    ...   writer.Write(Colour.NewFromHtml('#ff8000', 0.5))
+    ...   writer.WriteArray(ColourArray.NewFromRgb((0, 1), (0, 1), (1, 1)))
+    >>> len(stream.getvalue())
+    28
+    >>> list(ColourReader(io.BytesIO(stream.getvalue())))
+    [(1.0, 0.5019607843137255, 0.0, 0.5019607843137255), (0.0, 0.0, 1.0, 1.0), (1.0, 1.0, 1.0, 1.0)]
+
+  '''
+
+  def __init__(self, stream, dtype='float32', alpha=False, wref=False):
+    '''Write the header of a new Colour collection.
+
+    Parameters:
+      :stream:
+        The binary file-like object receiving the Colours.
+      :dtype:
+        The type of the stored values (uint8/uint16/float32/float64).
+      :alpha:
+        If True, store the alpha values (the Colours read back are opaque
+        otherwise).
+      :wref:
+        If True, store the white reference of each Colour (the Colours read
+        back use the default one otherwise). It must be one of the
+        :const:`Colour.WHITE_REFERENCE` values.
+
+    '''
+    self.__layout = _RecordLayout(dtype, alpha, wref)
+    self.__stream = stream
+    self.__count = 0
+    # The position of the header, None if it can't be written again.
+    self.__start = None
+    if getattr(stream, 'seekable', None) and stream.seekable():
+      self.__start = stream.tell()
+    stream.write(self.__layout.Header())
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.Close()
+
+  def __GetCount(self):
+    return self.__count
+  count = property(fget=__GetCount, doc='The number of Colours written.')
+
+  def Write(self, colour):
+    '''Write a single Colour.
+
+    Parameters:
+      :colour:
+        A grapefruit.Colour instance.
+
+    '''
+    self.__stream.write(self.__layout.Pack(tuple(colour), colour.whiteRef))
+    self.__count += 1
+
+  def WriteArray(self, colours):
+    '''Write the Colours of a ColourArray, at once.
+
+    Parameters:
+      :colours:
+        A grapefruit.ColourArray instance.
+
+    '''
+    self.__stream.write(self.__layout.PackArray(colours))
+    self.__count += len(colours)
+
+  def Close(self):
+    '''Write the number of records in the header, when the stream is seekable.
+
+    The stream itself is left open.
+
+    '''
+    if self.__start is None:
+      return
+    end = self.__stream.tell()
+    self.__stream.seek(self.__start)
+    self.__stream.write(self.__layout.Header(self.__count))
+    self.__stream.seek(end)
+
+class ColourReader(object):
+  '''Read Colours from a binary stream written by a :class:`ColourWriter`.
+
+  The records are read as they are requested, one or many at a time.
+  Iterating over the reader yields the remaining Colours.
+
+  '''
+
+  def __init__(self, stream):
+    '''Read the header of a Colour collection.
+
+    Parameters:
+      :stream:
+        The binary file-like object holding the Colours.
+
+    Throws:
+      :ValueError:
+        If the stream doesn't start with a Colour collection header.
+
+    '''
+    self.__layout, self.__count = _RecordLayout.FromHeader(stream.read(_SERIAL_HEADER.size))
+    self.__stream = stream
+    self.__read = 0
+
+  def __iter__(self):
+    while True:
+      colours = self.Read(1024)
+      if not colours:
+        return
+      for c in colours:
+        yield c
+
+  def __GetDType(self):
+    return self.__layout.dtype
+  dtype = property(fget=__GetDType, doc='The type of the stored values (uint8/uint16/float32/float64).')
+
+  def __GetHasAlpha(self):
+    return self.__layout.alpha
+  hasAlpha = property(fget=__GetHasAlpha, doc='Boolean indicating whether the alpha values are stored.')
+
+  def __GetHasWhiteRef(self):
+    return self.__layout.wref
+  hasWhiteRef = property(fget=__GetHasWhiteRef, doc='Boolean indicating whether the white references are stored.')
+
+  def __GetCount(self):
+    return self.__count
+  count = property(fget=__GetCount, doc='The number of Colours of the collection, None if unknown.')
+
+  def __ReadRecords(self, count):
+    '''Return the bytes of the next count records (all the remaining if None).'''
+    remaining = self.__count
+    if remaining is not None:
+      remaining -= self.__read
+      if count is None or count > remaining: count = remaining
+    size = self.__layout.size
+    if count is None:
+      data = self.__stream.read()
+    else:
+      data = self.__stream.read(count * size)
+    if len(data) % size or (remaining is not None and len(data) < count * size):
+      raise ValueError('Truncated Colour collection')
+    self.__read += len(data) // size
+    return data
+
+  def Read(self, count=None):
+    '''Read the next Colours.
+
+    Parameters:
+      :count:
+        The number of Colours to read, None to read all the remaining ones.
+
+    Returns:
+      A list of grapefruit.Colour instances, shorter than count at the end of
+      the collection.
+
+    '''
+    layout = self.__layout
+    return [layout.Unpack(v) for v in layout.IterUnpack(self.__ReadRecords(count))]
+
+  def ReadArray(self, count=None):
+    '''Read the next Colours at once.
+
+    Parameters:
+      :count:
+        The number of Colours to read, None to read all the remaining ones.
+
+    Returns:
+      A grapefruit.ColourArray instance, shorter than count at the end of the
+      collection.
+
+    Throws:
+      :ValueError:
+        If the Colours have different white references.
+
+    '''
+    return self.__layout.UnpackArray(self.__ReadRecords(count))
+
+class MappedColours(object):
+  '''The Colours of a binary collection file, memory mapped.
+
+  The file written by a :class:`ColourWriter` is mapped in memory, and its
+  records are decoded when accessed: opening even a huge collection is
+  immediate, and only the pages holding the accessed records are read.
+  :attr:`records` exposes the records themselves, without copying them.
+
+  Example usage:
+
+    >>> import os, tempfile
+    >>> fd, path = tempfile.mkstemp()
+    >>> with os.fdopen(fd, 'wb') as f, ColourWriter(f, 'float64') as writer:
+    ...   writer.WriteArray(ColourArray.NewFromRgb((1, 0), (0.5, 0), (0, 1)))
+    >>> with MappedColours(path) as colours:
+    ...   len(colours), colours[1], colours[-2]
+    (2, (0.0, 0.0, 1.0, 1.0), (1.0, 0.5, 0.0, 1.0))
+    >>> os.remove(path)
+
+  '''
+
+  def __init__(self, path):
+    '''Map a Colour collection file.
+
+    Parameters:
+      :path:
+        The path of the file.
+
+    Throws:
+      :ValueError:
+        If the file doesn't hold a complete Colour collection.
+
+    '''
+    with open(path, 'rb') as f:
+      self.__map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    self.__layout, count = _RecordLayout.FromHeader(self.__map)
+    size = self.__layout.size
+    available = len(self.__map) - _SERIAL_HEADER.size
+    if count is None:
+      if available % size:
+        raise ValueError('Truncated Colour collection')
+      count = available // size
+    elif available < count * size:
+      raise ValueError('Truncated Colour collection')
+    self.__count = count
+    self.__exported = False
+    try:
+      self.__data = memoryview(self.__map)[_SERIAL_HEADER.size:_SERIAL_HEADER.size + count * size]
+    except TypeError:
+      # The Python 2 mmaps only support the old buffer protocol.
+      self.__data = buffer(self.__map, _SERIAL_HEADER.size, count * size)
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.Close()
+
+  def __len__(self):
+    return self.__count
+
+  def __getitem__(self, index):
+    data = self.__Data()
+    if index < 0: index += self.__count
+    if not 0 <= index < self.__count:
+      raise IndexError('Colour index out of range')
+    layout = self.__layout
+    return layout.Unpack(layout.record.unpack_from(data, index * layout.size))
+
+  def __iter__(self):
+    layout = self.__layout
+    for v in layout.IterUnpack(self.__Data()):
+      yield layout.Unpack(v)
+
+  def __Data(self):
+    '''Return the bytes of the records, raise ValueError once closed.'''
+    if self.__data is None:
+      raise ValueError('I/O operation on closed collection')
+    return self.__data
+
+  def __GetDType(self):
+    return self.__layout.dtype
+  dtype = property(fget=__GetDType, doc='The type of the stored values (uint8/uint16/float32/float64).')
+
+  def __GetHasAlpha(self):
+    return self.__layout.alpha
+  hasAlpha = property(fget=__GetHasAlpha, doc='Boolean indicating whether the alpha values are stored.')
+
+  def __GetHasWhiteRef(self):
+    return self.__layout.wref
+  hasWhiteRef = property(fget=__GetHasWhiteRef, doc='Boolean indicating whether the white references are stored.')
+
+  def __GetRecords(self):
+    self.__exported = True
+    if numpy is not None:
+      return numpy.frombuffer(self.__Data(), dtype=self.__layout.numpy)
+    return self.__Data()
+  records = property(fget=__GetRecords, doc='''The records, read in the mapped file without copying them.
+
+    A NumPy structured array (with the r, g, b, alpha and wref fields) when
+    NumPy is available, a memoryview of the bytes of the records otherwise
+    (a buffer on Python 2).
+    It must not be used after the file is closed.''')
+
+  def ToColourArray(self, start=0, stop=None):
+    '''Decode Colours into a ColourArray.
+
+    Parameters:
+      :start, stop:
+        The range of the decoded records, all of them by default.
+
+    Returns:
+      A grapefruit.ColourArray instance.
+
+    Throws:
+      :ValueError:
+        If the Colours have different white references.
+
+    '''
+    data = self.__Data()
+    start, stop, step = slice(start, stop).indices(self.__count)
+    size = self.__layout.size
+    return self.__layout.UnpackArray(data[start * size:max(start, stop) * size])
+
+  def Close(self):
+    '''Unmap the file.
+
+    The mapping is only released when the arrays returned by
+    :attr:`records` are not referenced anymore.
+
+    '''
+    if self.__data is None:
+      return
+    data, self.__data = self.__data, None
+    if not isinstance(data, memoryview) and self.__exported:
+      # Python 2 can't tell whether the records are still used, the mapping
+      # is released with them.
+      return
+    try:
+      if isinstance(data, memoryview):
+        data.release()
+      self.__map.close()
+    except BufferError:
+      # Still exported to NumPy arrays, the mapping is released with them.
+      pass
+
 def _test():
   import doctest
   reload(doctest)
@@ -0,0 +1,687 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-#
+
+# Copyright (c) 2008, Xavier Basty
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Benchmarks for the grapefruit module.
+
+Run this script to print the throughput of the timed operations:
+
+  $ python grapefruit_bench.py
+
+The --suite option times every conversion, constructor, property and method
+of Colour and ColourArray instead. Its results can be saved as JSON and
+compared with those of another commit, the script exits with status 1 when
+an operation got slower than the threshold:
+
+  $ python grapefruit_bench.py --json before.json
+  $ python grapefruit_bench.py --baseline before.json --threshold 0.1
+
+With --json -, the JSON report is written to the standard output and the
+rates to the standard error.
+
+'''
+
+# $Id$
+__author__ = 'xbasty@gmail.com'
+__version__ = '0.1a3'
+
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import platform
+import re
+import subprocess
+import sys
+from array import array
+import timeit
+
+try:
+  import tracemalloc
+except ImportError:
+  tracemalloc = None
+
+import grapefruit
+
+Colour = grapefruit.Colour
+
+def Rate(fn, number=20000, repeat=3):
+  '''Return the number of calls per second of fn (best of repeat runs).'''
+  best = min(timeit.repeat(fn, number=number, repeat=repeat))
+  return number / best
+
+def BenchConstructors():
+  '''Time the Colour constructors.'''
+  return [
+    ('Colour(rgb)',       lambda: Colour((1.0, 0.5, 0.0), 'rgb')),
+    ('Colour(hsl)',       lambda: Colour((30.0, 1.0, 0.5), 'hsl')),
+    ('NewFromRgb',        lambda: Colour.NewFromRgb(1.0, 0.5, 0.0)),
+    ('NewFromHtml',       lambda: Colour.NewFromHtml('#ff8000')),
+    ('NewFromHtml.html',  lambda: Colour.NewFromHtml('#ff8000').html),
+    ('NewFromHtml.hsl',   lambda: Colour.NewFromHtml('#ff8000').hsl),
+  ]
+
+def BenchProperties():
+  '''Time the Colour properties (first access, then cached).'''
+  col = Colour.NewFromRgb(1.0, 0.5, 0.0)
+  return [
+    ('lab (first access)',  lambda: Colour.NewFromRgb(1.0, 0.5, 0.0).lab),
+    ('lab (cached)',        lambda: col.lab),
+    ('html (first access)', lambda: Colour.NewFromRgb(1.0, 0.5, 0.0).html),
+    ('html (cached)',       lambda: col.html),
+  ]
+
+def BenchGamma():
+  '''Time the sRGB gamma correction (computed and from the tables).'''
+  xyz = Colour.RgbToXyz(1.0, 0.5, 0.25)
+  return [
+    ('RgbToXyz',            lambda: Colour.RgbToXyz(1.0, 0.5, 0.25)),
+    ('IntTupleToXyz',       lambda: Colour.IntTupleToXyz((255, 128, 64))),
+    ('IntTupleToXyz(16)',   lambda: Colour.IntTupleToXyz((65535, 32768, 16384), 16)),
+    ('XyzToRgb',            lambda: Colour.XyzToRgb(*xyz)),
+    ('XyzToRgb(lut)',       lambda: Colour.XyzToRgb(lut=True, *xyz)),
+  ]
+
+def _Pixels(count=4096):
+  '''Return the r, g, b channels of count pseudo random Colours.'''
+  return tuple(([((i * k) % 997) / 996.0 for i in range(count)] for k in (7, 13, 31)))
+
+def BenchLut():
+  '''Time a chain of conversions, exact and through a ColourLut (4096 Colours).'''
+  r, g, b = _Pixels()
+  def chain(r, g, b):
+    l, a, bb = Colour.XyzToLab(*Colour.RgbToXyz(r, g, b))
+    return Colour.XyzToRgb(*Colour.LabToXyz(l * 0.9, a, bb))
+  lut = grapefruit.ColourLut(chain, size=33)
+  return [
+    ('exact',               lambda: [chain(*rgb) for rgb in zip(r, g, b)], 5),
+    ('lut trilinear',       lambda: lut.Apply(r, g, b, 'trilinear'), 5),
+    ('lut tetrahedral',     lambda: lut.Apply(r, g, b, 'tetrahedral'), 5),
+  ]
+
+def BenchPalette():
+  '''Snap 4096 Colours to a 256 entries palette.'''
+  r, g, b = _Pixels()
+  pr, pg, pb = _Pixels(256)
+  entries = [Colour.NewFromRgb(*rgb) for rgb in zip(pb, pr, pg)]
+  labs = [e.lab for e in entries]
+  def pairwise():
+    for rgb in zip(r, g, b):
+      lab = Colour.NewFromRgb(*rgb).lab
+      min(range(len(labs)), key=lambda i: sum(((u - v) ** 2 for u, v in zip(lab, labs[i]))))
+  palette = grapefruit.Palette(entries)
+  pixels = grapefruit.ColourArray.NewFromRgb(r, g, b)
+  return [
+    ('pairwise lab',        pairwise, 1),
+    ('Palette.NearestMany', lambda: palette.NearestMany(pixels), 5),
+  ]
+
+def BenchBuffer():
+  '''Convert a 64x64 RGBA buffer to float32 HSL values.'''
+  r, g, b = _Pixels()
+  pixels = bytearray([int(v * 255) for rgb in zip(r, g, b) for v in rgb + (1,)])
+  out = array('f', [0.0]) * (3 * len(r))
+  def perPixel():
+    values = []
+    for i in range(0, len(pixels), 4):
+      values.extend(Colour.RgbToHsl(*Colour.IntTupleToRgb(pixels[i:i+3])))
+    return array('f', values)
+  return [
+    ('per pixel',           perPixel, 5),
+    ('ConvertBuffer',       lambda: grapefruit.ColourArray.ConvertBuffer(pixels, grapefruit.ColourArray.RgbToHsl, 'rgba', out), 5),
+  ]
+
+def BenchGradient():
+  '''Compute the RGBA values of a 65535 steps gradient.'''
+  c1 = Colour.NewFromRgb(1.0, 0.0, 0.0, alpha=1)
+  c2 = Colour.NewFromRgb(0.0, 0.0, 1.0, alpha=0.5)
+  gradient = grapefruit.ColourGradient(c1, c2, 65535)
+  return [
+    ('Colour.Gradient',     lambda: [c.rgb + (c.alpha,) for c in c1.Gradient(c2, 65535)], 2),
+    ('ColourGradient.ToRgba', gradient.ToRgba, 2),
+  ]
+
+def BenchDeltaE():
+  '''Compare 4096 Colours to 64 reference Colours (CIEDE2000).'''
+  lab1 = grapefruit.ColourArray.NewFromRgb(*_Pixels()).ToLab()
+  lab2 = grapefruit.ColourArray.NewFromRgb(*_Pixels(64)).ToLab()
+  refs = list(zip(*lab2))
+  def pairwise():
+    return [[Colour.DeltaE(v1, v2, 'ciede2000') for v2 in refs] for v1 in zip(*lab1)]
+  return [
+    ('pairwise',            pairwise, 1),
+    ('DeltaEMatrix',        lambda: grapefruit.ColourArray.DeltaEMatrix(lab1, lab2, 'ciede2000'), 5),
+    ('DeltaEPairs',         lambda: grapefruit.ColourArray.DeltaEPairs(lab1, lab2, 2.0, 'ciede2000'), 5),
+  ]
+
+def BenchDominant():
+  '''Extract 8 dominant Colours of 4096 Colours (all of them sampled).'''
+  pixels = grapefruit.ColourArray.NewFromRgb(*_Pixels())
+  return [
+    ('mediancut rgb',       lambda: pixels.DominantColours(8, 'mediancut', 'rgb'), 5),
+    ('kmeans rgb',          lambda: pixels.DominantColours(8, 'kmeans', 'rgb'), 5),
+    ('kmeans lab',          lambda: pixels.DominantColours(8, 'kmeans', 'lab'), 5),
+  ]
+
+def BenchDither():
+  '''Reduce a 64x64 RGB image to the web safe palette.'''
+  r, g, b = _Pixels()
+  pixels = bytearray([int(v * 255) for rgb in zip(r, g, b) for v in rgb])
+  def perPixel():
+    out = bytearray()
+    for i in range(0, len(pixels), 3):
+      out.extend(Colour.RgbToIntTuple(*Colour.RgbToWebSafe(*Colour.IntTupleToRgb(pixels[i:i+3]))))
+    return out
+  dither = grapefruit.ColourArray.DitherWebSafe
+  return [
+    ('RgbToWebSafe',        perPixel, 5),
+    ('nearest',             lambda: dither(pixels, 64, method='nearest'), 5),
+    ('bayer',               lambda: dither(pixels, 64, method='bayer'), 5),
+    ('floydsteinberg',      lambda: dither(pixels, 64, method='floydsteinberg'), 5),
+    ('atkinson',            lambda: dither(pixels, 64, method='atkinson'), 5),
+  ]
+
+def BenchVideo():
+  '''Convert a 64x64 RGB image to an I420 video frame and back.'''
+  r, g, b = _Pixels()
+  pixels = bytearray([int(v * 255) for rgb in zip(r, g, b) for v in rgb])
+  frame = grapefruit.ColourArray.RgbBufferToYuvFrame(pixels, 64)
+  def perPixel():
+    return [Colour.RgbToYuv(*Colour.IntTupleToRgb(pixels[i:i+3])) for i in range(0, len(pixels), 3)]
+  return [
+    ('RgbToYuv',            perPixel, 5),
+    ('RgbBufferToYuvFrame', lambda: grapefruit.ColourArray.RgbBufferToYuvFrame(pixels, 64), 5),
+    ('YuvFrameToRgbBuffer', lambda: grapefruit.ColourArray.YuvFrameToRgbBuffer(frame, 64, 64), 5),
+  ]
+
+def BenchIntPacking():
+  '''Pack 4096 Colours as PIL integers and unpack them.'''
+  rgb = _Pixels()
+  pil = grapefruit.ColourArray.RgbToPil(*rgb)
+  return [
+    ('RgbToPil',            lambda: [Colour.RgbToPil(*v) for v in zip(*rgb)], 5),
+    ('ColourArray.RgbToPil', lambda: grapefruit.ColourArray.RgbToPil(*rgb), 5),
+    ('PilToRgb',            lambda: [Colour.PilToRgb(v) for v in pil], 5),
+    ('ColourArray.PilToRgb', lambda: grapefruit.ColourArray.PilToRgb(pil), 5),
+  ]
+
+def BenchHtml():
+  '''Encode 4096 Colours as #RRGGBB strings and decode them.'''
+  rgb = _Pixels()
+  html = grapefruit.ColourArray.RgbToHtml(*rgb)
+  data = grapefruit.ColourArray.RgbToHtmlBytes(*rgb)
+  return [
+    ('RgbToHtml',           lambda: [Colour.RgbToHtml(*v) for v in zip(*rgb)], 5),
+    ('ColourArray.RgbToHtml', lambda: grapefruit.ColourArray.RgbToHtml(*rgb), 5),
+    ('RgbToHtmlBytes',      lambda: grapefruit.ColourArray.RgbToHtmlBytes(*rgb), 5),
+    ('HtmlToRgb',           lambda: [Colour.HtmlToRgb(h) for h in html], 5),
+    ('ColourArray.HtmlToRgb', lambda: grapefruit.ColourArray.HtmlToRgb(html), 5),
+    ('HtmlToRgb(bytes)',    lambda: grapefruit.ColourArray.HtmlToRgb(data), 5),
+  ]
+
+def BenchConversionCache():
+  '''Convert 1000 HTML Colours drawn from 100 distinct values to CIE-LAB.'''
+  html = [Colour.RgbToHtml(*rgb) for rgb in zip(*_Pixels(100))] * 10
+  def convert():
+    return [Colour.XyzToLab(*Colour.RgbToXyz(*Colour.HtmlToRgb(h))) for h in html]
+  def cached():
+    Colour.EnableConversionCache(256, ('HtmlToRgb', 'RgbToXyz', 'XyzToLab'))
+    try:
+      return convert()
+    finally:
+      Colour.DisableConversionCache()
+  return [
+    ('uncached',            convert, 50),
+    ('cached',              cached, 50),
+  ]
+
+def BenchInterned():
+  '''Create 1000 Colours from 10 names and get their CIE-LAB values.'''
+  names = sorted(Colour.NAMED_Colour)[:10] * 100
+  def shared():
+    Colour.ClearInterned()
+    for name in names:
+      Colour.NewInterned(name, 'html').lab
+  return [
+    ('NewFromHtml',         lambda: [Colour.NewFromHtml(name).lab for name in names], 20),
+    ('NewInterned',         shared, 20),
+    ('set',                 lambda: set((Colour.NewFromHtml(name) for name in names)), 20),
+  ]
+
+def BenchInstrumentation():
+  '''Create 1000 Colours from HTML and get their CIE-LAB values.'''
+  def convert():
+    for i in range(1000):
+      Colour.NewFromHtml('#ff8000').lab
+  def instrumented():
+    with Colour.Instrumented():
+      convert()
+  return [
+    ('disabled',            convert, 20),
+    ('enabled',             instrumented, 20),
+  ]
+
+def BenchFastMath():
+  '''Convert 4096 Colours to CIE-LAB and back, exact and fast.'''
+  rgb = _Pixels()
+  CA = grapefruit.ColourArray
+  lab = CA.XyzToLab(*CA.RgbToXyz(*rgb))
+  return [
+    ('RgbToLab',            lambda: [Colour.XyzToLab(*Colour.RgbToXyz(*v)) for v in zip(*rgb)], 5),
+    ('LabToRgb',            lambda: [Colour.XyzToRgb(*Colour.LabToXyz(*v)) for v in zip(*lab)], 5),
+    ('LabToRgb(fast)',      lambda: [Colour.XyzToRgb(*Colour.LabToXyz(fast=True, *v)) for v in zip(*lab)], 5),
+    ('ColourArray.RgbToLab', lambda: CA.XyzToLab(*CA.RgbToXyz(*rgb)), 50),
+    ('ColourArray.RgbToLab(fast)', lambda: CA.XyzToLab(fast=True, *CA.RgbToXyz(fast=True, *rgb)), 50),
+    ('ColourArray.LabToRgb', lambda: CA.XyzToRgb(*CA.LabToXyz(*lab)), 50),
+    ('ColourArray.LabToRgb(fast)', lambda: CA.XyzToRgb(fast=True, *CA.LabToXyz(fast=True, *lab)), 50),
+  ]
+
+def BenchSerialization():
+  '''Write 4096 Colours and read them back (JSON and binary).'''
+  colours = grapefruit.ColourArray.NewFromRgb(*_Pixels())
+  rgb = [c.rgb for c in colours]
+  data = json.dumps(rgb)
+  def write(dtype):
+    stream = io.BytesIO()
+    with grapefruit.ColourWriter(stream, dtype) as writer:
+      writer.WriteArray(colours)
+    return stream.getvalue()
+  packed = write('float32')
+  return [
+    ('json.dumps',          lambda: json.dumps(rgb), 20),
+    ('json.loads',          lambda: grapefruit.ColourArray.NewFromColours([Colour(tuple(v)) for v in json.loads(data)]), 20),
+    ('WriteArray(uint8)',   lambda: write('uint8'), 20),
+    ('WriteArray(float32)', lambda: write('float32'), 20),
+    ('ReadArray(float32)',  lambda: grapefruit.ColourReader(io.BytesIO(packed)).ReadArray(), 20),
+    ('Read(float32)',       lambda: grapefruit.ColourReader(io.BytesIO(packed)).Read(), 20),
+  ]
+
+def BenchConvert():
+  '''Convert a Colour from HSV to CIE-LAB.'''
+  hsv = (30.0, 1.0, 1.0)
+  hsvToLab = Colour.Converter('hsv', 'lab')
+  return [
+    ('chained',             lambda: Colour.XyzToLab(*Colour.RgbToXyz(*Colour.HsvToRgb(*hsv)))),
+    ('Convert',             lambda: Colour.Convert(hsv, 'hsv', 'lab')),
+    ('Converter',           lambda: hsvToLab(*hsv)),
+  ]
+
+BENCHMARKS = [BenchConstructors, BenchProperties, BenchGamma, BenchLut, BenchPalette, BenchBuffer, BenchGradient,
+    BenchDeltaE, BenchDominant, BenchDither, BenchVideo, BenchIntPacking, BenchHtml, BenchConversionCache,
+    BenchInterned, BenchInstrumentation, BenchFastMath, BenchSerialization, BenchConvert]
+
+def BytesPerInstance(factory, count=100000):
+  '''Return the memory allocated per object created by factory(i).
+
+  The objects are kept alive until the allocations are measured, so the
+  result includes everything they reference (tuples, floats, dictionaries).
+
+  '''
+  tracemalloc.start()
+  try:
+    start = tracemalloc.take_snapshot()
+    objects = [factory(i) for i in range(count)]
+    end = tracemalloc.take_snapshot()
+  finally:
+    tracemalloc.stop()
+  size = sum(stat.size_diff for stat in end.compare_to(start, 'filename'))
+  # Don't count the list holding the objects.
+  size -= sys.getsizeof(objects)
+  return size / count
+
+def MemoryColours():
+  '''Memory used by the Colour instances.'''
+  d50 = Colour.WHITE_REFERENCE['std_D50']
+  def rgb(i):
+    return ((i % 256) / 255.0, ((i >> 8) % 256) / 255.0, (i >> 16) / 255.0)
+  return [
+    ('NewFromRgb',          lambda i: Colour.NewFromRgb(*rgb(i))),
+    # A fresh copy of the white reference for each instance.
+    ('NewFromRgb(wref)',    lambda i: Colour.NewFromRgb(*rgb(i), wref=tuple(list(d50)))),
+    ('NewFromRgb + hsl',    lambda i: _Touch(Colour.NewFromRgb(*rgb(i)), 'hsl')),
+    ('NewFromRgb + lab',    lambda i: _Touch(Colour.NewFromRgb(*rgb(i)), 'lab')),
+  ]
+
+def _Touch(col, name):
+  getattr(col, name)
+  return col
+
+MEMORY_BENCHMARKS = [MemoryColours]
+
+def _RgbToLab(r, g, b):
+  return grapefruit.ColourArray.XyzToLab(*grapefruit.ColourArray.RgbToXyz(r, g, b))
+
+def ScalingParallel():
+  '''ColourArray.ConvertParallel, RGB to CIE-LAB.'''
+  count = grapefruit.numpy is None and (1 << 16) or (1 << 22)
+  rgb = _Pixels(count)
+  def convert(workers):
+    return grapefruit.ColourArray.ConvertParallel(_RgbToLab, rgb, workers=workers, chunk=count // (4 * workers))
+  return count, convert
+
+SCALING_BENCHMARKS = [ScalingParallel]
+
+def Scaling(fn, count, workers, repeat=3):
+  '''Return the number of Colours converted per second by fn(workers).'''
+  return count / min(timeit.repeat(lambda: fn(workers), number=1, repeat=repeat))
+
+# The inputs of the scalar functions, by representation (the part of the
+# function name before 'To', or after 'NewFrom').
+SAMPLES = {
+  'Rgb':      (1.0, 0.5, 0.0),
+  'Hsl':      (30.0, 1.0, 0.5),
+  'Hsv':      (30.0, 1.0, 1.0),
+  'Yiq':      Colour.RgbToYiq(1.0, 0.5, 0.0),
+  'Yuv':      Colour.RgbToYuv(1.0, 0.5, 0.0),
+  'Xyz':      Colour.RgbToXyz(1.0, 0.5, 0.0),
+  'Lab':      Colour.XyzToLab(*Colour.RgbToXyz(1.0, 0.5, 0.0)),
+  'Cmy':      (0.0, 0.5, 1.0),
+  'Cmyk':     (0.0, 0.5, 1.0, 0.0),
+  'Ryb':      (30.0,),
+  'Html':     ('#ff8000',),
+  'Pil':      (0x0080ff,),
+  'IntTuple': ((255, 128, 0),),
+}
+
+# The inputs of the functions not following the naming above.
+SAMPLE_OVERRIDES = {
+  'RgbToRyb': (30.0,),
+}
+
+# The arguments of the Colour methods.
+_OTHER = Colour.NewFromRgb(0.0, 0.5, 1.0, 0.5)
+METHOD_ARGS = {
+  'AlphaBlend':           (_OTHER,),
+  'AnalogousScheme':      (),
+  'Blend':                (_OTHER,),
+  'ColourWithAlpha':      (0.5,),
+  'ColourWithHue':        (120.0,),
+  'ColourWithLightness':  (0.25,),
+  'ColourWithSaturation': (0.25,),
+  'ColourWithWhiteRef':   (Colour.WHITE_REFERENCE['std_D50'],),
+  'ComplementaryColour':  (),
+  'DarkerColour':         (0.1,),
+  'Desaturate':           (0.1,),
+  'Gradient':             (_OTHER, 16),
+  'LighterColour':        (0.1,),
+  'MonochromeScheme':     (),
+  'Saturate':             (0.1,),
+  'TetradicScheme':       (),
+  'TriadicScheme':        (),
+  'WebSafeDither':        (),
+}
+
+# The arguments of the ColourArray methods.
+BATCH_METHOD_ARGS = {
+  'DominantColours':      (8,),
+  'ToBuffer':             (),
+  'ToCmy':                (),
+  'ToCmyk':               (),
+  'ToGreyscale':          (),
+  'ToHsl':                (),
+  'ToHsv':                (),
+  'ToInt':                (),
+  'ToLab':                (),
+  'ToXyz':                (),
+  'ToYiq':                (),
+  'ToYuv':                (),
+}
+
+def _Source(name):
+  '''Return the representation a conversion or constructor converts from.'''
+  if name.startswith('NewFrom'):
+    return name[7:]
+  return name[:name.index('To')]
+
+def _Functions(cls, pattern):
+  '''Return the sorted names of the static methods of cls matching pattern.'''
+  return sorted((n for n, v in vars(cls).items() if isinstance(v, staticmethod) and re.match(pattern, n)))
+
+def _Methods(cls):
+  '''Return the sorted names of the public instance methods of cls.'''
+  return sorted((n for n, v in vars(cls).items()
+    if not n.startswith('_') and callable(v) and not isinstance(v, (staticmethod, classmethod))))
+
+def _Call(fn, args):
+  return lambda: fn(*args)
+
+def _BatchSamples(count=4096):
+  '''Return the inputs of the batch functions (count Colours), by representation.'''
+  ca = grapefruit.ColourArray
+  rgb = _Pixels(count)
+  xyz = ca.RgbToXyz(*rgb)
+  cmy = ca.RgbToCmy(*rgb)
+  pixels = bytes(ca.NewFromRgb(*rgb).ToBuffer())
+  return {
+    'Rgb':        rgb,
+    'Hsl':        ca.RgbToHsl(*rgb),
+    'Hsv':        ca.RgbToHsv(*rgb),
+    'Yiq':        ca.RgbToYiq(*rgb),
+    'Yuv':        ca.RgbToYuv(*rgb),
+    'Xyz':        xyz,
+    'Lab':        ca.XyzToLab(*xyz),
+    'Cmy':        cmy,
+    'Cmyk':       ca.CmyToCmyk(*cmy),
+    'IntTuple':   ca.RgbToIntTuple(*rgb),
+    'Int':        (ca.RgbToInt(*rgb),),
+    'Pil':        (ca.RgbToPil(*rgb),),
+    'Html':       (ca.RgbToHtml(*rgb),),
+    'Colours':    ([Colour.NewFromRgb(*v) for v in zip(*rgb)],),
+    'Buffer':     (pixels,),
+    'RgbBuffer':  (pixels, 64),
+    'YuvFrame':   (ca.RgbBufferToYuvFrame(pixels, 64), 64, 64),
+  }
+
+def SuiteConversions():
+  '''Every Colour conversion function.'''
+  return [(n, _Call(getattr(Colour, n), SAMPLE_OVERRIDES.get(n) or SAMPLES[_Source(n)]))
+    for n in _Functions(Colour, r'[A-Z]\w*To[A-Z]')]
+
+def SuiteBatchConversions():
+  '''Every ColourArray conversion function (4096 Colours).'''
+  samples = _BatchSamples()
+  return [(n, _Call(getattr(grapefruit.ColourArray, n), samples[_Source(n)]))
+    for n in _Functions(grapefruit.ColourArray, r'[A-Z]\w*To[A-Z]')]
+
+def SuiteConstructors():
+  '''Every Colour constructor.'''
+  return [(n, _Call(getattr(Colour, n), SAMPLES[_Source(n)]))
+    for n in _Functions(Colour, r'NewFrom')]
+
+def SuiteBatchConstructors():
+  '''Every ColourArray constructor (4096 Colours).'''
+  samples = _BatchSamples()
+  return [(n, _Call(getattr(grapefruit.ColourArray, n), samples[_Source(n)]))
+    for n in _Functions(grapefruit.ColourArray, r'NewFrom')]
+
+def SuiteProperties():
+  '''Every Colour property (first access, then cached).'''
+  col = Colour.NewFromRgb(*SAMPLES['Rgb'])
+  def first(name):
+    return lambda: getattr(Colour.NewFromRgb(1.0, 0.5, 0.0), name)
+  items = []
+  for n in sorted((n for n, v in vars(Colour).items() if isinstance(v, property))):
+    items.append(('%s (first access)' % n, first(n)))
+    items.append(('%s (cached)' % n, _Call(getattr, (col, n))))
+  return items
+
+def SuiteMethods():
+  '''Every Colour method: blending, gradients, schemes...'''
+  col = Colour.NewFromRgb(*SAMPLES['Rgb'])
+  return [(n, _Call(getattr(col, n), METHOD_ARGS[n])) for n in _Methods(Colour)]
+
+def SuiteBatchMethods():
+  '''Every ColourArray method (4096 Colours).'''
+  colours = grapefruit.ColourArray.NewFromRgb(*_Pixels())
+  return [(n, _Call(getattr(colours, n), BATCH_METHOD_ARGS[n])) for n in _Methods(grapefruit.ColourArray)]
+
+SUITE_BENCHMARKS = [SuiteConversions, SuiteBatchConversions, SuiteConstructors, SuiteBatchConstructors,
+    SuiteProperties, SuiteMethods, SuiteBatchMethods]
+
+def Measure(fn, number=None, repeat=3):
+  '''Return the number of calls per second of fn (best of repeat runs).
+
+  If number is None, it is chosen so that each run lasts at least 0.2s.
+
+  '''
+  if number is None:
+    # The 1, 2, 5, 10, 20... sequence of Timer.autorange (missing from
+    # Python 2).
+    number, i = 1, 0
+    while timeit.timeit(fn, number=number) < 0.2:
+      i += 1
+      number = (1, 2, 5)[i % 3] * 10 ** (i // 3)
+  return number / min(timeit.repeat(fn, number=number, repeat=repeat))
+
+def RunSuite(benches, pattern=None, repeat=3, out=None):
+  '''Time the items of benches.
+
+  Parameters:
+    :benches:
+      The functions returning the (name, fn[, number]) items to time.
+    :pattern:
+      If not None, only the items whose full name matches this regular
+      expression are timed.
+    :repeat:
+      The number of runs of each item, the best one is kept.
+    :out:
+      If not None, the file the rates are printed to as they are measured.
+
+  Returns:
+    The calls per second of each item, by full name ('Group/name').
+
+  '''
+  results = {}
+  for bench in benches:
+    group = bench.__name__
+    items = [item for item in bench() if pattern is None or re.search(pattern, '%s/%s' % (group, item[0]))]
+    if items and out:
+      out.write('%s\n' % bench.__doc__)
+    for item in items:
+      name, fn = item[:2]
+      rate = Measure(fn, len(item) > 2 and item[2] or None, repeat)
+      results['%s/%s' % (group, name)] = rate
+      if out:
+        out.write('  %-32s %12.0f calls/s\n' % (name, rate))
+  return results
+
+def Environment():
+  '''Return the description of the benchmarked code and interpreter.'''
+  try:
+    commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.STDOUT,
+      cwd=os.path.dirname(os.path.abspath(__file__))).decode('ascii').strip()
+  except (OSError, subprocess.CalledProcessError):
+    commit = None
+  numpy = grapefruit.numpy
+  return {
+    'grapefruit': grapefruit.__version__,
+    'commit': commit,
+    'python': '%s %s' % (platform.python_implementation(), platform.python_version()),
+    'machine': platform.machine(),
+    'backend': numpy is None and 'python' or 'numpy ' + numpy.__version__,
+  }
+
+def Compare(results, baseline, threshold=0.1):
+  '''Return the regressions of results against baseline.
+
+  Parameters:
+    :results, baseline:
+      The calls per second by name, as returned by RunSuite.
+    :threshold:
+      The relative slowdown above which an item is reported: with 0.1, the
+      items running at less than 90% of their baseline rate.
+
+  Returns:
+    The sorted list of the (name, baseline rate, rate) of the regressions.
+
+  '''
+  return sorted(((n, baseline[n], r) for n, r in results.items()
+    if n in baseline and r < baseline[n] * (1 - threshold)))
+
+def Main(argv=None, out=sys.stdout, log=sys.stderr):
+  parser = argparse.ArgumentParser(description='Benchmark the grapefruit module.')
+  parser.add_argument('--suite', action='store_true',
+    help='time every conversion, constructor, property and method')
+  parser.add_argument('--json', metavar='FILE',
+    help='write the suite results as JSON to FILE, - for the standard output (implies --suite)')
+  parser.add_argument('--baseline', metavar='FILE',
+    help='compare the suite results with a previous --json output (implies --suite)')
+  parser.add_argument('--threshold', type=float, default=0.1,
+    help='the relative slowdown reported as a regression (default: 0.1)')
+  parser.add_argument('--filter', metavar='REGEX',
+    help='only time the suite items whose Group/name matches REGEX')
+  parser.add_argument('--repeat', type=int, default=3,
+    help='the number of runs of each suite item (default: 3)')
+  parser.add_argument('--pure', action='store_true',
+    help='use the pure Python ColourArray backend even if NumPy is available')
+  args = parser.parse_args(argv)
+  if args.pure:
+    grapefruit.numpy = None
+
+  if args.suite or args.json or args.baseline:
+    stream = out
+    if args.json=='-':
+      # The output only receives the JSON report, the rates and the
+      # regressions are written to the log.
+      out = log
+    results = RunSuite(SUITE_BENCHMARKS + BENCHMARKS, args.filter, args.repeat, out)
+    if args.json:
+      report = {'environment': Environment(), 'results': results}
+      if args.json=='-':
+        json.dump(report, stream, indent=2, sort_keys=True)
+        stream.write('\n')
+      else:
+        with open(args.json, 'w') as f:
+          json.dump(report, f, indent=2, sort_keys=True)
+    if not args.baseline:
+      return 0
+    with open(args.baseline) as f:
+      baseline = json.load(f)
+    backend = baseline['environment']['backend']
+    if backend!=Environment()['backend']:
+      out.write('warning: the baseline was measured with the %s backend\n' % backend)
+    regressions = Compare(results, baseline['results'], args.threshold)
+    for name, before, after in regressions:
+      out.write('regression: %s %.0f -> %.0f calls/s (x%.2f)\n' % (name, before, after, after / before))
+    return regressions and 1 or 0
+
+  for bench in BENCHMARKS:
+    out.write('%s\n' % bench.__doc__)
+    for item in bench():
+      name, fn = item[:2]
+      out.write('  %-24s %12.0f calls/s\n' % (name, Rate(fn, *item[2:])))
+
+  for bench in SCALING_BENCHMARKS:
+    out.write('%s\n' % bench.__doc__)
+    count, fn = bench()
+    base = None
+    for workers in range(1, multiprocessing.cpu_count() + 1):
+      rate = Scaling(fn, count, workers)
+      base = base or rate
+      out.write('  %-24s %12.0f colours/s  x%.2f\n' % ('%d workers' % workers, rate, rate / base))
+
+  if tracemalloc is None: return 0
+  for bench in MEMORY_BENCHMARKS:
+    out.write('%s\n' % bench.__doc__)
+    for name, factory in bench():
+      out.write('  %-24s %12.0f bytes/instance\n' % (name, BytesPerInstance(factory)))
+  return 0
+
+if __name__ == '__main__':
+  sys.exit(Main())
+
+# vim: ts=2 sts=2 sw=2 et
@@ -23,6 +23,14 @@ __version__ = '0.1a3'
 
 import unittest
 import doctest
+import io
+import json
+import math
+import os
+import random
+import shutil
+import tempfile
+from array import array
 import grapefruit
 
 # Also run doctests.
@@ -118,6 +126,39 @@ class ConversionTest(GrapeFruitTestCase):
   def testRgbToGreyscale(self):
     self.assertEqual((0.6, 0.6, 0.6), grapefruit.Colour.RgbToGreyscale(1, 0.8, 0))
 
+class GammaTableTest(GrapeFruitTestCase):
+  '''Test the sRGB gamma correction tables.'''
+
+  def testIntTupleToXyz(self):
+    C = grapefruit.Colour
+    for v in range(256):
+      rgb = (v, 255-v, (v*7) % 256)
+      self.assertEqual(C.RgbToXyz(*C.IntTupleToRgb(rgb)), C.IntTupleToXyz(rgb))
+
+  def testIntTupleToXyz16(self):
+    C = grapefruit.Colour
+    for v in range(0, 65536, 97):
+      rgb = (v, 65535-v, 0)
+      self.assertEqual(C.RgbToXyz(*[c / 65535.0 for c in rgb]), C.IntTupleToXyz(rgb, 16))
+    self.assertRaises(ValueError, C.IntTupleToXyz, (0, 0, 0), 12)
+
+  def testXyzToRgbTable(self):
+    C = grapefruit.Colour
+    for i in range(2001):
+      v = i / 2000.0
+      xyz = C.RgbToXyz(v, v*v, 1-v)
+      self.assertNear(C.XyzToRgb(*xyz), C.XyzToRgb(lut=True, *xyz), 1e-4)
+    # Out of gamut values are computed.
+    xyz = C.RgbToXyz(1.1, -0.1, 0.5)
+    self.assertEqual(C.XyzToRgb(*xyz), C.XyzToRgb(lut=True, *xyz))
+
+  def testBatch(self):
+    r, g, b = (255, 0, 17), (128, 255, 200), (0, 64, 255)
+    x, y, z = grapefruit.ColourArray.IntTupleToXyz(r, g, b)
+    for i, rgb in enumerate(zip(r, g, b)):
+      self.assertNear(grapefruit.Colour.IntTupleToXyz(rgb), (x[i], y[i], z[i]), 1e-12)
+
+
 class NewFromTest(GrapeFruitTestCase):
   '''Test the static Colour instanciation methods.'''
   def testNewFromRgb(self):
@@ -219,6 +260,16 @@ class ColourTest(GrapeFruitTestCase):
 
     self.assertRaises(ValueError, grapefruit.Colour, (30, 1, 0.5), 'hsv')
 
+  def testLazyRepresentation(self):
+    c = grapefruit.Colour((1.0, 0.5, 0.0), mode='rgb')
+    self.assertEqual(None, c._Colour__hsl)
+    self.assertEqual((30, 1, 0.5), c.hsl)
+    self.assertEqual((30, 1, 0.5), c._Colour__hsl)
+    c = grapefruit.Colour((30, 1, 0.5), mode='hsl')
+    self.assertEqual(None, c._Colour__rgb)
+    self.assertEqual(30, c.hue)
+    self.assertEqual((1.0, 0.5, 0.0), c.rgb)
+
   def testEq(self):
     self.assertEqual(self.rgbCol, self.hslCol)
     self.assertEqual(self.rgbCol, (1.0, 0.5, 0.0, 1.0))
@@ -226,6 +277,13 @@ class ColourTest(GrapeFruitTestCase):
     self.assertEqual([1.0, 0.5, 0.0, 1.0], self.rgbCol)
     self.assertNotEqual(self.rgbCol, '(1.0, 0.5, 0.0, 1.0)')
 
+  def testHash(self):
+    self.assertEqual(hash(self.rgbCol), hash(self.hslCol))
+    self.assertEqual(hash(self.rgbCol), hash((1.0, 0.5, 0.0, 1.0)))
+    self.assertEqual(1, len(set([self.rgbCol, self.hslCol, grapefruit.Colour.NewFromRgb(1, 0.5, 0)])))
+    self.assertEqual(2, len(set([self.rgbCol, grapefruit.Colour.NewFromRgb(1.0, 0.5, 0.0, 0.5)])))
+    self.assertEqual('orange', {self.rgbCol: 'orange'}[self.hslCol])
+
   def testRepr(self):
     self.assertEqual(repr(self.rgbCol), '(1.0, 0.5, 0.0, 1.0)')
     self.assertEqual(repr(self.hslCol), '(1.0, 0.5, 0.0, 1.0)')
@@ -259,6 +317,47 @@ class ColourTest(GrapeFruitTestCase):
     c = grapefruit.Colour.NewFromRgb(1, 0.5, 0, wref=grapefruit.Colour.WHITE_REFERENCE['std_D50'])
     self.assertNear(c.lab, (66.9518, 0.4117, 0.6728))
 
+  def testCachedProperties(self):
+    c = grapefruit.Colour.NewFromRgb(1.0, 0.5, 0.0)
+    self.assertTrue(c.lab is c.lab)
+    self.assertTrue(c.html is c.html)
+    self.assertEqual(c.lab, grapefruit.Colour.XyzToLab(*grapefruit.Colour.RgbToXyz(1.0, 0.5, 0.0)))
+
+  def testCachedWhiteRef(self):
+    d50 = grapefruit.Colour.WHITE_REFERENCE['std_D50']
+    c = grapefruit.Colour.NewFromRgb(1.0, 0.5, 0.0)
+    lab, xyz = c.lab, c.xyz
+    c2 = c.ColourWithWhiteRef(d50)
+    self.assertTrue(c2.xyz is xyz)
+    self.assertNear(c2.lab, (66.9518, 0.4117, 0.6728))
+    self.assertTrue(c.ColourWithAlpha(0.5).lab is lab)
+
+  def testCachedHsv(self):
+    c = grapefruit.Colour.NewFromHsl(30, 0, 1)
+    self.assertEqual((30, 0, 1), c.hsv)
+    self.assertEqual((0.0, 0.0, 1.0), c.ColourWithAlpha(0.5).hsv)
+
+  def testCacheDisabled(self):
+    grapefruit.Colour.CACHE_DERIVED = False
+    try:
+      c = grapefruit.Colour.NewFromRgb(1.0, 0.5, 0.0)
+      self.assertEqual(c.html, '#ff8000')
+      self.assertNear(c.lab, (66.9518, 0.4308, 0.7397))
+      self.assertEqual(None, c._Colour__cache)
+    finally:
+      grapefruit.Colour.CACHE_DERIVED = True
+
+  def testSlots(self):
+    self.assertFalse(hasattr(self.rgbCol, '__dict__'))
+    self.assertRaises(AttributeError, setattr, self.rgbCol, 'foo', 1)
+
+  def testInternedWhiteRef(self):
+    d50 = grapefruit.Colour.WHITE_REFERENCE['std_D50']
+    c = grapefruit.Colour.NewFromRgb(1.0, 0.5, 0.0, wref=tuple(list(d50)))
+    self.assertTrue(c.whiteRef is d50)
+    self.assertTrue(c.ColourWithWhiteRef(list(d50)).whiteRef == list(d50))
+    self.assertEqual((0.1, 0.2, 0.3), c.ColourWithWhiteRef((0.1, 0.2, 0.3)).whiteRef)
+
   def testColourWitgAlpha(self):
     self.assertEqual(self.rgbCol.ColourWithAlpha(0.5), (1, 0.5, 0, 0.5))
 
@@ -356,6 +455,1432 @@ class ColourTest(GrapeFruitTestCase):
       self.assertNear(c.nearestLegal.rgb, (1.0, 0.0, 0.5))
       self.assertNear(c.nearestLegal.alpha, 1.0)
 
+class BackendTestCase(GrapeFruitTestCase):
+  '''Run the tests with the array backend selected by the numpy attribute.'''
+  numpy = grapefruit.numpy
+
+  def setUp(self):
+    self.__numpy = grapefruit.numpy
+    grapefruit.numpy = self.numpy
+
+  def tearDown(self):
+    grapefruit.numpy = self.__numpy
+
+class ColourArrayTest(BackendTestCase):
+  '''Test the batch conversions against the scalar ones.'''
+
+  def setUp(self):
+    BackendTestCase.setUp(self)
+    self.rgb = [
+      (1.0, 0.5, 0.0), (0.0, 0.0, 0.0), (1.0, 1.0, 1.0), (0.5, 0.5, 0.5),
+      (0.2, 0.4, 0.6), (0.9, 0.1, 0.3), (0.1, 0.8, 0.2), (0.3, 0.3, 0.9),
+      (0.02, 0.03, 0.01), (1.1, -0.1, 0.5)]
+    self.channels = tuple(zip(*self.rgb))
+
+  def assertBatch(self, batchFn, scalarFn, values, *args):
+    channels = tuple(zip(*values))
+    result = list(zip(*batchFn(*(channels + args))))
+    self.assertEqual(len(values), len(result))
+    for v, r in zip(values, result):
+      self.assertNear(scalarFn(*(v + args)), r, 1e-9)
+
+  def testRgbConversions(self):
+    CA, C = grapefruit.ColourArray, grapefruit.Colour
+    for name in ('RgbToHsl', 'RgbToHsv', 'RgbToYiq', 'RgbToYuv', 'RgbToXyz',
+                 'RgbToCmy', 'RgbToGreyscale'):
+      self.assertBatch(getattr(CA, name), getattr(C, name), self.rgb)
+
+  def testReverseConversions(self):
+    CA, C = grapefruit.ColourArray, grapefruit.Colour
+    for to, back in (('RgbToHsl', 'HslToRgb'), ('RgbToHsv', 'HsvToRgb'),
+                     ('RgbToYiq', 'YiqToRgb'), ('RgbToYuv', 'YuvToRgb'),
+                     ('RgbToXyz', 'XyzToRgb'), ('RgbToCmy', 'CmyToRgb')):
+      values = [getattr(C, to)(*v) for v in self.rgb]
+      self.assertBatch(getattr(CA, back), getattr(C, back), values)
+
+  def testLab(self):
+    CA, C = grapefruit.ColourArray, grapefruit.Colour
+    xyz = [C.RgbToXyz(*v) for v in self.rgb]
+    d50 = C.WHITE_REFERENCE['std_D50']
+    self.assertBatch(CA.XyzToLab, C.XyzToLab, xyz)
+    self.assertBatch(CA.XyzToLab, C.XyzToLab, xyz, d50)
+    lab = [C.XyzToLab(*v) for v in xyz]
+    self.assertBatch(CA.LabToXyz, C.LabToXyz, lab)
+    self.assertBatch(CA.LabToXyz, C.LabToXyz, lab, d50)
+
+  def testCmyk(self):
+    CA, C = grapefruit.ColourArray, grapefruit.Colour
+    cmy = [C.RgbToCmy(*v) for v in self.rgb]
+    self.assertBatch(CA.CmyToCmyk, C.CmyToCmyk, cmy)
+    cmyk = [C.CmyToCmyk(*v) for v in cmy]
+    self.assertBatch(CA.CmykToCmy, C.CmykToCmy, cmyk)
+
+  def testInstance(self):
+    ca = grapefruit.ColourArray(self.channels)
+    self.assertEqual(len(self.rgb), len(ca))
+    for i, v in enumerate(self.rgb):
+      c = grapefruit.Colour.NewFromRgb(*v)
+      self.assertEqual(c, ca[i])
+      self.assertNear(c.hsl, [h[i] for h in ca.ToHsl()], 1e-9)
+      self.assertNear(c.lab, [l[i] for l in ca.ToLab()], 1e-9)
+      self.assertNear(c.cmyk, [k[i] for k in ca.ToCmyk()], 1e-9)
+    self.assertEqual(list(ca), list(ca[:]))
+    self.assertEqual(3, len(ca[2:5]))
+
+  def testAlpha(self):
+    ca = grapefruit.ColourArray.NewFromRgb((1, 0), (0.5, 0), (0, 1), alpha=(0.5, 1))
+    self.assertEqual([0.5, 1.0], list(ca.alpha))
+    self.assertEqual((1, 0.5, 0, 0.5), ca[0])
+    self.assertEqual([1.0, 1.0], list(grapefruit.ColourArray(self.channels[:1] * 3)[:2].alpha))
+
+  def testNewFromColours(self):
+    colours = [grapefruit.Colour.NewFromRgb(*v) for v in self.rgb]
+    self.assertEqual(colours, list(grapefruit.ColourArray.NewFromColours(colours)))
+    self.assertEqual(0, len(grapefruit.ColourArray.NewFromColours([])))
+
+  def testInvalid(self):
+    self.assertRaises(TypeError, grapefruit.ColourArray, [(1,), (1,), (1,)])
+    self.assertRaises(ValueError, grapefruit.ColourArray, ((1,), (1,), (1,)), 'hsv')
+    self.assertRaises(ValueError, grapefruit.ColourArray, ((1, 2), (1,), (1,)))
+
+class ColourArrayPurePythonTest(ColourArrayTest):
+  '''Test the batch conversions without NumPy.'''
+  numpy = None
+
+class ColourLutTest(BackendTestCase):
+  '''Test the 3D lookup tables.'''
+
+  def setUp(self):
+    BackendTestCase.setUp(self)
+    toLab = lambda r, g, b: grapefruit.Colour.XyzToLab(*grapefruit.Colour.RgbToXyz(r, g, b))
+    self.toLab = toLab
+    self.lut = grapefruit.ColourLut(toLab, size=9)
+    self.rgb = [(0.1, 0.2, 0.3), (0.9, 0.5, 0.2), (0.3, 0.3, 0.3), (0.6, 0.9, 0.1),
+                (0.2, 0.7, 0.8), (0.8, 0.1, 0.6), (0.55, 0.25, 0.95), (0.0, 1.0, 0.5)]
+
+  def testLinear(self):
+    # A linear function is reproduced exactly by both interpolations.
+    lut = grapefruit.ColourLut(grapefruit.Colour.RgbToYuv, size=3)
+    for method in ('trilinear', 'tetrahedral'):
+      result = zip(*lut.Apply(*(tuple(zip(*self.rgb)) + (method,))))
+      for rgb, yuv in zip(self.rgb, result):
+        self.assertNear(grapefruit.Colour.RgbToYuv(*rgb), yuv, 1e-12)
+
+  def testNodes(self):
+    for method in ('trilinear', 'tetrahedral'):
+      for rgb in ((0, 0, 0), (0.25, 0.5, 0.75), (1, 1, 1), (0.125, 1, 0)):
+        self.assertNear(self.toLab(*rgb), self.lut.Lookup(method=method, *rgb), 1e-9)
+
+  def testLookup(self):
+    for method in ('trilinear', 'tetrahedral'):
+      channels = self.lut.Apply(*(tuple(zip(*self.rgb)) + (method,)))
+      for i, rgb in enumerate(self.rgb):
+        lab = self.lut.Lookup(method=method, *rgb)
+        self.assertNear(lab, [c[i] for c in channels], 1e-12)
+        self.assertNear(self.toLab(*rgb), lab, 2.0)
+
+  def testTetrahedra(self):
+    # On a single cell, r*g*b is only 1 at the (1, 1, 1) corner: trilinear
+    # interpolation gives r*g*b back, tetrahedral interpolation gives the
+    # smallest component whatever the tetrahedron is.
+    lut = grapefruit.ColourLut(lambda r, g, b: (r*g*b,), size=2)
+    for rgb in ((0.6, 0.4, 0.2), (0.6, 0.2, 0.4), (0.4, 0.2, 0.6),
+                (0.4, 0.6, 0.2), (0.2, 0.6, 0.4), (0.2, 0.4, 0.6)):
+      r, g, b = rgb
+      self.assertNear(r*g*b, lut.Lookup(r, g, b, 'trilinear')[0], 1e-12)
+      self.assertNear(min(rgb), lut.Lookup(r, g, b, 'tetrahedral')[0], 1e-12)
+
+  def testClamp(self):
+    self.assertNear(self.lut.Lookup(1.0, 0.0, 0.5), self.lut.Lookup(1.5, -0.5, 0.5), 1e-12)
+
+  def testBatchBake(self):
+    CA = grapefruit.ColourArray
+    lut = grapefruit.ColourLut(lambda r, g, b: CA.XyzToLab(*CA.RgbToXyz(r, g, b)), size=9, batch=True)
+    for rgb in self.rgb:
+      self.assertNear(self.lut.Lookup(*rgb), lut.Lookup(*rgb), 1e-9)
+
+  def testAccuracy(self):
+    lut = grapefruit.ColourLut(grapefruit.Colour.RgbToXyz, size=17)
+    for method in ('trilinear', 'tetrahedral'):
+      report = lut.Accuracy(500, method)
+      self.assertEqual(500, report['samples'])
+      self.assertEqual(3, len(report['max']))
+      self.assertTrue(max(report['max']) < 5e-3)
+      self.assertTrue(all(m <= x for m, x in zip(report['mean'], report['max'])))
+    self.assertEqual(lut.Accuracy(100), lut.Accuracy(100))
+
+  def testInvalid(self):
+    self.assertRaises(ValueError, grapefruit.ColourLut, grapefruit.Colour.RgbToXyz, 1)
+    self.assertRaises(ValueError, self.lut.Lookup, 0, 0, 0, 'cubic')
+
+class ColourLutPurePythonTest(ColourLutTest):
+  '''Test the 3D lookup tables without NumPy.'''
+  numpy = None
+
+class NearestNamedTest(BackendTestCase):
+  '''Test the named Colours lookup.'''
+
+  def setUp(self):
+    BackendTestCase.setUp(self)
+    rnd = random.Random(42)
+    self.colours = [grapefruit.Colour.NewFromRgb(rnd.random(), rnd.random(), rnd.random()) for i in range(50)]
+
+  def bruteForce(self, colour, k):
+    C = grapefruit.Colour
+    lab = grapefruit._CieLab(*C.XyzToLab(*colour.xyz))
+    values = set(C.NAMED_Colour.values())
+    names = [min(n for n in C.NAMED_Colour if C.NAMED_Colour[n]==v) for v in values]
+    def dist(name):
+      other = grapefruit._CieLab(*C.XyzToLab(*C.RgbToXyz(*C.HtmlToRgb(name))))
+      return sum((u-v)**2 for u, v in zip(lab, other))
+    return sorted(names, key=dist)[:k]
+
+  def testNamed(self):
+    named = grapefruit.Colour.NAMED_Colour
+    names = sorted(named)
+    found = grapefruit.Colour.NearestNamed([grapefruit.Colour.NewFromHtml(n) for n in names])
+    for name, f in zip(names, found):
+      self.assertEqual(named[name], named[f])
+    self.assertEqual('aqua', grapefruit.Colour.NewFromHtml('cyan').nearestName)
+
+  def testKNearest(self):
+    found = grapefruit.Colour.NearestNamed(self.colours, k=5)
+    for c, names in zip(self.colours, found):
+      self.assertEqual(self.bruteForce(c, 5), names)
+
+  def testColourArray(self):
+    ca = grapefruit.ColourArray.NewFromColours(self.colours)
+    self.assertEqual(grapefruit.Colour.NearestNamed(self.colours),
+        grapefruit.Colour.NearestNamed(ca))
+    self.assertEqual([c.nearestName for c in self.colours], grapefruit.Colour.NearestNamed(ca))
+    self.assertEqual([], grapefruit.Colour.NearestNamed([]))
+
+  def testKdTree(self):
+    rnd = random.Random(1)
+    points = [(rnd.random(), rnd.random()) for i in range(200)]
+    tree = grapefruit._KdTree(points)
+    for j in range(20):
+      q = (rnd.random(), rnd.random())
+      expected = sorted(((q[0]-p[0])**2 + (q[1]-p[1])**2, i) for i, p in enumerate(points))[:7]
+      self.assertEqual([i for d, i in expected], [i for d, i in tree.Nearest(q, 7)])
+    self.assertEqual(200, len(tree.Nearest(q, 500)))
+
+class NearestNamedPurePythonTest(NearestNamedTest):
+  '''Test the named Colours lookup without NumPy.'''
+  numpy = None
+
+class PaletteTest(BackendTestCase):
+  '''Test the Palette nearest Colour queries.'''
+
+  def setUp(self):
+    BackendTestCase.setUp(self)
+    rnd = random.Random(7)
+    self.entries = [grapefruit.Colour.NewFromRgb(rnd.random(), rnd.random(), rnd.random()) for i in range(64)]
+    self.colours = [grapefruit.Colour.NewFromRgb(rnd.random(), rnd.random(), rnd.random()) for i in range(200)]
+
+  def bruteForce(self, colour, metric):
+    def point(c):
+      if metric=='rgb': return c.rgb
+      return grapefruit._CieLab(*c.lab)
+    q = point(colour)
+    dists = [sum((u-v)**2 for u, v in zip(q, point(e))) for e in self.entries]
+    return dists.index(min(dists))
+
+  def testNearest(self):
+    for metric in ('rgb', 'lab'):
+      p = grapefruit.Palette(self.entries, metric)
+      self.assertEqual(metric, p.metric)
+      expected = [self.bruteForce(c, metric) for c in self.colours]
+      self.assertEqual(expected, [p.Nearest(c) for c in self.colours])
+      self.assertEqual(expected, [int(i) for i in p.NearestMany(self.colours)])
+
+  def testEntries(self):
+    p = grapefruit.Palette(grapefruit.ColourArray.NewFromColours(self.entries))
+    self.assertEqual(64, len(p))
+    self.assertEqual(self.entries[3], p[3])
+    self.assertEqual(list(range(64)), [int(i) for i in p.NearestMany(p.colours)])
+    self.assertEqual(5, p.Nearest(self.entries[5].rgb))
+
+  def testRepeated(self):
+    p = grapefruit.Palette(self.entries)
+    colours = self.colours[:10] * 20
+    self.assertEqual([p.Nearest(c) for c in colours], [int(i) for i in p.NearestMany(colours)])
+    self.assertEqual(0, len(p.NearestMany([])))
+
+  def testErrors(self):
+    self.assertRaises(ValueError, grapefruit.Palette, self.entries, 'hsv')
+    self.assertRaises(ValueError, grapefruit.Palette, [])
+
+class PalettePurePythonTest(PaletteTest):
+  '''Test the Palette nearest Colour queries without NumPy.'''
+  numpy = None
+
+class BufferTest(BackendTestCase):
+  '''Test the packed pixels buffers conversions.'''
+
+  def setUp(self):
+    BackendTestCase.setUp(self)
+    rnd = random.Random(3)
+    self.pixels = [(rnd.randrange(256), rnd.randrange(256), rnd.randrange(256), rnd.randrange(256)) for i in range(100)]
+
+  def pack(self, layout):
+    order = {'r': 0, 'g': 1, 'b': 2, 'a': 3}
+    return bytearray([p[order[c]] for p in self.pixels for c in layout])
+
+  def testNewFromBuffer(self):
+    for layout in ('rgb', 'rgba', 'bgr', 'bgra'):
+      for buf in (self.pack(layout), bytes(self.pack(layout)), memoryview(self.pack(layout)), array('B', self.pack(layout))):
+        ca = grapefruit.ColourArray.NewFromBuffer(buf, layout)
+        self.assertEqual(len(self.pixels), len(ca))
+        for p, c in zip(self.pixels, ca):
+          self.assertEqual(grapefruit.Colour.IntTupleToRgb(p[:3]), c.rgb)
+          if 'a' in layout: self.assertEqual(p[3] / 255.0, c.alpha)
+          else: self.assertEqual(1.0, c.alpha)
+
+  def testToBuffer(self):
+    for layout in ('rgb', 'rgba', 'bgr', 'bgra'):
+      buf = self.pack(layout)
+      ca = grapefruit.ColourArray.NewFromBuffer(buf, layout)
+      self.assertEqual(buf, ca.ToBuffer(layout))
+    ca = grapefruit.ColourArray.NewFromRgb((-0.5, 1.5), (0.5, 1), (0.2, 0))
+    self.assertEqual(bytearray([0, 128, 51, 255, 255, 0]), ca.ToBuffer())
+
+  def testInPlace(self):
+    buf = self.pack('rgba')
+    ca = grapefruit.ColourArray.NewFromBuffer(buf, 'rgba')
+    grey = grapefruit.ColourArray(ca.ToGreyscale(), 'rgb', ca.alpha)
+    self.assertTrue(grey.ToBuffer('rgba', buf) is buf)
+    for p, i in zip(self.pixels, range(0, len(buf), 4)):
+      v = grapefruit.Colour.RgbToIntTuple(*grapefruit.Colour.RgbToGreyscale(*grapefruit.Colour.IntTupleToRgb(p[:3])))
+      self.assertEqual(list(v) + [p[3]], list(buf[i:i+4]))
+
+  def testConvertBuffer(self):
+    toLab = lambda r, g, b: grapefruit.ColourArray.XyzToLab(*grapefruit.ColourArray.RgbToXyz(r, g, b))
+    buf = self.pack('bgr')
+    out = grapefruit.ColourArray.ConvertBuffer(buf, toLab, 'bgr')
+    self.assertEqual(3 * len(self.pixels), len(out))
+    for p, i in zip(self.pixels, range(0, len(out), 3)):
+      lab = grapefruit.Colour.XyzToLab(*grapefruit.Colour.RgbToXyz(*grapefruit.Colour.IntTupleToRgb(p[:3])))
+      self.assertNear(lab, tuple(out[i:i+3]), 1e-3)
+
+    rgb = grapefruit.ColourArray.ConvertBuffer(buf, layout='bgr', out=bytearray(12 * len(self.pixels)))
+    rgb = array('f', bytes(rgb))
+    for p, i in zip(self.pixels, range(0, len(rgb), 3)):
+      self.assertNear(grapefruit.Colour.IntTupleToRgb(p[:3]), tuple(rgb[i:i+3]), 1e-6)
+
+  def testWithoutCast(self):
+    # Python 2 memoryviews can't be cast, the buffers are copied instead.
+    saved = grapefruit._MEMORYVIEW_CAST
+    grapefruit._MEMORYVIEW_CAST = False
+    try:
+      buf = self.pack('rgba')
+      for src in (buf, bytes(buf), array('B', buf)):
+        self.assertEqual(buf, grapefruit.ColourArray.NewFromBuffer(src, 'rgba').ToBuffer('rgba'))
+      ca = grapefruit.ColourArray.NewFromBuffer(buf, 'rgba')
+      out = bytearray(4 * len(ca))
+      self.assertTrue(ca.ToBuffer('rgba', out) is out)
+      self.assertEqual(buf, out)
+      self.assertRaises(TypeError, ca.ToBuffer, 'rgba', array('B', out))
+
+      rgb = grapefruit.ColourArray.ConvertBuffer(buf, layout='rgba', out=bytearray(12 * len(ca)))
+      self.assertEqual(list(grapefruit.ColourArray.ConvertBuffer(buf, layout='rgba')), list(array('f', bytes(rgb))))
+      self.assertRaises(ValueError, grapefruit.ColourArray.ConvertBuffer, buf, None, 'rgba', bytearray(13))
+    finally:
+      grapefruit._MEMORYVIEW_CAST = saved
+
+  def testErrors(self):
+    ca = grapefruit.ColourArray
+    self.assertRaises(ValueError, ca.NewFromBuffer, b'abcd', 'rgb')
+    self.assertRaises(ValueError, ca.NewFromBuffer, b'abc', 'hsl')
+    self.assertRaises(ValueError, ca.ConvertBuffer, b'abc', None, 'rgb', array('f', [0.0]))
+    self.assertRaises(TypeError, ca.ConvertBuffer, b'abc', None, 'rgb', array('d', [0.0] * 3))
+    self.assertRaises(ValueError, ca.NewFromRgb((0,), (0,), (0,)).ToBuffer, 'rgb', bytearray(4))
+
+class BufferPurePythonTest(BufferTest):
+  '''Test the packed pixels buffers conversions without NumPy.'''
+  numpy = None
+
+class IntPackingTest(BackendTestCase):
+  '''Test the batch conversions to and from packed integers.'''
+
+  def setUp(self):
+    BackendTestCase.setUp(self)
+    rnd = random.Random(19)
+    self.rgb = tuple([rnd.random() for i in range(200)] for c in 'rgb')
+    self.alpha = [rnd.random() for i in range(200)]
+
+  def testPil(self):
+    pil = grapefruit.ColourArray.RgbToPil(*self.rgb)
+    self.assertEqual([grapefruit.Colour.RgbToPil(*rgb) for rgb in zip(*self.rgb)], list(pil))
+    for v, rgb in zip(pil, zip(*grapefruit.ColourArray.PilToRgb(pil))):
+      self.assertEqual(grapefruit.Colour.PilToRgb(int(v)), rgb)
+
+  def testFormats(self):
+    tuples = list(zip(*self.rgb))
+    ints = [grapefruit.Colour.RgbToIntTuple(*rgb) for rgb in tuples]
+    alpha = [int(round(a * 255)) for a in self.alpha]
+    expected = {
+      'pil': [(b << 16) | (g << 8) | r for r, g, b in ints],
+      'rgb': [(r << 16) | (g << 8) | b for r, g, b in ints],
+      'argb': [(a << 24) | (r << 16) | (g << 8) | b for (r, g, b), a in zip(ints, alpha)]}
+    for format, values in expected.items():
+      packed = grapefruit.ColourArray.RgbToInt(alpha=self.alpha, format=format, *self.rgb)
+      self.assertEqual(values, list(packed))
+      channels = grapefruit.ColourArray.IntToRgb(values, format)
+      self.assertEqual(format=='argb' and 4 or 3, len(channels))
+      self.assertEqual([grapefruit.Colour.IntTupleToRgb(v) for v in ints], list(zip(*channels[:3])))
+      self.assertEqual(list(packed), list(grapefruit.ColourArray.RgbToInt(format=format, *channels)))
+    self.assertEqual([a / 255.0 for a in alpha], list(channels[3]))
+    self.assertTrue(all(v >> 24==255 for v in grapefruit.ColourArray.RgbToInt(format='argb', *self.rgb)))
+
+  def testClamp(self):
+    self.assertEqual([0x0000ff, 0xff0000], list(grapefruit.ColourArray.RgbToPil((1.5, -0.5), (0, 0), (-1, 2))))
+
+  def testColourArray(self):
+    ca = grapefruit.ColourArray.NewFromRgb(alpha=self.alpha, *self.rgb)
+    packed = ca.ToInt('argb')
+    copy = grapefruit.ColourArray.NewFromInt(packed, 'argb')
+    self.assertEqual(list(packed), list(copy.ToInt('argb')))
+    for c1, c2 in zip(ca, copy):
+      self.assertNear(c1.rgb, c2.rgb, 0.5 / 255)
+      self.assertNear(c1.alpha, c2.alpha, 0.5 / 255)
+    self.assertEqual(list(grapefruit.ColourArray.NewFromInt(packed, 'rgb').alpha), [1.0] * len(ca))
+
+  def testEmpty(self):
+    for format in ('pil', 'rgb', 'argb'):
+      self.assertEqual([], list(grapefruit.ColourArray.RgbToInt([], [], [], format=format)))
+      self.assertEqual([], list(grapefruit.ColourArray.NewFromRgb([], [], []).ToInt(format)))
+    self.assertEqual(0, len(grapefruit.ColourArray.NewFromInt([], 'argb')))
+
+  def testIntTuple(self):
+    ints = grapefruit.ColourArray.RgbToIntTuple(*self.rgb)
+    self.assertEqual([grapefruit.Colour.RgbToIntTuple(*rgb) for rgb in zip(*self.rgb)], list(zip(*[c.tolist() for c in ints])))
+    self.assertEqual([grapefruit.Colour.IntTupleToRgb(v) for v in zip(*ints)], list(zip(*grapefruit.ColourArray.IntTupleToRgb(*ints))))
+
+  def testErrors(self):
+    self.assertRaises(ValueError, grapefruit.ColourArray.RgbToInt, (0,), (0,), (0,), None, 'bgr')
+    self.assertRaises(ValueError, grapefruit.ColourArray.IntToRgb, (0,), 'rgba')
+
+class IntPackingPurePythonTest(IntPackingTest):
+  '''Test the packed integers conversions without NumPy.'''
+  numpy = None
+
+class HtmlTest(BackendTestCase):
+  '''Test the batch HTML conversions.'''
+
+  def setUp(self):
+    BackendTestCase.setUp(self)
+    rnd = random.Random(20)
+    self.rgb = tuple([rnd.random() for i in range(300)] for c in 'rgb')
+    self.html = [grapefruit.Colour.RgbToHtml(*rgb) for rgb in zip(*self.rgb)]
+
+  def testRgbToHtml(self):
+    self.assertEqual(self.html, grapefruit.ColourArray.RgbToHtml(*self.rgb))
+    self.assertEqual(''.join(self.html).encode('ascii'), grapefruit.ColourArray.RgbToHtmlBytes(*self.rgb))
+    self.assertEqual(['#ff0000', '#000000'], grapefruit.ColourArray.RgbToHtml((1.2, -0.1), (0, 0), (0, 0)))
+    self.assertEqual([], grapefruit.ColourArray.RgbToHtml((), (), ()))
+
+  def testHtmlToRgb(self):
+    expected = [grapefruit.Colour.HtmlToRgb(h) for h in self.html]
+    self.assertEqual(expected, list(zip(*grapefruit.ColourArray.HtmlToRgb(self.html))))
+    upper = [h.upper() for h in self.html]
+    self.assertEqual(expected, list(zip(*grapefruit.ColourArray.HtmlToRgb(upper))))
+    data = ''.join(upper).encode('ascii')
+    for buf in (data, bytearray(data), memoryview(data)):
+      self.assertEqual(expected, list(zip(*grapefruit.ColourArray.HtmlToRgb(buf))))
+
+  def testMixed(self):
+    html = ['#ff8000', ' #FF8000 ', 'ff8000', '#f60', 'lemonchiffon', '#0000ff']
+    expected = [grapefruit.Colour.HtmlToRgb(h) for h in html]
+    self.assertEqual(expected, list(zip(*grapefruit.ColourArray.HtmlToRgb(html))))
+    self.assertEqual(([], [], []), tuple(list(c) for c in grapefruit.ColourArray.HtmlToRgb([])))
+
+  def testErrors(self):
+    self.assertRaises(ValueError, grapefruit.ColourArray.HtmlToRgb, ['#ff8000', '#ff80zz'])
+    self.assertRaises(ValueError, grapefruit.ColourArray.HtmlToRgb, b'#ff8000#ff80zz')
+    self.assertRaises(ValueError, grapefruit.ColourArray.HtmlToRgb, b'#ff8000 ff8000')
+    self.assertRaises(ValueError, grapefruit.ColourArray.HtmlToRgb, b'#ff8000#')
+
+class HtmlPurePythonTest(HtmlTest):
+  '''Test the batch HTML conversions without NumPy.'''
+  numpy = None
+
+class ColourGradientTest(BackendTestCase):
+  '''Test the lazy gradients against Colour.Gradient.'''
+
+  def setUp(self):
+    BackendTestCase.setUp(self)
+    self.c1 = grapefruit.Colour.NewFromRgb(0.9, 0.2, 0.1, alpha=0.8)
+    self.c2 = grapefruit.Colour.NewFromRgb(0.1, 0.6, 1.0, alpha=0.3)
+    self.expected = self.c1.Gradient(self.c2, 37)
+    self.gradient = grapefruit.ColourGradient(self.c1, self.c2, 37)
+
+  def testSequence(self):
+    self.assertEqual(37, len(self.gradient))
+    self.assertEqual(self.expected, list(self.gradient))
+    self.assertEqual(self.expected[-1], self.gradient[-1])
+    self.assertEqual(self.expected[5].alpha, self.gradient[5].alpha)
+    self.assertRaises(IndexError, self.gradient.__getitem__, 37)
+
+  def testSlice(self):
+    for index in (slice(3, 20), slice(None, None, 5), slice(-10, None), slice(30, 2, -3), slice(40, 50)):
+      part = self.gradient[index]
+      self.assertEqual(self.expected[index], list(part))
+      self.assertEqual(self.expected[index][1:2], list(part[1:2]))
+
+  def testRgba(self):
+    for g, e in ((self.gradient, self.expected), (self.gradient[::4], self.expected[::4])):
+      r, gg, b, a = g.ToRgba()
+      self.assertEqual([c.rgb + (c.alpha,) for c in e], [tuple(float(v) for v in rgba) for rgba in zip(r, gg, b, a)])
+      self.assertEqual(e, list(g.ToColourArray()))
+
+class ColourGradientPurePythonTest(ColourGradientTest):
+  '''Test the lazy gradients without NumPy.'''
+  numpy = None
+
+class DeltaETest(BackendTestCase):
+  '''Test the colour difference formulas.'''
+
+  # Sharma, Wu & Dalal CIEDE2000 test data (CIE scale).
+  CIEDE2000 = [
+    ((50.0, 2.6772, -79.7751), (50.0, 0.0, -82.7485), 2.0425),
+    ((50.0, 3.1571, -77.2803), (50.0, 0.0, -82.7485), 2.8615),
+    ((50.0, 0.0, 0.0), (50.0, -1.0, 2.0), 2.3669),
+    ((50.0, 2.49, -0.001), (50.0, -2.49, 0.0009), 7.1792),
+    ((50.0, 2.49, -0.001), (50.0, -2.49, 0.0011), 7.2195),
+    ((50.0, 2.5, 0.0), (73.0, 25.0, -18.0), 27.1492),
+    ((60.2574, -34.0099, 36.2677), (60.4626, -34.1751, 39.4387), 1.2644),
+    ((90.8027, -2.0831, 1.4410), (91.1528, -1.6435, 0.0447), 1.4441),
+    ((2.0776, 0.0795, -1.1350), (0.9033, -0.0636, -0.5514), 0.9082)]
+
+  FORMULAS = ('cie76', 'cie94', 'ciede2000')
+
+  def setUp(self):
+    BackendTestCase.setUp(self)
+    rnd = random.Random(11)
+    self.lab1 = grapefruit.ColourArray.NewFromRgb(*[[rnd.random() for i in range(40)] for c in 'rgb']).ToLab()
+    self.lab2 = grapefruit.ColourArray.NewFromRgb(*[[rnd.random() for i in range(30)] for c in 'rgb']).ToLab()
+
+  def library(self, lab):
+    return (lab[0], lab[1] / 100.0, lab[2] / 100.0)
+
+  def testCiede2000(self):
+    for lab1, lab2, d in self.CIEDE2000:
+      lab1, lab2 = self.library(lab1), self.library(lab2)
+      self.assertNear(d, grapefruit.Colour.DeltaE(lab1, lab2, 'ciede2000'), 1e-4)
+      self.assertNear(d, grapefruit.Colour.DeltaE(lab2, lab1, 'ciede2000'), 1e-4)
+    channels = [tuple(zip(*[self.library(v[n]) for v in self.CIEDE2000])) for n in (0, 1)]
+    self.assertNear([v[2] for v in self.CIEDE2000], grapefruit.ColourArray.DeltaE(channels[0], channels[1], 'ciede2000'), 1e-4)
+
+  def testScalar(self):
+    grey, tinted = (50.0, 0.0, 0.0), (60.0, 0.1, -0.2)
+    self.assertNear(math.sqrt(100 + 100 + 400), grapefruit.Colour.DeltaE(grey, tinted), 1e-9)
+    # The CIE94 weights only depend on the chroma of the reference.
+    self.assertNear(grapefruit.Colour.DeltaE(grey, tinted), grapefruit.Colour.DeltaE(grey, tinted, 'cie94'), 1e-9)
+    self.assertTrue(grapefruit.Colour.DeltaE(tinted, grey, 'cie94') < grapefruit.Colour.DeltaE(grey, tinted, 'cie94'))
+    self.assertRaises(ValueError, grapefruit.Colour.DeltaE, grey, tinted, 'cmc')
+
+  def testBatch(self):
+    for formula in self.FORMULAS:
+      expected = [grapefruit.Colour.DeltaE(v, tuple(reversed(v)), formula) for v in zip(*self.lab1)]
+      lab2 = tuple(reversed(self.lab1))
+      self.assertNear(expected, grapefruit.ColourArray.DeltaE(self.lab1, lab2, formula), 1e-9)
+      ref = tuple(float(c[3]) for c in self.lab2)
+      expected = [grapefruit.Colour.DeltaE(v, ref, formula) for v in zip(*self.lab1)]
+      self.assertNear(expected, grapefruit.ColourArray.DeltaE(self.lab1, ref, formula), 1e-9)
+    self.assertRaises(ValueError, grapefruit.ColourArray.DeltaE, self.lab1, self.lab1, 'cmc')
+
+  def testMatrix(self):
+    for formula in self.FORMULAS:
+      expected = [[grapefruit.Colour.DeltaE(v1, v2, formula) for v2 in zip(*self.lab2)] for v1 in zip(*self.lab1)]
+      for budget in (1, 100, 1<<20):
+        matrix = grapefruit.ColourArray.DeltaEMatrix(self.lab1, self.lab2, formula, budget)
+        self.assertEqual(40, len(matrix))
+        for e, row in zip(expected, matrix):
+          self.assertNear(e, row, 1e-9)
+    matrix = grapefruit.ColourArray.DeltaEMatrix(self.lab1)
+    self.assertEqual(40, len(matrix[0]))
+    self.assertEqual(0.0, matrix[7][7])
+
+  def testPairs(self):
+    for formula in self.FORMULAS:
+      matrix = grapefruit.ColourArray.DeltaEMatrix(self.lab1, self.lab2, formula)
+      expected = [(i, j) for i in range(40) for j in range(30) if matrix[i][j] <= 40]
+      for budget in (1, 100, 1<<20):
+        i, j, d = grapefruit.ColourArray.DeltaEPairs(self.lab1, self.lab2, 40, formula, budget)
+        self.assertEqual(expected, [(int(a), int(b)) for a, b in zip(i, j)])
+        self.assertNear([matrix[a][b] for a, b in expected], d, 1e-9)
+
+      matrix = grapefruit.ColourArray.DeltaEMatrix(self.lab1, None, formula)
+      expected = [(i, j) for i in range(40) for j in range(i + 1, 40) if matrix[i][j] <= 30]
+      for budget in (1, 100, 1<<20):
+        i, j, d = grapefruit.ColourArray.DeltaEPairs(self.lab1, None, 30, formula, budget)
+        self.assertEqual(expected, [(int(a), int(b)) for a, b in zip(i, j)])
+
+    i, j, d = grapefruit.ColourArray.DeltaEPairs(self.lab1, self.lab2, -1)
+    self.assertEqual((0, 0, 0), (len(i), len(j), len(d)))
+
+class DeltaEPurePythonTest(DeltaETest):
+  '''Test the colour difference formulas without NumPy.'''
+  numpy = None
+
+class DominantColoursTest(BackendTestCase):
+  '''Test the dominant Colours extraction.'''
+
+  def setUp(self):
+    BackendTestCase.setUp(self)
+    rnd = random.Random(5)
+    self.centres = [(0.9, 0.1, 0.1), (0.1, 0.7, 0.2), (0.2, 0.2, 0.8)]
+    rgb = []
+    for centre, count in zip(self.centres, (500, 300, 200)):
+      rgb.extend([tuple(v + rnd.uniform(-0.02, 0.02) for v in centre) for i in range(count)])
+    rnd.shuffle(rgb)
+    self.colours = grapefruit.ColourArray.NewFromRgb(*zip(*rgb))
+
+  def check(self, found, count):
+    self.assertEqual(count, len(found))
+    self.assertNear(1.0, sum(w for c, w in found), 1e-9)
+    self.assertEqual(sorted((w for c, w in found), reverse=True), [w for c, w in found])
+    for c, w in found:
+      self.assertTrue(isinstance(c, grapefruit.Colour))
+
+  def testKMeans(self):
+    for space in ('rgb', 'lab'):
+      found = self.colours.DominantColours(3, 'kmeans', space)
+      self.check(found, 3)
+      self.assertEqual([0.5, 0.3, 0.2], [w for c, w in found])
+      for (c, w), centre in zip(found, self.centres):
+        self.assertNear(centre, c.rgb, 0.01)
+
+  def testMedianCut(self):
+    for space in ('rgb', 'lab'):
+      self.check(self.colours.DominantColours(8, 'mediancut', space), 8)
+    # The boxes split the Colours, their weighted mean is the mean Colour.
+    found = self.colours.DominantColours(8, 'mediancut', 'rgb')
+    mean = [sum(c) / len(c) for c in self.colours.rgb]
+    self.assertNear(mean, [sum(c.rgb[i] * w for c, w in found) for i in range(3)], 1e-9)
+    ca = grapefruit.ColourArray.NewFromRgb((1, 0, 1, 0), (0, 0, 0, 0), (0, 1, 0, 1))
+    self.assertEqual([((0.0, 0.0, 1.0), 0.5), ((1.0, 0.0, 0.0), 0.5)], sorted((c.rgb, w) for c, w in ca.DominantColours(2)))
+
+  def testFewColours(self):
+    ca = grapefruit.ColourArray.NewFromRgb((1, 1, 1), (0, 0, 0), (0, 0, 0))
+    for method in ('mediancut', 'kmeans'):
+      self.assertEqual([((1.0, 0.0, 0.0), 1.0)], [(c.rgb, w) for c, w in ca.DominantColours(5, method)])
+      self.assertEqual([], grapefruit.ColourArray.NewFromRgb((), (), ()).DominantColours(5, method))
+
+  def testSample(self):
+    for method in ('mediancut', 'kmeans'):
+      found = self.colours.DominantColours(3, method, sample=100, seed=3)
+      self.check(found, 3)
+      self.assertEqual(found, self.colours.DominantColours(3, method, sample=100, seed=3))
+      for c, w in found:
+        self.assertNear(round(w * 100), w * 100, 1e-9)
+
+  def testBuffer(self):
+    buf = self.colours.ToBuffer('bgra')
+    found = grapefruit.ColourArray.NewFromBuffer(buf, 'bgra').DominantColours(3, 'kmeans')
+    for (c, w), centre in zip(found, self.centres):
+      self.assertNear(centre, c.rgb, 0.01)
+
+  def testErrors(self):
+    self.assertRaises(ValueError, self.colours.DominantColours, 3, 'octree')
+    self.assertRaises(ValueError, self.colours.DominantColours, 3, 'kmeans', 'hsv')
+
+class DominantColoursPurePythonTest(DominantColoursTest):
+  '''Test the dominant Colours extraction without NumPy.'''
+  numpy = None
+
+class DitherTest(BackendTestCase):
+  '''Test the web safe dithering of packed pixels.'''
+
+  METHODS = ('floydsteinberg', 'atkinson', 'bayer', 'nearest')
+
+  def setUp(self):
+    BackendTestCase.setUp(self)
+    rnd = random.Random(9)
+    self.width, self.height = 24, 16
+    # A smooth gradient with some noise, in RGBA.
+    self.pixels = bytearray()
+    for y in range(self.height):
+      for x in range(self.width):
+        self.pixels.extend((x * 10, y * 15, min(255, 60 + rnd.randrange(20)), rnd.randrange(256)))
+
+  def testTable(self):
+    for v in range(256):
+      self.assertNear(grapefruit.Colour._WebSafeComponent(v / 255.0), grapefruit._WEB_SAFE_LEVEL[v] / 5.0, 1e-9)
+
+  def testNearest(self):
+    out = grapefruit.ColourArray.DitherWebSafe(self.pixels, self.width, 'rgba', 'nearest')
+    for i in range(0, len(out), 4):
+      rgb = grapefruit.Colour.IntTupleToRgb(self.pixels[i:i+3])
+      self.assertEqual(grapefruit.Colour.RgbToIntTuple(*grapefruit.Colour.RgbToWebSafe(*rgb)), tuple(out[i:i+3]))
+
+  def testMethods(self):
+    rgba = self.pixels
+    bgr = bytearray(b for i in range(0, len(rgba), 4) for b in (rgba[i+2], rgba[i+1], rgba[i]))
+    for method in self.METHODS:
+      out = grapefruit.ColourArray.DitherWebSafe(rgba, self.width, 'rgba', method)
+      self.assertEqual(len(rgba), len(out))
+      self.assertEqual(rgba[3::4], out[3::4])
+      for c in range(3):
+        self.assertTrue(all(v % 51==0 for v in out[c::4]))
+        # The dithering keeps the average value of the components.
+        self.assertNear(sum(rgba[c::4]) / 384.0, sum(out[c::4]) / 384.0, method=='nearest' and 26 or 4)
+
+      self.assertEqual(out[2::4], grapefruit.ColourArray.DitherWebSafe(bgr, self.width, 'bgr', method)[0::3])
+      indices = grapefruit.ColourArray.DitherWebSafe(rgba, self.width, 'rgba', method, True)
+      self.assertEqual([(out[i] // 51) * 36 + (out[i+1] // 51) * 6 + out[i+2] // 51 for i in range(0, len(out), 4)], list(indices))
+
+  def testBayerMean(self):
+    # The Bayer offsets are centred on zero, flat areas keep their value.
+    for v in (64, 100, 128, 140, 200):
+      out = grapefruit.ColourArray.DitherWebSafe(bytearray([v] * 3 * 16 * 16), 16, 'rgb', 'bayer')
+      self.assertNear(v, sum(out) / float(len(out)), 0.5)
+
+  def testErrorDiffusionMean(self):
+    # The errors are rounded the same way whatever their sign, flat areas
+    # keep their value and the inverted images give the inverted results.
+    for v in (2, 64, 100, 128, 140, 200):
+      out = grapefruit.ColourArray.DitherWebSafe(bytearray([v] * 3 * 64 * 64), 64, 'rgb', 'floydsteinberg')
+      self.assertNear(v, sum(out) / float(len(out)), 0.3)
+    inverted = bytearray(255 - v for v in self.pixels)
+    for method in ('floydsteinberg', 'atkinson'):
+      out = grapefruit.ColourArray.DitherWebSafe(self.pixels, self.width, 'rgba', method)
+      expected = bytearray(255 - v for v in out)
+      expected[3::4] = inverted[3::4]
+      self.assertEqual(expected, grapefruit.ColourArray.DitherWebSafe(inverted, self.width, 'rgba', method))
+
+  def testInPlace(self):
+    expected = grapefruit.ColourArray.DitherWebSafe(self.pixels, self.width, 'rgba')
+    self.assertTrue(grapefruit.ColourArray.DitherWebSafe(self.pixels, self.width, 'rgba', out=self.pixels) is self.pixels)
+    self.assertEqual(expected, self.pixels)
+
+  def testBackends(self):
+    if grapefruit.numpy is None: return
+    expected = [grapefruit.ColourArray.DitherWebSafe(self.pixels, self.width, 'rgba', m) for m in self.METHODS]
+    grapefruit.numpy = None
+    self.assertEqual(expected, [grapefruit.ColourArray.DitherWebSafe(self.pixels, self.width, 'rgba', m) for m in self.METHODS])
+
+  def testErrors(self):
+    dither = grapefruit.ColourArray.DitherWebSafe
+    self.assertRaises(ValueError, dither, self.pixels, self.width, 'rgba', 'random')
+    self.assertRaises(ValueError, dither, self.pixels, 25, 'rgba')
+    self.assertRaises(ValueError, dither, self.pixels, self.width, 'rgba', out=bytearray(10))
+    self.assertRaises(ValueError, dither, self.pixels, self.width, 'rgba', indexed=True, out=self.pixels)
+
+class DitherPurePythonTest(DitherTest):
+  '''Test the web safe dithering without NumPy.'''
+  numpy = None
+
+class VideoFrameTest(BackendTestCase):
+  '''Test the fixed-point conversions of packed pixels to video frames.'''
+
+  FORMATS = ('yuv444', 'i420', 'nv12')
+  # The scalar conversions and the ranges of their chroma components.
+  MATRICES = {
+    'yuv': (grapefruit.Colour.RgbToYuv, grapefruit.Colour.YuvToRgb, (0.436, 0.615)),
+    'yiq': (grapefruit.Colour.RgbToYiq, grapefruit.Colour.YiqToRgb, (0.59590296, 0.52263517))}
+
+  def setUp(self):
+    BackendTestCase.setUp(self)
+    rnd = random.Random(18)
+    self.width, self.height = 7, 5
+    self.pixels = bytearray(rnd.randrange(256) for i in range(self.width * self.height * 3))
+
+  def quantize(self, yuv, ranges):
+    y, u, v = yuv
+    return (int(math.floor(y * 255 + 0.5)),
+      int(math.floor(128 + u * 127 / ranges[0] + 0.5)),
+      int(math.floor(128 + v * 127 / ranges[1] + 0.5)))
+
+  def assertAllNear(self, first, second, diff=1):
+    self.assertEqual(len(first), len(second))
+    self.assertTrue(max(abs(a - b) for a, b in zip(first, second)) <= diff)
+
+  def testScalarPath(self):
+    count = self.width * self.height
+    for matrix, (toYuv, toRgb, ranges) in self.MATRICES.items():
+      frame = grapefruit.ColourArray.RgbBufferToYuvFrame(self.pixels, self.width, format='yuv444', matrix=matrix)
+      expected = [self.quantize(toYuv(*grapefruit.Colour.IntTupleToRgb(self.pixels[i:i+3])), ranges)
+        for i in range(0, len(self.pixels), 3)]
+      self.assertAllNear([c for yuv in expected for c in yuv], [frame[i + p * count] for i in range(count) for p in range(3)])
+
+      rgb = grapefruit.ColourArray.YuvFrameToRgbBuffer(frame, self.width, self.height, 'yuv444', matrix)
+      expected = []
+      for i in range(count):
+        y, u, v = frame[i], frame[i + count], frame[i + 2 * count]
+        r, g, b = toRgb(y / 255.0, (u - 128) * ranges[0] / 127, (v - 128) * ranges[1] / 127)
+        expected.extend(grapefruit.Colour.RgbToIntTuple(*[min(1, max(0, c)) for c in (r, g, b)]))
+      self.assertAllNear(expected, rgb)
+      # The round trip only loses the chroma precision.
+      self.assertAllNear(self.pixels, rgb, 4)
+
+  def testSubsampling(self):
+    full = grapefruit.ColourArray.RgbBufferToYuvFrame(self.pixels, self.width, format='yuv444')
+    count = self.width * self.height
+    cw, ch = 4, 3
+    i420 = grapefruit.ColourArray.RgbBufferToYuvFrame(self.pixels, self.width)
+    nv12 = grapefruit.ColourArray.RgbBufferToYuvFrame(self.pixels, self.width, format='nv12')
+    self.assertEqual(count + 2 * cw * ch, len(i420))
+    self.assertEqual(full[:count], i420[:count])
+    self.assertEqual(i420[:count], nv12[:count])
+    self.assertEqual(i420[count:count+cw*ch], nv12[count::2])
+    self.assertEqual(i420[count+cw*ch:], nv12[count+1::2])
+    # Each chroma is the average of its 2x2 block (the edges are repeated).
+    for p in range(2):
+      plane = full[count*(p+1):count*(p+2)]
+      for y in range(ch):
+        for x in range(cw):
+          block = [plane[min(2*y+dy, self.height-1) * self.width + min(2*x+dx, self.width-1)]
+            for dy in range(2) for dx in range(2)]
+          self.assertNear(sum(block) / 4.0, i420[count + p*cw*ch + y*cw + x], 1)
+
+  def testUpsampling(self):
+    count = self.width * self.height
+    for format in ('i420', 'nv12'):
+      frame = grapefruit.ColourArray.RgbBufferToYuvFrame(self.pixels, self.width, format=format)
+      full = bytearray(frame[:count])
+      for p in range(2):
+        for y in range(self.height):
+          for x in range(self.width):
+            c = (y // 2) * 4 + x // 2
+            full.append(format=='nv12' and frame[count + 2*c + p] or frame[count + p*12 + c])
+      rgb = grapefruit.ColourArray.YuvFrameToRgbBuffer(frame, self.width, self.height, format)
+      self.assertEqual(grapefruit.ColourArray.YuvFrameToRgbBuffer(full, self.width, self.height, 'yuv444'), rgb)
+
+  def testLayouts(self):
+    rgb = self.pixels
+    bgra = bytearray(b for i in range(0, len(rgb), 3) for b in (rgb[i+2], rgb[i+1], rgb[i], 7))
+    for format in self.FORMATS:
+      frame = grapefruit.ColourArray.RgbBufferToYuvFrame(rgb, self.width, format=format)
+      self.assertEqual(frame, grapefruit.ColourArray.RgbBufferToYuvFrame(bgra, self.width, 'bgra', format))
+      out = grapefruit.ColourArray.YuvFrameToRgbBuffer(frame, self.width, self.height, format, layout='bgra')
+      self.assertEqual(bytearray(b'\xff' * (self.width * self.height)), out[3::4])
+      self.assertEqual(grapefruit.ColourArray.YuvFrameToRgbBuffer(frame, self.width, self.height, format)[0::3], out[2::4])
+
+  def testOut(self):
+    frame = bytearray(self.width * self.height + 24)
+    self.assertTrue(grapefruit.ColourArray.RgbBufferToYuvFrame(self.pixels, self.width, out=frame) is frame)
+    self.assertEqual(grapefruit.ColourArray.RgbBufferToYuvFrame(self.pixels, self.width), frame)
+
+  def testBackends(self):
+    if grapefruit.numpy is None: return
+    frames = [grapefruit.ColourArray.RgbBufferToYuvFrame(self.pixels, self.width, format=f, matrix=m)
+      for f in self.FORMATS for m in self.MATRICES]
+    rgbs = [grapefruit.ColourArray.YuvFrameToRgbBuffer(frame, self.width, self.height, f, m)
+      for frame, (f, m) in zip(frames, [(f, m) for f in self.FORMATS for m in self.MATRICES])]
+    grapefruit.numpy = None
+    self.assertEqual(frames, [grapefruit.ColourArray.RgbBufferToYuvFrame(self.pixels, self.width, format=f, matrix=m)
+      for f in self.FORMATS for m in self.MATRICES])
+    self.assertEqual(rgbs, [grapefruit.ColourArray.YuvFrameToRgbBuffer(frame, self.width, self.height, f, m)
+      for frame, (f, m) in zip(frames, [(f, m) for f in self.FORMATS for m in self.MATRICES])])
+
+  def testErrors(self):
+    toFrame = grapefruit.ColourArray.RgbBufferToYuvFrame
+    toRgb = grapefruit.ColourArray.YuvFrameToRgbBuffer
+    self.assertRaises(ValueError, toFrame, self.pixels, 6)
+    self.assertRaises(ValueError, toFrame, self.pixels, self.width, format='yuv422')
+    self.assertRaises(ValueError, toFrame, self.pixels, self.width, matrix='ycbcr')
+    self.assertRaises(ValueError, toFrame, self.pixels, self.width, out=bytearray(10))
+    self.assertRaises(ValueError, toRgb, bytearray(10), self.width, self.height)
+    self.assertRaises(ValueError, toRgb, bytearray(59), self.width, self.height, layout='argb')
+
+class VideoFramePurePythonTest(VideoFrameTest):
+  '''Test the video frame conversions without NumPy.'''
+  numpy = None
+
+class ConvertParallelTest(BackendTestCase):
+  '''Test the conversions split across worker processes.'''
+
+  def setUp(self):
+    BackendTestCase.setUp(self)
+    rnd = random.Random(13)
+    self.rgb = tuple([rnd.random() for i in range(1000)] for c in 'rgb')
+
+  def check(self, fn, channels, args=()):
+    expected = fn(*(tuple(channels) + args))
+    found = grapefruit.ColourArray.ConvertParallel(fn, channels, args, workers=3, chunk=128)
+    self.assertEqual(len(expected), len(found))
+    for e, f in zip(expected, found):
+      self.assertEqual(list(e), list(f))
+
+  def testConversions(self):
+    if grapefruit.shared_memory is None: return
+    ca = grapefruit.ColourArray
+    self.check(ca.RgbToHsl, self.rgb)
+    self.check(ca.XyzToLab, ca.RgbToXyz(*self.rgb), (grapefruit.Colour.WHITE_REFERENCE['std_D50'],))
+    self.check(ca.CmyToCmyk, self.rgb)
+    self.check(ca.CmykToCmy, self.rgb + (self.rgb[0],))
+
+  def testInline(self):
+    ca = grapefruit.ColourArray
+    for workers, chunk in ((1, 128), (3, 1000)):
+      found = ca.ConvertParallel(ca.RgbToYiq, self.rgb, workers=workers, chunk=chunk)
+      self.assertEqual([list(c) for c in ca.RgbToYiq(*self.rgb)], [list(c) for c in found])
+    self.assertEqual([[], [], []], [list(c) for c in ca.ConvertParallel(ca.RgbToHsl, ([], [], []))])
+
+class ConvertParallelPurePythonTest(ConvertParallelTest):
+  '''Test the parallel conversions without NumPy.'''
+  numpy = None
+
+class ConversionCacheTest(GrapeFruitTestCase):
+  '''Test the cache of the static conversion functions.'''
+
+  def tearDown(self):
+    grapefruit.Colour.DisableConversionCache()
+
+  def testResults(self):
+    C = grapefruit.Colour
+    calls = [('RgbToHsl', (1, 0.5, 0)), ('HslToRgb', (30, 1, 0.5)), ('RgbToXyz', (0.2, 0.4, 0.6)),
+        ('XyzToLab', (0.4, 0.3, 0.1)), ('XyzToLab', (0.4, 0.3, 0.1, C.WHITE_REFERENCE['std_D50'])),
+        ('HtmlToRgb', ('#ff8000',)), ('RgbToHtml', (1, 0.5, 0)), ('IntTupleToXyz', ((12, 34, 56),))]
+    expected = [getattr(C, name)(*args) for name, args in calls]
+    C.EnableConversionCache()
+    for i in range(3):
+      self.assertEqual(expected, [getattr(C, name)(*args) for name, args in calls])
+    info = C.ConversionCacheInfo()
+    self.assertEqual((4, 2, 2), (info['XyzToLab'].hits, info['XyzToLab'].misses, info['XyzToLab'].currsize))
+    self.assertEqual((2, 1), (info['HtmlToRgb'].hits, info['HtmlToRgb'].misses))
+    self.assertEqual(1024, info['RgbToHsl'].maxsize)
+
+  def testColours(self):
+    grapefruit.Colour.EnableConversionCache(conversions=('HtmlToRgb', 'RgbToHsl'))
+    self.assertEqual(['HtmlToRgb', 'RgbToHsl'], sorted(grapefruit.Colour.ConversionCacheInfo()))
+    expected = grapefruit.Colour.NewFromHtml('#ff8000').hsl
+    for i in range(4):
+      self.assertEqual(expected, grapefruit.Colour.NewFromHtml('#ff8000').hsl)
+    info = grapefruit.Colour.ConversionCacheInfo()
+    self.assertEqual((4, 1), (info['HtmlToRgb'].hits, info['HtmlToRgb'].misses))
+    self.assertEqual((4, 1), (info['RgbToHsl'].hits, info['RgbToHsl'].misses))
+
+  def testBounded(self):
+    grapefruit.Colour.EnableConversionCache(2)
+    for v in range(10):
+      grapefruit.Colour.RgbToHsl(v / 10.0, 0, 0)
+    self.assertEqual(2, grapefruit.Colour.ConversionCacheInfo()['RgbToHsl'].currsize)
+    grapefruit.Colour.ClearConversionCache()
+    info = grapefruit.Colour.ConversionCacheInfo()['RgbToHsl']
+    self.assertEqual((0, 0, 0), (info.hits, info.misses, info.currsize))
+
+  def testArguments(self):
+    C = grapefruit.Colour
+    C.EnableConversionCache()
+    # Unhashable arguments are converted without the cache.
+    self.assertEqual((1.0, 0.5, 0.0), C.IntTupleToRgb([255, 127.5, 0]))
+    self.assertEqual(0, C.ConversionCacheInfo()['IntTupleToRgb'].misses)
+    # 1 and 1.0 are different keys.
+    C.RgbToGreyscale(1, 1, 1)
+    C.RgbToGreyscale(1.0, 1.0, 1.0)
+    self.assertEqual(2, C.ConversionCacheInfo()['RgbToGreyscale'].misses)
+    self.assertRaises(ValueError, C.HtmlToRgb, 'nonsense')
+    self.assertRaises(ValueError, C.EnableConversionCache, 10, ('NewFromRgb',))
+
+  def testDisable(self):
+    original = grapefruit.Colour.__dict__['RgbToHsl'].__func__
+    grapefruit.Colour.EnableConversionCache()
+    self.assertFalse(grapefruit.Colour.__dict__['RgbToHsl'].__func__ is original)
+    self.assertEqual(grapefruit.Colour.RgbToHsl.__doc__, original.__doc__)
+    grapefruit.Colour.EnableConversionCache()
+    grapefruit.Colour.DisableConversionCache()
+    self.assertTrue(grapefruit.Colour.__dict__['RgbToHsl'].__func__ is original)
+    self.assertEqual({}, grapefruit.Colour.ConversionCacheInfo())
+
+class InternTest(GrapeFruitTestCase):
+  '''Test the shared instances returned by Colour.NewInterned.'''
+
+  def tearDown(self):
+    grapefruit.Colour.ClearInterned()
+
+  def testNamed(self):
+    C = grapefruit.Colour
+    red = C.NewInterned('red', 'html')
+    self.assertEqual(C.NewFromHtml('red'), red)
+    self.assertTrue(red is C.NewInterned(' Red', 'html'))
+    self.assertFalse(red is C.NewInterned('red', 'html', 0.5))
+    self.assertEqual(0.5, C.NewInterned('red', 'html', 0.5).alpha)
+    # The named Colours are not counted, and never evicted.
+    C.ClearInterned(1)
+    red = C.NewInterned('red', 'html')
+    for html in ('#000001', '#000002', '#000003'):
+      C.NewInterned(html, 'html')
+    self.assertTrue(red is C.NewInterned('red', 'html'))
+    self.assertEqual((0, 3, 1, 1), tuple(C.InternedInfo()))
+
+  def testModes(self):
+    C = grapefruit.Colour
+    d50 = C.WHITE_REFERENCE['std_D50']
+    for mode in ('rgb', 'hsl', 'hsv', 'yiq', 'yuv', 'xyz', 'lab', 'cmy', 'cmyk'):
+      values = C.Convert((1.0, 0.5, 0.0), 'rgb', mode, d50)
+      colour = C.NewInterned(values, mode, 0.5, d50)
+      self.assertNear(C.NewFromRgb(1.0, 0.5, 0.0, 0.5), colour)
+      self.assertEqual(d50, colour.whiteRef)
+      self.assertTrue(colour is C.NewInterned(list(values), mode, 0.5, d50))
+    self.assertTrue(C.NewInterned(0x0080ff, 'pil') is C.NewInterned(0x0080ff, 'pil'))
+    self.assertRaises(ValueError, C.NewInterned, (1, 0.5, 0), 'ryb')
+    self.assertRaises(ValueError, C.NewInterned, 'nocolour', 'html')
+
+  def testBounded(self):
+    C = grapefruit.Colour
+    C.ClearInterned(2)
+    first = C.NewInterned((0.1, 0.2, 0.3))
+    C.NewInterned((0.2, 0.2, 0.3))
+    self.assertTrue(first is C.NewInterned((0.1, 0.2, 0.3)))
+    C.NewInterned((0.3, 0.2, 0.3))
+    C.NewInterned((0.4, 0.2, 0.3))
+    self.assertFalse(first is C.NewInterned((0.1, 0.2, 0.3)))
+    self.assertEqual(2, C.InternedInfo().currsize)
+    C.ClearInterned(None)
+    self.assertEqual((0, 0, None, 0), tuple(C.InternedInfo()))
+
+  def testUnhashable(self):
+    C = grapefruit.Colour
+    wref = [0.95043, 1.00000, 1.08890]
+    colour = C.NewInterned((1.0, 0.5, 0.0), 'rgb', 1.0, wref)
+    self.assertEqual((1.0, 0.5, 0.0, 1.0), colour)
+    self.assertFalse(colour is C.NewInterned((1.0, 0.5, 0.0), 'rgb', 1.0, wref))
+    self.assertEqual(0, C.InternedInfo().currsize)
+
+class InstrumentationTest(GrapeFruitTestCase):
+  '''Test the instrumentation of the Colour and ColourArray functions.'''
+
+  def tearDown(self):
+    grapefruit.Colour.DisableInstrumentation()
+    grapefruit.Colour.DisableConversionCache()
+
+  def testStats(self):
+    C = grapefruit.Colour
+    with C.Instrumented():
+      for i in range(5):
+        col = C.NewFromHtml('#ff8000')
+        col.lab
+        col.lab
+        col.TriadicScheme()
+      grapefruit.ColourArray.NewFromRgb((1, 0), (0, 1), (0, 0)).ToHsl()
+    stats = C.InstrumentationStats()
+    self.assertEqual(5, stats['Colour.NewFromHtml']['calls'])
+    self.assertEqual(5, stats['Colour.HtmlToRgb']['calls'])
+    self.assertEqual(10, stats['Colour.lab']['calls'])
+    self.assertEqual(5, stats['Colour.XyzToLab']['calls'])
+    self.assertEqual(5, stats['Colour.TriadicScheme']['calls'])
+    self.assertEqual(1, stats['ColourArray.ToHsl']['calls'])
+    self.assertEqual(1, stats['ColourArray.RgbToHsl']['calls'])
+    self.assertFalse('Colour.RgbToCmy' in stats)
+    for name, s in stats.items():
+      self.assertEqual(s['calls'], sum(n for b, n in s['histogram']))
+      self.assertTrue(s['time'] > 0)
+    self.assertTrue(stats['Colour.NewFromHtml']['time'] >= stats['Colour.HtmlToRgb']['time'])
+    bounds = [b for b, n in stats['Colour.lab']['histogram']]
+    self.assertEqual(sorted(bounds), bounds)
+    self.assertTrue(all(b in grapefruit._LATENCY_BOUNDS or b==float('inf') for b in bounds))
+
+  def testSelection(self):
+    C = grapefruit.Colour
+    C.EnableInstrumentation(('RgbToHsl', 'ColourArray.RgbToHsl', 'hsl'))
+    C.NewFromRgb(1, 0.5, 0).hsl
+    C.RgbToHsv(1, 0.5, 0)
+    self.assertEqual(['Colour.RgbToHsl', 'Colour.hsl'], sorted(C.InstrumentationStats()))
+    # Enabling again resets the statistics.
+    C.EnableInstrumentation(('RgbToHsv',))
+    self.assertEqual({}, C.InstrumentationStats())
+    self.assertRaises(ValueError, C.EnableInstrumentation, ('Nonsense',))
+    self.assertRaises(ValueError, C.EnableInstrumentation, ('Palette.Nearest',))
+    self.assertRaises(ValueError, C.EnableInstrumentation, ('EnableConversionCache',))
+    self.assertRaises(ValueError, C.EnableInstrumentation, ('WHITE_REFERENCE',))
+
+  def testDisable(self):
+    C = grapefruit.Colour
+    originals = dict(vars(C))
+    arrayOriginals = dict(vars(grapefruit.ColourArray))
+    with C.Instrumented():
+      self.assertFalse(vars(C)['RgbToHsl'] is originals['RgbToHsl'])
+      self.assertFalse(vars(C)['lab'] is originals['lab'])
+      self.assertEqual(originals['lab'].__doc__, vars(C)['lab'].__doc__)
+      self.assertEqual(originals['RgbToHsl'].__func__.__doc__, C.RgbToHsl.__doc__)
+    self.assertEqual(originals, dict(vars(C)))
+    self.assertEqual(arrayOriginals, dict(vars(grapefruit.ColourArray)))
+    C.RgbToHsl(1, 0.5, 0)
+    self.assertEqual({}, C.InstrumentationStats())
+
+  def testConversionCache(self):
+    C = grapefruit.Colour
+    original = vars(C)['HtmlToRgb']
+    C.EnableInstrumentation(('HtmlToRgb',))
+    C.EnableConversionCache(conversions=('HtmlToRgb',))
+    for i in range(3):
+      C.HtmlToRgb('#ff8000')
+    self.assertEqual(1, C.InstrumentationStats()['Colour.HtmlToRgb']['calls'])
+    C.DisableConversionCache()
+    C.DisableInstrumentation()
+    self.assertTrue(vars(C)['HtmlToRgb'].__func__ is original.__func__)
+
+class ConvertTest(BackendTestCase):
+  '''Test the conversions between any two representations.'''
+
+  MODES = ('rgb', 'hsl', 'hsv', 'yiq', 'yuv', 'xyz', 'lab', 'cmy', 'cmyk')
+
+  def setUp(self):
+    BackendTestCase.setUp(self)
+    self.rgb = [(1.0, 0.5, 0.0), (0.2, 0.4, 0.6), (0.9, 0.1, 0.3), (0.5, 0.5, 0.5)]
+
+  def tearDown(self):
+    grapefruit.Colour.DisableConversionCache()
+    BackendTestCase.tearDown(self)
+
+  def testPairs(self):
+    C = grapefruit.Colour
+    for rgb in self.rgb:
+      values = dict((mode, C.Convert(rgb, 'rgb', mode)) for mode in self.MODES)
+      for src in self.MODES:
+        for dst in self.MODES:
+          # The XYZ matrices only round trip to about 1e-5.
+          self.assertNear(rgb, C.Convert(C.Convert(values[src], src, dst), dst, 'rgb'), 1e-4)
+
+  def testChain(self):
+    C = grapefruit.Colour
+    d50 = C.WHITE_REFERENCE['std_D50']
+    for rgb in self.rgb:
+      hsv = C.RgbToHsv(*rgb)
+      self.assertEqual(C.XyzToLab(*C.RgbToXyz(*C.HsvToRgb(*hsv))), C.Convert(hsv, 'hsv', 'lab'))
+      self.assertEqual(C.XyzToLab(wref=d50, *C.RgbToXyz(*C.HsvToRgb(*hsv))), C.Convert(hsv, 'hsv', 'lab', d50))
+      self.assertEqual(C.CmyToCmyk(*C.RgbToCmy(*rgb)), C.Convert(rgb, 'rgb', 'cmyk'))
+      self.assertEqual(rgb, C.Convert(rgb, 'rgb', 'rgb'))
+
+  def testConverter(self):
+    C = grapefruit.Colour
+    self.assertTrue(C.Converter('hsl', 'lab') is C.Converter('hsl', 'lab'))
+    self.assertEqual('Convert from cmyk to yiq (cmyk -> cmy -> rgb -> yiq).', C.Converter('cmyk', 'yiq').__doc__)
+    self.assertRaises(ValueError, C.Convert, (0, 0, 0), 'rgb', 'ryb')
+    self.assertRaises(ValueError, C.Converter, 'html', 'rgb')
+
+  def testBatch(self):
+    d50 = grapefruit.Colour.WHITE_REFERENCE['std_D50']
+    for src in self.MODES:
+      channels = tuple(zip(*[grapefruit.Colour.Convert(rgb, 'rgb', src) for rgb in self.rgb]))
+      for dst in self.MODES:
+        expected = [grapefruit.Colour.Convert(v, src, dst, d50) for v in zip(*channels)]
+        found = grapefruit.ColourArray.Convert(channels, src, dst, d50)
+        for e, f in zip(expected, zip(*found)):
+          self.assertNear(e, f, 1e-9)
+    self.assertTrue(grapefruit.ColourArray.Converter('hsl', 'lab') is grapefruit.ColourArray.Converter('hsl', 'lab'))
+
+  def testConversionCache(self):
+    C = grapefruit.Colour
+    C.Convert((30, 1, 1), 'hsv', 'lab')
+    C.EnableConversionCache(conversions=('RgbToXyz',))
+    C.Convert((30, 1, 1), 'hsv', 'lab')
+    C.Convert((30, 1, 1), 'hsv', 'lab')
+    self.assertEqual(1, C.ConversionCacheInfo()['RgbToXyz'].hits)
+
+class ConvertPurePythonTest(ConvertTest):
+  '''Test the conversions between any two representations without NumPy.'''
+  numpy = None
+
+class AdaptationTest(BackendTestCase):
+  '''Test the chromatic adaptation transforms.'''
+
+  METHODS = ('bradford', 'vonkries', 'cat02', 'xyzscaling')
+
+  def setUp(self):
+    BackendTestCase.setUp(self)
+    wref = grapefruit.Colour.WHITE_REFERENCE
+    self.whites = [wref[n] for n in ('std_D65', 'std_D50', 'std_A', 'sup_F2', 'std_E')]
+
+  def testWhites(self):
+    C = grapefruit.Colour
+    for method in self.METHODS:
+      for src in self.whites:
+        for dst in self.whites:
+          self.assertNear(dst, C.AdaptXyz(src=src, dst=dst, method=method, *src), 1e-9)
+          m = C.AdaptationMatrix(src, dst, method)
+          inverse = C.AdaptationMatrix(dst, src, method)
+          product = [[sum(m[i][k] * inverse[k][j] for k in range(3)) for j in range(3)] for i in range(3)]
+          self.assertNear([1, 0, 0, 0, 1, 0, 0, 0, 1], sum(product, []), 1e-9)
+
+  def testBradford(self):
+    # Lindbloom's D65 to D50 Bradford matrix, for slightly different whites.
+    expected = (
+      (1.0478112, 0.0228866, -0.0501270),
+      (0.0295424, 0.9904844, -0.0170491),
+      (-0.0092345, 0.0150436, 0.7521316))
+    m = grapefruit.Colour.AdaptationMatrix(self.whites[0], self.whites[1])
+    self.assertNear(sum(expected, ()), sum(m, ()), 2e-4)
+    self.assertTrue(m is grapefruit.Colour.AdaptationMatrix(self.whites[0], self.whites[1], 'bradford'))
+    self.assertRaises(ValueError, grapefruit.Colour.AdaptationMatrix, self.whites[0], self.whites[1], 'cat16')
+
+  def testBatch(self):
+    xyz = grapefruit.ColourArray.RgbToXyz((1, 0.2, 0.5), (0.5, 0.4, 0.5), (0, 0.6, 0.5))
+    for method in self.METHODS:
+      found = grapefruit.ColourArray.AdaptXyz(src=self.whites[0], dst=self.whites[2], method=method, *xyz)
+      for v, f in zip(zip(*xyz), zip(*found)):
+        self.assertNear(grapefruit.Colour.AdaptXyz(src=self.whites[0], dst=self.whites[2], method=method, *v), f, 1e-12)
+
+  def testColour(self):
+    c = grapefruit.Colour.NewFromRgb(0.8, 0.5, 0.2)
+    for method in self.METHODS:
+      c2 = c.ColourWithWhiteRef(self.whites[1], adaptation=method)
+      self.assertEqual(self.whites[1], c2.whiteRef)
+      self.assertNear(grapefruit.Colour.AdaptXyz(src=self.whites[0], dst=self.whites[1], method=method, *c.xyz), c2.xyz, 1e-6)
+      self.assertNear(c.rgb, c2.ColourWithWhiteRef(self.whites[0], adaptation=method).rgb, 1e-6)
+
+class AdaptationPurePythonTest(AdaptationTest):
+  '''Test the chromatic adaptation transforms without NumPy.'''
+  numpy = None
+
+class FastMathTest(BackendTestCase):
+  '''Test the fast approximate conversions.'''
+
+  def setUp(self):
+    BackendTestCase.setUp(self)
+    self.rgb = [
+      (1.0, 0.5, 0.0), (0.0, 0.0, 0.0), (1.0, 1.0, 1.0), (0.5, 0.5, 0.5),
+      (0.2, 0.4, 0.6), (0.02, 0.03, 0.01), (1.1, -0.1, 0.5), (-0.5, 0.03928, 0.04)]
+    self.channels = tuple(zip(*self.rgb))
+
+  def tearDown(self):
+    grapefruit.Colour.FAST_MATH = False
+    BackendTestCase.tearDown(self)
+
+  def assertChannelsNear(self, expected, found, prec):
+    for e, f in zip(zip(*expected), zip(*found)):
+      self.assertNear(e, f, prec)
+
+  def testBatch(self):
+    CA = grapefruit.ColourArray
+    xyz = CA.RgbToXyz(*self.channels)
+    lab = CA.XyzToLab(*xyz)
+    self.assertChannelsNear(xyz, CA.RgbToXyz(fast=True, *self.channels), 4e-7)
+    self.assertChannelsNear(self.channels, CA.XyzToRgb(fast=True, *xyz), 4e-7)
+    self.assertChannelsNear(lab, CA.XyzToLab(fast=True, *xyz), 1e-12)
+    self.assertChannelsNear(xyz, CA.LabToXyz(fast=True, *lab), 1e-12)
+
+  def testScalar(self):
+    C = grapefruit.Colour
+    for rgb in self.rgb:
+      lab = C.XyzToLab(*C.RgbToXyz(*rgb))
+      self.assertNear(C.LabToXyz(*lab), C.LabToXyz(fast=True, *lab), 1e-15)
+
+  def testDefault(self):
+    C, CA = grapefruit.Colour, grapefruit.ColourArray
+    lab = (66.9518, 0.43084, 0.739692)
+    exact = CA.RgbToXyz(*self.channels)
+    self.assertEqual([list(c) for c in exact], [list(c) for c in CA.RgbToXyz(fast=False, *self.channels)])
+    self.assertEqual(C.LabToXyz(fast=False, *lab), C.LabToXyz(*lab))
+    C.FAST_MATH = True
+    fast = CA.RgbToXyz(*self.channels)
+    self.assertEqual([list(c) for c in fast], [list(c) for c in CA.RgbToXyz(fast=True, *self.channels)])
+    self.assertEqual([list(c) for c in exact], [list(c) for c in CA.RgbToXyz(fast=False, *self.channels)])
+    self.assertEqual(C.LabToXyz(fast=True, *lab), C.LabToXyz(*lab))
+
+  def testAccuracy(self):
+    report = grapefruit.ColourArray.FastMathAccuracy(500, seed=3)
+    self.assertEqual(['LabToXyz', 'RgbToXyz', 'XyzToLab', 'XyzToRgb', 'deltaE'], sorted(report))
+    for name in ('LabToXyz', 'RgbToXyz', 'XyzToLab', 'XyzToRgb'):
+      self.assertEqual(500, report[name]['samples'])
+      self.assertEqual(3, len(report[name]['rms']))
+      self.assertTrue(max(report[name]['max']) < 4e-7)
+    self.assertTrue(report['deltaE']['mean'] <= report['deltaE']['max'] < 0.01)
+    self.assertEqual(report, grapefruit.ColourArray.FastMathAccuracy(500, seed=3))
+
+class FastMathPurePythonTest(FastMathTest):
+  '''Test the fast approximate conversions without NumPy.'''
+  numpy = None
+
+class _UnseekableStream(io.RawIOBase):
+  '''A write only stream which can't seek (e.g. a pipe).'''
+
+  def __init__(self):
+    self.data = bytearray()
+
+  def writable(self):
+    return True
+
+  def write(self, b):
+    self.data.extend(b)
+    return len(b)
+
+class SerializationTest(BackendTestCase):
+  '''Test the binary Colour collections.'''
+
+  PRECISION = {'uint8': 0.5 / 255, 'uint16': 0.5 / 65535, 'float32': 1e-7, 'float64': 0}
+
+  def setUp(self):
+    BackendTestCase.setUp(self)
+    C = grapefruit.Colour
+    d50 = C.WHITE_REFERENCE['std_D50']
+    self.colours = [
+      C.NewFromRgb(1.0, 0.5, 0.0), C.NewFromRgb(0.2, 0.4, 0.6, 0.5, d50),
+      C.NewFromRgb(0.0, 0.0, 0.0, 0.0), C.NewFromRgb(0.3, 0.7, 0.9, 0.25, d50)]
+    self.dir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.dir)
+    BackendTestCase.tearDown(self)
+
+  def Write(self, stream, colours, *args, **kwargs):
+    with grapefruit.ColourWriter(stream, *args, **kwargs) as writer:
+      for c in colours:
+        writer.Write(c)
+    return writer
+
+  def assertColours(self, expected, found, prec, alpha=True, wref=True):
+    self.assertEqual(len(expected), len(found))
+    for e, f in zip(expected, found):
+      self.assertNear(e.rgb, f.rgb, prec)
+      if alpha:
+        self.assertNear(e.alpha, f.alpha, prec)
+      else:
+        self.assertEqual(1.0, f.alpha)
+      self.assertEqual(wref and e.whiteRef or grapefruit.Colour.WHITE_REFERENCE['std_D65'], f.whiteRef)
+
+  def testRoundTrip(self):
+    for dtype, prec in self.PRECISION.items():
+      for alpha in (False, True):
+        for wref in (False, True):
+          stream = io.BytesIO()
+          writer = self.Write(stream, self.colours, dtype, alpha, wref)
+          self.assertEqual(4, writer.count)
+          stream.seek(0)
+          reader = grapefruit.ColourReader(stream)
+          self.assertEqual((dtype, alpha, wref, 4), (reader.dtype, reader.hasAlpha, reader.hasWhiteRef, reader.count))
+          self.assertColours(self.colours, list(reader), prec, alpha, wref)
+
+  def testArrays(self):
+    CA = grapefruit.ColourArray
+    colours = CA.NewFromRgb((1.0, 0.2, 1.5), (0.5, 0.4, -0.5), (0.0, 0.6, 0.3), alpha=(1.0, 0.5, 0.25))
+    for dtype, prec in self.PRECISION.items():
+      packed = io.BytesIO()
+      with grapefruit.ColourWriter(packed, dtype, alpha=True, wref=True) as writer:
+        writer.WriteArray(colours)
+      self.assertEqual(packed.getvalue(), self.Write(io.BytesIO(), colours, dtype, True, True)._ColourWriter__stream.getvalue())
+      packed.seek(0)
+      found = grapefruit.ColourReader(packed).ReadArray()
+      expected = list(colours)
+      if dtype.startswith('uint'):
+        expected = [c.nearestLegal for c in expected]
+      self.assertColours(expected, list(found), prec)
+
+  def testChunks(self):
+    stream = io.BytesIO()
+    self.Write(stream, self.colours, 'uint16', alpha=True)
+    stream.seek(0)
+    reader = grapefruit.ColourReader(stream)
+    self.assertEqual(3, len(reader.Read(3)))
+    self.assertEqual(1, len(reader.ReadArray(3)))
+    self.assertEqual([], reader.Read())
+    self.assertEqual(0, len(reader.ReadArray()))
+
+  def testWhiteReferences(self):
+    stream = io.BytesIO()
+    self.Write(stream, self.colours, wref=True)
+    stream.seek(0)
+    reader = grapefruit.ColourReader(stream)
+    self.assertEqual(grapefruit.Colour.WHITE_REFERENCE['std_D65'], reader.ReadArray(1).whiteRef)
+    self.assertRaises(ValueError, reader.ReadArray, 2)
+    stream.seek(0)
+    self.assertEqual(grapefruit.Colour.WHITE_REFERENCE['std_D50'], grapefruit.ColourReader(stream).Read()[1].whiteRef)
+    writer = grapefruit.ColourWriter(io.BytesIO(), wref=True)
+    self.assertRaises(ValueError, writer.Write, grapefruit.Colour.NewFromRgb(1, 0, 0, wref=(0.9, 1.0, 1.1)))
+
+  def testWhiteReferenceIndices(self):
+    # The indices are part of the format, they must never change.
+    self.assertEqual(sorted(grapefruit.Colour.WHITE_REFERENCE), sorted(grapefruit._WREF_NAMES))
+    for name, index in (('std_A', 0), ('std_D50', 3), ('std_D65', 5), ('std_E', 7), ('std_F12', 19),
+        ('sup_A', 20), ('sup_D65', 25), ('sup_E', 7), ('sup_F12', 39)):
+      stream = io.BytesIO()
+      self.Write(stream, [grapefruit.Colour.NewFromRgb(1, 0, 0, wref=grapefruit.Colour.WHITE_REFERENCE[name])], 'uint8', wref=True)
+      self.assertEqual(index, bytearray(stream.getvalue())[-1])
+
+  def testUnseekable(self):
+    stream = _UnseekableStream()
+    self.Write(stream, self.colours, 'float64', alpha=True, wref=True)
+    reader = grapefruit.ColourReader(io.BytesIO(bytes(stream.data)))
+    self.assertEqual(None, reader.count)
+    self.assertColours(self.colours, reader.Read(), 0)
+
+  def testInvalid(self):
+    self.assertRaises(ValueError, grapefruit.ColourWriter, io.BytesIO(), 'int8')
+    self.assertRaises(ValueError, grapefruit.ColourReader, io.BytesIO(b'GFCL'))
+    self.assertRaises(ValueError, grapefruit.ColourReader, io.BytesIO(b'\0' * 16))
+    stream = io.BytesIO()
+    self.Write(stream, self.colours, 'uint8')
+    data = stream.getvalue()
+    self.assertRaises(ValueError, grapefruit.ColourReader, io.BytesIO(data[:4] + b'\2' + data[5:]))
+    self.assertRaises(ValueError, grapefruit.ColourReader(io.BytesIO(data[:-1])).Read)
+
+  def testMapped(self):
+    path = os.path.join(self.dir, 'colours')
+    with open(path, 'wb') as f:
+      self.Write(f, self.colours, 'float32', alpha=True, wref=True)
+    with grapefruit.MappedColours(path) as colours:
+      self.assertEqual(4, len(colours))
+      self.assertEqual(('float32', True, True), (colours.dtype, colours.hasAlpha, colours.hasWhiteRef))
+      self.assertColours(self.colours, list(colours), 1e-7)
+      self.assertColours(self.colours[::-1], [colours[i] for i in range(-1, -5, -1)], 1e-7)
+      self.assertRaises(IndexError, colours.__getitem__, 4)
+      self.assertColours(self.colours[2:3], list(colours.ToColourArray(2, 3)), 1e-7)
+      self.assertRaises(ValueError, colours.ToColourArray)
+      records = colours.records
+      if grapefruit.numpy is None:
+        self.assertEqual(4 * 17, len(records))
+        # A read only buffer on Python 2.
+        if isinstance(records, memoryview): self.assertTrue(records.readonly)
+      else:
+        self.assertEqual(('r', 'g', 'b', 'alpha', 'wref'), records.dtype.names)
+        self.assertNear([c.alpha for c in self.colours], records['alpha'], 1e-7)
+        self.assertFalse(records.flags.owndata)
+        self.assertFalse(records.flags.writeable)
+      del records
+    colours.Close()
+    self.assertEqual(4, len(colours))
+    for access in (lambda: colours[0], lambda: list(colours), lambda: colours.records, colours.ToColourArray):
+      self.assertRaises(ValueError, access)
+
+  def testMappedUnknownCount(self):
+    path = os.path.join(self.dir, 'colours')
+    stream = _UnseekableStream()
+    self.Write(stream, self.colours, 'uint8')
+    with open(path, 'wb') as f:
+      f.write(stream.data)
+    with grapefruit.MappedColours(path) as colours:
+      self.assertColours(self.colours, list(colours.ToColourArray()), 0.5 / 255, False, False)
+    with open(path, 'ab') as f:
+      f.write(b'\0')
+    self.assertRaises(ValueError, grapefruit.MappedColours, path)
+
+class SerializationPurePythonTest(SerializationTest):
+  '''Test the binary Colour collections without NumPy.'''
+  numpy = None
+
+class BenchSuiteTest(GrapeFruitTestCase):
+  '''Test that the benchmark suite covers and runs every operation.'''
+
+  def testItems(self):
+    import grapefruit_bench
+    for bench in grapefruit_bench.SUITE_BENCHMARKS:
+      for item in bench():
+        item[1]()
+
+  def testCompare(self):
+    import grapefruit_bench
+    baseline = {'a': 100.0, 'b': 100.0, 'c': 100.0}
+    results = {'a': 95.0, 'b': 80.0, 'd': 1.0}
+    self.assertEqual([('b', 100.0, 80.0)], grapefruit_bench.Compare(results, baseline, 0.1))
+    self.assertEqual([], grapefruit_bench.Compare(results, baseline, 0.25))
+
+  def testJsonOutput(self):
+    import grapefruit_bench
+    try:
+      from StringIO import StringIO
+    except ImportError:
+      from io import StringIO
+    # The benchmarks write str, which is bytes on Python 2.
+    out, log = StringIO(), StringIO()
+    argv = ['--json', '-', '--filter', '^SuiteConversions/RgbToHsl$', '--repeat', '1']
+    self.assertEqual(0, grapefruit_bench.Main(argv, out, log))
+    report = json.loads(out.getvalue())
+    self.assertEqual(['SuiteConversions/RgbToHsl'], list(report['results']))
+    self.assertTrue('calls/s' in log.getvalue())
+
 
 if __name__ == '__main__':
   unittest.main()